@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import os
+import time
+import json
+import struct
+import sqlite3
+import hashlib
+import logging
+import tempfile
+
+import dns.name
+import dns.node
+import dns.rdata
+import dns.rdataset
+import dns.zone
+import six
+from six.moves import StringIO
+from aadict import aadict
+
+from .record import Record
+from .util import filedigest
+
+#------------------------------------------------------------------------------
+
+log = logging.getLogger(__name__)
+
+#------------------------------------------------------------------------------
+class SnapshotCache(object):
+  '''
+  An on-disk store of the records of hosted zones, as last fetched
+  from (or written to) the hosted DNS provider, keyed by driver name,
+  account and zone name. Each snapshot also records the zone's SOA
+  serial at the time it was taken so that it can be cheaply
+  revalidated (see :meth:`dnssync.api.Driver.getSerial`).
+
+  The store is an SQLite database, which makes it safe to use from
+  multiple threads and concurrent dnssync processes; each operation
+  uses its own connection. The records are stored as JSON (see
+  :attr:`SNAPSHOT_VERSION`), so that loading a snapshot cannot execute
+  any code.
+  '''
+
+  # the version of the JSON encoding of the snapshot records; snapshots
+  # of any other version (or in the pickle format used before) are
+  # ignored, i.e. re-fetched
+  SNAPSHOT_VERSION = 1
+
+  SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS snapshot (
+      driver    TEXT NOT NULL,
+      account   TEXT NOT NULL,
+      zone      TEXT NOT NULL,
+      serial    INTEGER NOT NULL,
+      records   BLOB NOT NULL,
+      updated   REAL NOT NULL,
+      PRIMARY KEY (driver, account, zone)
+    );
+    CREATE TABLE IF NOT EXISTS syncstate (
+      driver    TEXT NOT NULL,
+      account   TEXT NOT NULL,
+      zone      TEXT NOT NULL,
+      serial    INTEGER NOT NULL,
+      digest    TEXT NOT NULL,
+      updated   REAL NOT NULL,
+      PRIMARY KEY (driver, account, zone)
+    );
+    CREATE TABLE IF NOT EXISTS zonedigest (
+      driver    TEXT NOT NULL,
+      account   TEXT NOT NULL,
+      zone      TEXT NOT NULL,
+      serial    INTEGER NOT NULL,
+      digest    TEXT NOT NULL,
+      updated   REAL NOT NULL,
+      PRIMARY KEY (driver, account, zone)
+    );
+    CREATE TABLE IF NOT EXISTS catalog (
+      driver    TEXT NOT NULL,
+      account   TEXT NOT NULL,
+      zones     TEXT NOT NULL,
+      updated   REAL NOT NULL,
+      PRIMARY KEY (driver, account)
+    );
+  '''
+
+  #----------------------------------------------------------------------------
+  def __init__(self, path, *args, **kw):
+    super(SnapshotCache, self).__init__(*args, **kw)
+    self.path = path
+    dirname = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(dirname):
+      os.makedirs(dirname)
+    with self._connect() as conn:
+      conn.executescript(self.SCHEMA)
+
+  #----------------------------------------------------------------------------
+  def _connect(self):
+    # note: sqlite3 connections used as a context manager commit (or
+    # roll back) the transaction, but do not close the connection...
+    return _Connection(sqlite3.connect(self.path, timeout=30))
+
+  #----------------------------------------------------------------------------
+  def load(self, driver, account, zone):
+    '''
+    Returns the snapshot of `zone` as an object with `serial` and
+    `records` attributes, or ``None`` if there is no snapshot.
+    '''
+    with self._connect() as conn:
+      row = conn.execute(
+        'SELECT serial, records FROM snapshot'
+        ' WHERE driver = ? AND account = ? AND zone = ?',
+        (driver, account or '', zone)).fetchone()
+    if row is None:
+      return None
+    try:
+      data = json.loads(bytes(row[1]).decode('utf-8'))
+      if not isinstance(data, dict) or data.get('version') != self.SNAPSHOT_VERSION:
+        log.debug('ignoring outdated snapshot of zone "%s"', zone)
+        return None
+      records = [
+        Record(**{_native(key): _native(val) for key, val in rec.items()})
+        for rec in data['records']]
+    except Exception as err:
+      log.warning('ignoring unreadable snapshot of zone "%s": %s', zone, err)
+      return None
+    return aadict(serial=row[0], records=records)
+
+  #----------------------------------------------------------------------------
+  def save(self, driver, account, zone, serial, records):
+    '''
+    Stores `records`, the complete list of :class:`dnssync.api.Record`
+    objects of `zone` at SOA serial `serial`, replacing any previous
+    snapshot.
+    '''
+    data = json.dumps(dict(
+      version = self.SNAPSHOT_VERSION,
+      records = [
+        {key: val for key, val in rec.toDict().items() if val is not None}
+        for rec in records],
+    ), separators=(',', ':')).encode('utf-8')
+    with self._connect() as conn:
+      conn.execute(
+        'INSERT OR REPLACE INTO snapshot'
+        ' (driver, account, zone, serial, records, updated)'
+        ' VALUES (?, ?, ?, ?, ?, ?)',
+        (driver, account or '', zone, serial, sqlite3.Binary(data), time.time()))
+
+  #----------------------------------------------------------------------------
+  def delete(self, driver, account, zone):
+    '''
+    Removes the snapshot of `zone`, if there is one.
+    '''
+    with self._connect() as conn:
+      conn.execute(
+        'DELETE FROM snapshot WHERE driver = ? AND account = ? AND zone = ?',
+        (driver, account or '', zone))
+
+  #----------------------------------------------------------------------------
+  def loadSyncState(self, driver, account, zone):
+    '''
+    Returns the state of `zone` when it was last known to be in sync
+    with a local zonefile as an object with `serial` (the hosted zone's
+    SOA serial) and `digest` (the zonefile's content digest)
+    attributes, or ``None`` if unknown.
+    '''
+    with self._connect() as conn:
+      row = conn.execute(
+        'SELECT serial, digest FROM syncstate'
+        ' WHERE driver = ? AND account = ? AND zone = ?',
+        (driver, account or '', zone)).fetchone()
+    if row is None:
+      return None
+    return aadict(serial=row[0], digest=row[1])
+
+  #----------------------------------------------------------------------------
+  def saveSyncState(self, driver, account, zone, serial, digest):
+    '''
+    Records that `zone`, at SOA serial `serial`, is in sync with the
+    local zonefile with content digest `digest`.
+    '''
+    with self._connect() as conn:
+      conn.execute(
+        'INSERT OR REPLACE INTO syncstate'
+        ' (driver, account, zone, serial, digest, updated)'
+        ' VALUES (?, ?, ?, ?, ?, ?)',
+        (driver, account or '', zone, serial, digest, time.time()))
+
+  #----------------------------------------------------------------------------
+  def loadDigest(self, driver, account, zone, serial):
+    '''
+    Returns the zone digest (see :func:`dnssync.api.zonemd.zoneDigests`)
+    of the hosted zone `zone` at SOA serial `serial`, or ``None`` if
+    unknown.
+    '''
+    with self._connect() as conn:
+      row = conn.execute(
+        'SELECT digest FROM zonedigest'
+        ' WHERE driver = ? AND account = ? AND zone = ? AND serial = ?',
+        (driver, account or '', zone, serial)).fetchone()
+    return row[0] if row else None
+
+  #----------------------------------------------------------------------------
+  def saveDigest(self, driver, account, zone, serial, digest):
+    '''
+    Stores `digest`, the zone digest of the hosted zone `zone` at SOA
+    serial `serial`.
+    '''
+    with self._connect() as conn:
+      conn.execute(
+        'INSERT OR REPLACE INTO zonedigest'
+        ' (driver, account, zone, serial, digest, updated)'
+        ' VALUES (?, ?, ?, ?, ?, ?)',
+        (driver, account or '', zone, serial, digest, time.time()))
+
+  #----------------------------------------------------------------------------
+  def loadCatalog(self, driver, account, maxage):
+    '''
+    Returns the zone catalog (a dict mapping zone names to provider
+    zone ids) of `account`, or ``None`` if unknown or older than
+    `maxage` seconds.
+    '''
+    with self._connect() as conn:
+      row = conn.execute(
+        'SELECT zones FROM catalog'
+        ' WHERE driver = ? AND account = ? AND updated >= ?',
+        (driver, account or '', time.time() - maxage)).fetchone()
+    return json.loads(row[0]) if row else None
+
+  #----------------------------------------------------------------------------
+  def saveCatalog(self, driver, account, zones):
+    '''
+    Stores the zone catalog `zones` of `account`.
+    '''
+    with self._connect() as conn:
+      conn.execute(
+        'INSERT OR REPLACE INTO catalog (driver, account, zones, updated)'
+        ' VALUES (?, ?, ?, ?)',
+        (driver, account or '', json.dumps(zones), time.time()))
+
+#------------------------------------------------------------------------------
+class ZoneCache(object):
+  '''
+  An on-disk cache of parsed zonefiles, so that unchanged zonefiles do
+  not need to be re-parsed on every run. Each zonefile (keyed by path
+  and origin) is stored in a separate file in `directory` in a compact
+  binary form: the DNS wire format of each rdataset. An entry is only
+  used if the zonefile's size, modification time and content digest
+  are all still the same as when it was compiled.
+
+  Entries are written to a temporary file that is then atomically
+  renamed into place, so concurrent dnssync processes never see
+  partial entries. Once the entries exceed `maxsize` bytes in total,
+  the least recently used ones are evicted.
+  '''
+
+  MAGIC   = b'dnssync-zone-1\n'
+  MAXSIZE = 256 * 1024 * 1024
+
+  #----------------------------------------------------------------------------
+  def __init__(self, directory, maxsize=MAXSIZE, *args, **kw):
+    super(ZoneCache, self).__init__(*args, **kw)
+    self.directory = directory
+    self.maxsize   = maxsize
+    if not os.path.isdir(directory):
+      try:
+        os.makedirs(directory)
+      except OSError:
+        # another process may have just created it...
+        if not os.path.isdir(directory):
+          raise
+
+  #----------------------------------------------------------------------------
+  def _entry(self, path, origin):
+    key = hashlib.sha1(
+      (os.path.abspath(path) + '\0' + origin.to_text()).encode('utf-8'))
+    return os.path.join(self.directory, key.hexdigest() + '.zone')
+
+  #----------------------------------------------------------------------------
+  def _stat(self, path):
+    info = os.stat(path)
+    return (info.st_size, repr(info.st_mtime))
+
+  #----------------------------------------------------------------------------
+  def load(self, path, origin, digest=None):
+    '''
+    Returns the cached :class:`dns.zone.Zone` of the zonefile `path`
+    with origin `origin` (a :class:`dns.name.Name`), or ``None`` if
+    there is no valid cached version. `digest`, the zonefile's content
+    digest (see :func:`dnssync.api.util.filedigest`), is computed if
+    not specified and the cheaper checks pass.
+    '''
+    entry = self._entry(path, origin)
+    try:
+      with open(entry, 'rb') as fp:
+        data = fp.read()
+    except (IOError, OSError):
+      return None
+    try:
+      if not data.startswith(self.MAGIC):
+        raise ValueError('bad magic')
+      pos = len(self.MAGIC)
+      hlen, = struct.unpack_from('!I', data, pos)
+      head = json.loads(data[pos + 4:pos + 4 + hlen].decode('utf-8'))
+      if [head['size'], head['mtime']] != list(self._stat(path)):
+        return None
+      if head['digest'] != ( digest or filedigest(path) ):
+        return None
+      zone = self._decode(data, pos + 4 + hlen, origin, head['rdclass'])
+    except (IOError, OSError):
+      return None
+    except Exception as err:
+      log.warning('ignoring unreadable compiled zone "%s": %s', entry, err)
+      return None
+    try:
+      # mark as recently used (for eviction)
+      os.utime(entry, None)
+    except OSError:
+      pass
+    return zone
+
+  #----------------------------------------------------------------------------
+  def save(self, path, zone, digest=None):
+    '''
+    Stores the :class:`dns.zone.Zone` `zone`, which must be the parsed
+    version of the zonefile `path`, and evicts old entries if needed.
+    '''
+    size, mtime = self._stat(path)
+    head = json.dumps(dict(
+      path    = os.path.abspath(path),
+      origin  = zone.origin.to_text(),
+      rdclass = zone.rdclass,
+      size    = size,
+      mtime   = mtime,
+      digest  = digest or filedigest(path),
+    )).encode('utf-8')
+    entry = self._entry(path, zone.origin)
+    fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as fp:
+        fp.write(self.MAGIC)
+        fp.write(struct.pack('!I', len(head)))
+        fp.write(head)
+        self._encode(zone, fp)
+      os.rename(tmp, entry)
+    except Exception:
+      os.unlink(tmp)
+      raise
+    self.evict()
+
+  #----------------------------------------------------------------------------
+  def evict(self):
+    '''
+    Removes the least recently used entries until all of the entries
+    together take up no more than :attr:`maxsize` bytes.
+    '''
+    entries = []
+    for name in os.listdir(self.directory):
+      try:
+        info = os.stat(os.path.join(self.directory, name))
+      except OSError:
+        continue
+      entries.append((info.st_mtime, info.st_size, name))
+    total = sum(entry[1] for entry in entries)
+    for mtime, size, name in sorted(entries):
+      if total <= self.maxsize:
+        break
+      try:
+        os.unlink(os.path.join(self.directory, name))
+      except OSError:
+        pass
+      total -= size
+
+  #----------------------------------------------------------------------------
+  def _encode(self, zone, fp):
+    # each node is encoded as its name (uncompressed wire format) and
+    # number of rdatasets, each rdataset as its type, covered type,
+    # TTL and number of rdatas, and each rdata as its length and wire
+    # format.
+    for name, node in zone.nodes.items():
+      name.to_wire(fp)
+      fp.write(struct.pack('!H', len(node.rdatasets)))
+      for rdataset in node.rdatasets:
+        fp.write(struct.pack(
+          '!HHIH', rdataset.rdtype, rdataset.covers, rdataset.ttl, len(rdataset)))
+        for rdata in rdataset:
+          wire = StringIO()
+          rdata.to_wire(wire)
+          wire = wire.getvalue()
+          fp.write(struct.pack('!H', len(wire)))
+          fp.write(wire)
+
+  #----------------------------------------------------------------------------
+  def _decode(self, data, pos, origin, rdclass):
+    zone  = dns.zone.Zone(origin, rdclass, relativize=False)
+    nodes = zone.nodes
+    end   = len(data)
+    while pos < end:
+      # note: dnspython copies the wire data it is given on every
+      # `from_wire` call, hence only the (at most 255 byte) name, and
+      # below each rdata, is passed in.
+      name, used = dns.name.from_wire(data[pos:pos + 255], 0)
+      pos += used
+      count, = struct.unpack_from('!H', data, pos)
+      pos += 2
+      node = nodes[name] = zone.node_factory()
+      for idx in range(count):
+        rdtype, covers, ttl, rdcount = struct.unpack_from('!HHIH', data, pos)
+        pos += 10
+        rdataset = dns.rdataset.Rdataset(rdclass, rdtype, covers)
+        rdataset.update_ttl(ttl)
+        node.rdatasets.append(rdataset)
+        for idx in range(rdcount):
+          rdlen, = struct.unpack_from('!H', data, pos)
+          pos += 2
+          rdataset.add(dns.rdata.from_wire(
+            rdclass, rdtype, data[pos:pos + rdlen], 0, rdlen))
+          pos += rdlen
+    if pos != end:
+      raise ValueError('truncated')
+    return zone
+
+#------------------------------------------------------------------------------
+def _native(value):
+  # json decodes all strings as unicode: on python 2, ASCII strings are
+  # converted back to `str`, as the drivers produce them
+  if six.PY2 and isinstance(value, six.text_type):
+    try:
+      return value.encode('ascii')
+    except UnicodeError:
+      pass
+  return value
+
+#------------------------------------------------------------------------------
+class _Connection(object):
+  # an sqlite3 connection context manager that commits (or rolls
+  # back) *and* closes the connection.
+  def __init__(self, conn):
+    self.conn = conn
+  def __enter__(self):
+    return self.conn.__enter__()
+  def __exit__(self, *exc):
+    try:
+      return self.conn.__exit__(*exc)
+    finally:
+      self.conn.close()
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
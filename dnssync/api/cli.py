@@ -36,6 +36,7 @@ from .i18n import _
 from . import engine
 from . import error
 from .util import evalenv, absdom, reldom
+from .zonefile import readHeader
 
 #------------------------------------------------------------------------------
 
@@ -56,10 +57,6 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see http://www.gnu.org/licenses/.
 '''
 
-# todo: use real parsers for these...
-localvars_cre   = re.compile(r'-\*-.*dnssync-config:\s+([^\s]+).*-\*-')
-localorigin_cre = re.compile(r'\$ORIGIN\s+([^\s]+)')
-
 SERVICES_PLUGINS        = 'dnssync.services.plugins'
 
 #------------------------------------------------------------------------------
@@ -167,6 +164,87 @@ def LogRecord_getMessage_i18n(self):
 logging.LogRecord._real_getMessage = logging.LogRecord.getMessage
 logging.LogRecord.getMessage = LogRecord_getMessage_i18n
 
+#------------------------------------------------------------------------------
+def loadConfig(filename):
+  '''
+  Loads the dnssync configuration file `filename` and returns a
+  ConfigParser with all "${ENV:NAME}" references expanded.
+  '''
+  config = configparser.SafeConfigParser()
+  config.optionxform = str.lower
+  config.read(filename)
+  for section in ['DEFAULT'] + config.sections():
+    for key, val in config.items(section):
+      config.set(section, key, evalenv(val))
+  return config
+
+#------------------------------------------------------------------------------
+def configParams(config, section, params):
+  '''
+  Sets any parameters in `params` that are not already set to the
+  values specified in the configuration `section` (or the defaults,
+  if `section` is ``'DEFAULT'``). Returns `params`.
+  '''
+  for attr in config.options(section) if section != 'DEFAULT' else config.defaults().keys():
+    if params.get(attr) is None:
+      params[attr] = config.get(section, attr)
+  return params
+
+#------------------------------------------------------------------------------
+def accountKey(params):
+  '''
+  Returns a hashable key that identifies the hosted DNS provider
+  account described by `params`, i.e. all parameters except the ones
+  that are specific to a single zone.
+  '''
+  return tuple(sorted(
+    (key, val) for key, val in params.items()
+    if key not in ('domain', 'zonefile') and val is not None))
+
+#------------------------------------------------------------------------------
+def syncAll(cli, options, params):
+  '''
+  Implements the "sync-all" command: every section in the
+  configuration file is taken to be a zone, and is diff'ed (or
+  uploaded, with ``--upload``) against its `zonefile`. Zones that use
+  the same account share a single (logged-in) driver.
+  '''
+  if not options.config:
+    cli.error(_('the "sync-all" command requires a configuration file'))
+  config  = loadConfig(options.config)
+  drivers = {}
+  zones   = []
+  for section in config.sections():
+    zparams = configParams(config, section, aadict(params))
+    zone    = aadict(
+      domain   = absdom(section),
+      zonefile = zparams.zonefile,
+      driver   = None,
+      error    = None,
+    )
+    zones.append(zone)
+    try:
+      if not zparams.driver:
+        raise error.ConfigurationError(
+          _('required parameter "driver" not specified'))
+      if not zone.zonefile:
+        raise error.ConfigurationError(
+          _('required parameter "zonefile" not specified'))
+      key = accountKey(zparams)
+      if key not in drivers:
+        try:
+          plugins = asset.plugins(SERVICES_PLUGINS, zparams.driver)
+        except ValueError as err:
+          raise error.ConfigurationError(
+            _('unknown/unavailable driver "{}"', zparams.driver))
+        drivers[key] = plugins.handle(None, zparams)
+      zone.driver = drivers[key]
+    except error.Error as err:
+      zone.error = err
+  command = 'upload' if options.upload else 'diff'
+  results = engine.runAll(command, zones, options, jobs=options.parallel)
+  return engine.writeReport(command, results)
+
 #------------------------------------------------------------------------------
 def main(args=None):
 
@@ -204,6 +282,26 @@ def main(args=None):
     help=_('set and/or override the driver parameter named'
            ' "NAME" to "VALUE"'))
 
+  common.add_argument(
+    _('-j'), _('--jobs'), metavar=_('N'),
+    dest='jobs', default=None, type=int,
+    help=_('apply up to N record changes concurrently (defaults to 1,'
+           ' i.e. sequentially); same as "--param jobs=N"'))
+
+  common.add_argument(
+    _('-J'), _('--parse-jobs'), metavar=_('N'),
+    dest='parsejobs', default=None, type=int,
+    help=_('parse large zonefiles with up to N worker processes'
+           ' (defaults to 1, i.e. in-process); if more than 1, "upload"'
+           ' also fetches the hosted zone while the zonefile is parsed'
+           ' (instead of streaming the zonefile)'))
+
+  common.add_argument(
+    _('-C'), _('--cache-dir'), metavar=_('DIRECTORY'),
+    dest='cachedir', default=None,
+    help=_('directory to cache zone data in between runs (disabled by'
+           ' default); same as "--param cachedir=DIRECTORY"'))
+
   common.add_argument(
     _('--warranty'),
     dest='warranty', default=False, action='store_true',
@@ -248,6 +346,11 @@ def main(args=None):
     'zonefile', metavar=_('ZONEFILE'),
     nargs='?',
     help=_('the filename of the local zone file'))
+  subcli.add_argument(
+    _('-e'), _('--estimate'),
+    dest='estimate', default=False, action='store_true',
+    help=_('only show how many changes would be made and the'
+           ' approximate number of requests they would take'))
   subcli.set_defaults(command='upload')
 
   # DIFF command
@@ -260,6 +363,12 @@ def main(args=None):
     'zonefile', metavar=_('ZONEFILE'),
     nargs='?',
     help=_('the filename of the local zone file'))
+  subcli.add_argument(
+    _('-X'), _('--external'),
+    dest='external', default=False, action='store_true',
+    help=_('compare the zones with an on-disk sort-merge instead of'
+           ' in memory (i.e. with bounded memory, for very large'
+           ' zones)'))
   subcli.set_defaults(command='diff')
 
   # VERIFY command
@@ -271,12 +380,43 @@ def main(args=None):
     _('-s'), _('--server'), metavar=_('HOSTNAME'),
     dest='server', default=None,
     help=_('server to query (defaults to standard DNS)'))
+  subcli.add_argument(
+    _('-Q'), _('--queries'), metavar=_('N'),
+    dest='queries', default=engine.DEFAULT_QUERIES, type=int,
+    help=_('maximum number of concurrent DNS queries (default: %(default)s)'))
+  subcli.add_argument(
+    _('-r'), _('--retries'), metavar=_('N'),
+    dest='retries', default=engine.DEFAULT_RETRIES, type=int,
+    help=_('number of times to retry a DNS query that timed out; the'
+           ' last retry is made over TCP (default: %(default)s)'))
+  subcli.add_argument(
+    _('-x'), _('--axfr'),
+    dest='axfr', default=False, action='store_true',
+    help=_('fetch the zone from the server (which requires "--server")'
+           ' via a single zone transfer, falling back to per-name'
+           ' queries if the transfer is refused'))
   subcli.add_argument(
     'zonefile', metavar=_('ZONEFILE'),
     nargs='?',
     help=_('the filename of the local zone file'))
   subcli.set_defaults(command='verify')
 
+  # SYNC-ALL command
+  subcli = subcmds.add_parser(
+    _('sync-all'),
+    parents=[common],
+    help=_('diff (or upload) all of the zones in a configuration file'))
+  subcli.add_argument(
+    _('-u'), _('--upload'),
+    dest='upload', default=False, action='store_true',
+    help=_('upload the zones instead of only showing the differences'))
+  subcli.add_argument(
+    _('-P'), _('--parallel'), metavar=_('N'),
+    dest='parallel', default=4, type=int,
+    help=_('number of zones to process concurrently, shared between the'
+           ' accounts (default: %(default)s)'))
+  subcli.set_defaults(command='sync-all')
+
   # todo: if only "--warranty" is specified, parse_args aborts... therefore
   #       adding hack here... note that this is still not "perfect", since
   #       the args may be "-v --warranty", which would also abort. ugh.
@@ -293,6 +433,8 @@ def main(args=None):
   # todo: copy over *all* options?...
   params.driver   = options.driver or params.driver
   params.domain   = options.domain or params.domain
+  params.jobs     = options.jobs or params.jobs
+  params.cachedir = options.cachedir or params.cachedir
   params.zonefile = getattr(options, 'zonefile', None) or params.zonefile
 
   if options.warranty:
@@ -319,26 +461,18 @@ def main(args=None):
   elif options.verbose > 2   : rootlog.setLevel(1)
 
   if getattr(options, 'zonefile', None) and os.path.exists(options.zonefile):
-    with open(options.zonefile, 'rb') as fp:
-      data = fp.read()
-      if not options.config:
-        match = localvars_cre.search(data)
-        if match:
-          options.config = os.path.join(
-            os.path.dirname(options.zonefile), match.group(1))
-      if not params.domain:
-        # todo: perhaps use dns.zone for this?...
-        match = localorigin_cre.search(data)
-        if match:
-          params.domain = match.group(1)
+    header = readHeader(options.zonefile)
+    if not options.config and header.config:
+      options.config = os.path.join(
+        os.path.dirname(options.zonefile), header.config)
+    if not params.domain and header.origin:
+      params.domain = header.origin
+
+  if options.command == 'sync-all':
+    return syncAll(cli, options, params)
 
   if options.config:
-    config = configparser.SafeConfigParser()
-    config.optionxform = str.lower
-    config.read(options.config)
-    for section in ['DEFAULT'] + config.sections():
-      for key, val in config.items(section):
-        config.set(section, key, evalenv(val))
+    config  = loadConfig(options.config)
     section = params.domain
     if not section and config.has_option('DEFAULT', 'domain'):
       section = config.get('DEFAULT', 'domain')
@@ -349,9 +483,7 @@ def main(args=None):
         section = reldom(section)
       else:
         section = 'DEFAULT'
-    for attr in config.options(section) if section != 'DEFAULT' else config.defaults().keys():
-      if params.get(attr) is None:
-        params[attr] = config.get(section, attr)
+    configParams(config, section, params)
     if not getattr(options, 'zonefile', None):
       if config.has_option(section, 'zonefile'):
         # TODO: make relative to config...
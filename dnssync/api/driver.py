@@ -19,15 +19,26 @@
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #------------------------------------------------------------------------------
 
+import os
 import logging
+import threading
 
+import six
+from six.moves.urllib import parse as urlparse
 import dns.rdata
 import dns.zone
+import morph
 from dns.exception import SyntaxError
 from aadict import aadict
 
 from .i18n import _
-from .record import Record
+from .record import Record, recordsToZone, normalizeContent
+from .parallel import pmap, Controller
+from .cache import SnapshotCache, ZoneCache
+from .store import RecordStore
+from .zonefile import ZoneFile
+from .transport import Transport, DEFAULT_TIMEOUT, DEFAULT_RETRIES
+from .session import SessionStore
 from . import error
 
 #------------------------------------------------------------------------------
@@ -47,6 +58,42 @@ class Driver(object):
   #   '''
   #   raise NotImplementedError()
 
+  # whether or not different zones can be operated on concurrently
+  # with a single driver. drivers for providers that track the
+  # "current" zone in the server-side session must set this to False.
+  concurrentZones = True
+
+  # the (lower-case) phrases that identify an error message from the
+  # provider as a request to slow down (see :meth:`checkRateLimit`)
+  RATELIMIT_MARKERS = (
+    'too many requests', 'rate limit', 'try again later', 'slow down')
+
+  # the URL paths of the provider's login page(s): a response for (or
+  # a redirect to) one of them means the session has expired (see
+  # :meth:`isLoginResponse`)
+  LOGINPATHS = ()
+
+  # what the hosted DNS provider can do efficiently, which determines
+  # how record changes are scheduled (see :meth:`scheduleChanges`) and
+  # estimated (see :meth:`estimateRequests`):
+  #
+  #   batch:  the maximum number of record creates, updates and deletes
+  #           that :meth:`createRecords`, :meth:`updateRecords` and
+  #           :meth:`deleteRecords` can send in a single call.
+  #   bytype: if true, all the changes to records of one type are sent
+  #           together by :meth:`putChangesByType` instead (this is
+  #           implied if a subclass overrides :meth:`putChangesByType`).
+  #   jobs:   the maximum number of calls that can safely be made
+  #           concurrently (None means no limit beyond :attr:`jobs`).
+  #   cost:   the number of requests made by each create, update and
+  #           delete call, and by each :meth:`putChangesByType` call.
+  capabilities = aadict(
+    batch  = aadict(create=1, update=1, delete=1),
+    bytype = False,
+    jobs   = None,
+    cost   = aadict(create=1, update=1, delete=1, type=1),
+  )
+
   #----------------------------------------------------------------------------
   @property
   def name(self):
@@ -69,6 +116,259 @@ class Driver(object):
       raise Value
     super(Driver, self).__init__(*args, **kw)
     self.params = params
+    self.lock   = threading.RLock()
+    # the zone that the provider's server-side session is switched to,
+    # for drivers that need to (see :attr:`concurrentZones`)
+    self.currentZone = None
+    self._catalog    = None
+    self._catalogFetched = False
+    self._prefetched = dict()
+
+  #----------------------------------------------------------------------------
+  @property
+  def jobs(self):
+    '''
+    The maximum number of record changes that will be sent to the
+    hosted DNS provider concurrently, as set by the "jobs" parameter.
+    Defaults to 1, i.e. changes are applied sequentially.
+
+    Subclasses that issue concurrent requests must protect any shared
+    state (e.g. a lazily created session) with :attr:`lock`.
+    '''
+    return max(1, int(self.params.get('jobs') or 1))
+
+  #----------------------------------------------------------------------------
+  def makeTransport(self):
+    '''
+    Returns a new :class:`dnssync.api.transport.Transport` for drivers
+    that talk HTTP to the hosted DNS provider, configured by the
+    "timeout" (per request, in seconds), "deadline" (for all requests,
+    in seconds) and "retries" parameters, with a connection pool large
+    enough for :attr:`jobs` concurrent requests.
+    '''
+    params = self.params
+    return Transport(
+      timeout  = float(params.get('timeout') or DEFAULT_TIMEOUT),
+      deadline = float(params.get('deadline') or 0) or None,
+      retries  = int(params.get('retries') or DEFAULT_RETRIES),
+      poolsize = max(self.jobs, 10),
+      controller = self.controller,
+    )
+
+  #----------------------------------------------------------------------------
+  @property
+  def sessionstore(self):
+    '''
+    The :class:`dnssync.api.session.SessionStore` in which the drivers
+    that log in to the provider keep their session between runs, or
+    ``None`` if either of the "cachedir" or "sessionkey" parameters is
+    not set.
+    '''
+    with self.lock:
+      if getattr(self, '_sessionstore', None) is None \
+          and self.params.cachedir and self.params.sessionkey:
+        self._sessionstore = SessionStore(
+          os.path.join(os.path.expanduser(self.params.cachedir), 'sessions'),
+          self.params.sessionkey)
+      return getattr(self, '_sessionstore', None)
+
+  #----------------------------------------------------------------------------
+  def isLoginResponse(self, resp):
+    '''
+    Returns whether or not the response `resp` is (or redirects to)
+    one of the provider's :attr:`LOGINPATHS`, i.e. whether the session
+    has expired.
+    '''
+    urls = [resp.url]
+    if resp.is_redirect:
+      urls.append(resp.headers.get('location'))
+    for url in urls:
+      path = urlparse.urlsplit(url or '').path
+      if path in self.LOGINPATHS:
+        return True
+    return False
+
+  #----------------------------------------------------------------------------
+  def resumeSession(self, transport, login):
+    '''
+    Authenticates `transport` either by restoring the session stored
+    in :attr:`sessionstore` or, if there is none, by calling `login`
+    (which must log in via `transport`) and storing the new session.
+    If the session later expires, it is transparently renewed (see
+    :class:`dnssync.api.transport.Transport`).
+    '''
+    store = self.sessionstore
+    if store is None or not store.load(self.name, self.account, transport.cookies):
+      login()
+      if store is not None:
+        store.save(self.name, self.account, transport.cookies)
+    else:
+      log.debug('resumed stored %s session', self.name)
+    def _renew():
+      with self.lock:
+        # a new server-side session has no current zone: switch back to
+        # the zone that the expired session was on before the request
+        # that detected the expiry is re-sent
+        zone = self.currentZone
+        self.currentZone = None
+        transport.cookies.clear()
+        login()
+        if store is not None:
+          store.save(self.name, self.account, transport.cookies)
+        if zone is not None:
+          self._switchToZone(zone)
+    transport.expired = self.isLoginResponse
+    transport.renew   = _renew
+
+  #----------------------------------------------------------------------------
+  def _switchToZone(self, name):
+    '''
+    Switches the provider's server-side session to the zone named
+    `name` and sets :attr:`currentZone`; only needed (and called) for
+    drivers whose provider tracks the "current" zone in the session
+    (see :attr:`concurrentZones`).
+    '''
+    raise NotImplementedError()
+
+  #----------------------------------------------------------------------------
+  def _zones(self):
+    '''
+    Fetches the zone catalog from the hosted DNS provider, i.e. a dict
+    mapping the (absolute) names of the zones in the account to the
+    provider's zone ids (which must be JSON-serializable). Drivers
+    should not call this directly, but use :meth:`zones` instead.
+    '''
+    raise NotImplementedError()
+
+  #----------------------------------------------------------------------------
+  def zones(self, refresh=False):
+    '''
+    Returns the zone catalog of the account (see :meth:`_zones`). The
+    catalog is only fetched once per run (unless `refresh` is true)
+    and, if the "catalogttl" parameter is set, is stored in the
+    snapshot cache for that many seconds.
+    '''
+    with self.lock:
+      if refresh or self._catalog is None:
+        cache = self.cache
+        ttl   = float(self.params.get('catalogttl') or 0)
+        zones = None
+        if cache and ttl and not refresh:
+          zones = cache.loadCatalog(self.name, self.account, ttl)
+        if zones is None:
+          zones = self._zones()
+          self._catalogFetched = True
+          if cache and ttl:
+            cache.saveCatalog(self.name, self.account, zones)
+        self._catalog = zones
+      return self._catalog
+
+  #----------------------------------------------------------------------------
+  def zoneId(self, name):
+    '''
+    Returns the provider's id of the zone named `name` from the zone
+    catalog (see :meth:`zones`), which is re-fetched once if the zone
+    is not in a catalog that was loaded from the snapshot cache.
+    Raises :class:`dnssync.api.DomainNotFound` if the account does not
+    have the zone.
+    '''
+    zones = self.zones()
+    if name not in zones and not self._catalogFetched:
+      zones = self.zones(refresh=True)
+    if name not in zones:
+      raise error.DomainNotFound(
+        _('this {} account does not manage domain "{}"', self.name, name))
+    return zones[name]
+
+  #----------------------------------------------------------------------------
+  @property
+  def controller(self):
+    '''
+    The :class:`dnssync.api.parallel.Controller` that adapts the number
+    of concurrent calls to the hosted DNS provider (up to :attr:`jobs`
+    and the `jobs` capability) to the provider's feedback. A driver is
+    shared by all the operations against one account, and so is its
+    controller.
+    '''
+    with self.lock:
+      if getattr(self, '_controller', None) is None:
+        jobs = self.jobs
+        if self.capabilities.jobs:
+          jobs = min(jobs, self.capabilities.jobs)
+        self._controller = Controller(jobs)
+      return self._controller
+
+  #----------------------------------------------------------------------------
+  def checkRateLimit(self, message):
+    '''
+    Raises :class:`dnssync.api.RateLimited` if the provider's error
+    `message` matches one of :attr:`RATELIMIT_MARKERS`.
+    '''
+    text = ( message or '' ).lower()
+    for marker in self.RATELIMIT_MARKERS:
+      if marker in text:
+        raise error.RateLimited(message)
+
+  #----------------------------------------------------------------------------
+  @property
+  def columnar(self):
+    '''
+    Whether or not :meth:`loadRecords` returns the records in a compact
+    :class:`dnssync.api.store.RecordStore` instead of a list, as set
+    by the "columnar" parameter. Defaults to false.
+    '''
+    return morph.tobool(self.params.get('columnar'))
+
+  #----------------------------------------------------------------------------
+  @property
+  def account(self):
+    '''
+    An identifier of the account at the hosted DNS provider that this
+    driver operates on; used to key cached data. Defaults to the
+    "username" parameter.
+    '''
+    return self.params.username
+
+  #----------------------------------------------------------------------------
+  @property
+  def cache(self):
+    '''
+    The :class:`dnssync.api.cache.SnapshotCache` used to avoid
+    re-fetching unchanged zones, or ``None`` if the "cachedir"
+    parameter is not set.
+    '''
+    with self.lock:
+      if getattr(self, '_cache', None) is None and self.params.cachedir:
+        self._cache = SnapshotCache(os.path.join(
+          os.path.expanduser(self.params.cachedir), 'snapshots.db'))
+      return getattr(self, '_cache', None)
+
+  #----------------------------------------------------------------------------
+  @property
+  def zonecache(self):
+    '''
+    The :class:`dnssync.api.cache.ZoneCache` used to avoid re-parsing
+    unchanged zonefiles, or ``None`` if the "cachedir" parameter is not
+    set.
+    '''
+    with self.lock:
+      if getattr(self, '_zonecache', None) is None and self.params.cachedir:
+        self._zonecache = ZoneCache(os.path.join(
+          os.path.expanduser(self.params.cachedir), 'zones'))
+      return getattr(self, '_zonecache', None)
+
+  #----------------------------------------------------------------------------
+  def getSerial(self, name):
+    '''
+    Returns the current SOA serial number of the zone named `name`
+    as an integer, or ``None`` if it cannot be determined without
+    fetching the whole zone. This is used to validate cached zone
+    snapshots, and should therefore be much cheaper than
+    :meth:`getRecords` (e.g. a DNS query against the provider's
+    authoritative name server). The default implementation returns
+    ``None``, which disables snapshot caching.
+    '''
+    return None
 
   #----------------------------------------------------------------------------
   def list(self):
@@ -76,7 +376,7 @@ class Driver(object):
     Fetches the list of zones maintained under the current account on
     the current hosted DNS provider.
     '''
-    raise NotImplementedError()
+    return list(self.zones().keys())
 
   #----------------------------------------------------------------------------
   def get(self, name):
@@ -84,21 +384,16 @@ class Driver(object):
     Fetches the zone named `name` (an absolute domain name) from the
     current hosted DNS provider.
     '''
-    # TODO: i should really be building this from dns.zone.* calls...
-    #       but dnspython is *so* unintuitive! ugh.
-    #       ==> well, one of the reasons that this is useful is that
-    #           the record in getRecords() have id's, which are used
-    #           during updating.
-    lines = []
-    for record in self.getRecords(name):
-      lines.append(record.toText())
-    data = '\n'.join(lines)
+    # note: the zone is built from the records returned by getRecords()
+    #       (rather than directly by the drivers) since the records
+    #       carry the provider ids that are needed during updating.
+    records = self.loadRecords(name)
     try:
-      return dns.zone.from_text(data, origin=name, relativize=False)
+      return recordsToZone(records, name)
     except SyntaxError as err:
       log.exception(
         'failed while trying to parse zonefile:\n  %s',
-        '\n  '.join(data.split('\n')))
+        '\n  '.join(record.toText() for record in records))
       raise
 
   #----------------------------------------------------------------------------
@@ -110,13 +405,92 @@ class Driver(object):
     '''
     raise NotImplementedError()
 
+  #----------------------------------------------------------------------------
+  def loadRecords(self, name):
+    '''
+    Returns the same list of records as :meth:`getRecords`, but uses
+    the snapshot cache (if enabled) when the zone's current serial
+    (see :meth:`getSerial`) matches the cached snapshot's serial. If
+    :attr:`columnar` is enabled, the records are returned in a
+    :class:`dnssync.api.store.RecordStore`.
+    '''
+    cache  = self.cache
+    serial = self.getSerial(name) if cache else None
+    if serial is None:
+      return self._storeRecords(self.getRecords(name))
+    snap = cache.load(self.name, self.account, name)
+    if snap and snap.serial == serial:
+      log.debug('using cached snapshot of zone "%s" (serial %s)', name, serial)
+      return self._storeRecords(snap.records)
+    records = self.getRecords(name)
+    cache.save(self.name, self.account, name, serial, records)
+    return self._storeRecords(records)
+
+  #----------------------------------------------------------------------------
+  def _storeRecords(self, records):
+    if not self.columnar or isinstance(records, RecordStore):
+      return records
+    return RecordStore(records)
+
+  #----------------------------------------------------------------------------
+  def _updateSnapshot(self, context, creates, updates, deletes):
+    # bring the cached snapshot up to date with the changes that were
+    # just applied, so that the next run does not need to re-fetch it.
+    # note that created records cannot be cached since their
+    # provider-assigned identifiers are unknown.
+    cache = self.cache
+    if not cache or not ( creates or updates or deletes ):
+      return
+    serial = self.getSerial(context.name)
+    if creates or serial is None:
+      cache.delete(self.name, self.account, context.name)
+      return
+    records = []
+    for pos, record in enumerate(context.records):
+      if pos in context.deleted:
+        continue
+      newrecord = context.updated.get(pos)
+      if newrecord is not None:
+        record.update(
+          ttl=newrecord.ttl, content=newrecord.content, priority=newrecord.priority)
+      if record.type == Record.TYPE_SOA:
+        fields = record.content.split(' ')
+        fields[2] = str(serial)
+        record.content = ' '.join(fields)
+      records.append(record)
+    cache.save(self.name, self.account, context.name, serial, records)
+
+  #----------------------------------------------------------------------------
+  def prefetchRecords(self, name):
+    '''
+    Loads the records of the zone named `name` (see :meth:`loadRecords`)
+    ahead of the next :meth:`put` (or :meth:`plan`) of that zone, which
+    then uses them instead of loading them itself. This allows the
+    engine to fetch the hosted zone while the local zonefile is being
+    parsed.
+    '''
+    records = self.loadRecords(name)
+    with self.lock:
+      self._prefetched[name] = records
+
   #----------------------------------------------------------------------------
   def makePutContext(self, name, zone):
+    # note: `newrecords` is a generator so that `zone` can be a
+    # streaming :class:`dnssync.api.zonefile.ZoneFile`; subclasses
+    # that need to iterate it more than once must convert it to a list.
+    if isinstance(zone, ZoneFile):
+      newrecords = zone.records()
+    else:
+      newrecords = (Record.from_rdata(rdata) for rdata in zone.iterate_rdatas())
+    with self.lock:
+      records = self._prefetched.pop(name, None)
+    if records is None:
+      records = self.loadRecords(name)
     return aadict(
       name       = name,
       zone       = zone,
-      records    = self.getRecords(name),
-      newrecords = [Record.from_rdata(rdata) for rdata in zone.iterate_rdatas()],
+      records    = records,
+      newrecords = newrecords,
     )
 
   #----------------------------------------------------------------------------
@@ -127,55 +501,227 @@ class Driver(object):
 
     Returns the stats on how many records were added/updated/deleted
     by returning an object with numeric `created`, `updated`, and
-    `deleted` attributes.
+    `deleted` attributes. If any changes were refused (e.g. an SOA
+    serial regression), their count is set in the `refused` attribute.
+    '''
+    plan = self.plan(name, zone)
+    log.info(
+      'applying %d change(s) to zone "%s" in about %d request(s)',
+      len(plan.creates) + len(plan.updates) + len(plan.deletes), name,
+      self.estimateRequests(plan.creates, plan.updates, plan.deletes))
+    try:
+      ret = self.putChanges(plan.context, plan.creates, plan.updates, plan.deletes)
+    except Exception:
+      # some of the changes may have been applied, i.e. the snapshot
+      # (if any) can no longer be trusted
+      if self.cache:
+        self.cache.delete(self.name, self.account, name)
+      raise
+    self._updateSnapshot(plan.context, plan.creates, plan.updates, plan.deletes)
+    if plan.refused:
+      ret.refused = plan.refused
+    return ret
+
+  #----------------------------------------------------------------------------
+  def plan(self, name, zone):
+    '''
+    Determines the changes that :meth:`put` makes to update the zone
+    named `name` to the specification in `zone`, without applying
+    them. Returns an object with the attributes `context` (see
+    :meth:`makePutContext`), `creates` (a list of new records),
+    `updates` (a dict mapping existing records to their new version),
+    `deletes` (a list of existing records) and `refused` (the number
+    of refused changes).
     '''
     context = self.makePutContext(name, zone)
     creates = []
     updates = {}
-    deletes = []
-    records = context.records[:]
+    refused = 0
+    index   = self._indexRecords(context.records)
+    # note: existing records are tracked by position (rather than by
+    # object) since `context.records` may be a RecordStore.
+    matched = set()
+    pending = {}
+    context.updated = {}
+    # first pass: pair each new record with an identical existing one
+    # (which can at most need a TTL update). only the new records that
+    # have no identical counterpart are kept, by RRset, for the second
+    # pass: pairing them with the remaining existing records of the
+    # same RRset (see :meth:`_assignRecords`) so that each pair becomes
+    # a single update instead of a delete and a create.
     for record in context.newrecords:
-      match  = self._matchRecord(context, record)
-      if not match:
-        creates.append(record)
-      else:
-        records.remove(match)
-        if not self._recordChanged(match, record):
+      pos = self._matchIndex(context, record, index, matched)
+      if pos is None:
+        pending.setdefault(self._rrsetKey(record), []).append(record)
+        continue
+      matched.add(pos)
+      refused += self._planUpdate(context, updates, pos, record)
+    for key, records in pending.items():
+      free = [pos for pos in index.byrrset.get(key, ()) if pos not in matched]
+      for record, pos in self._assignRecords(context, records, free):
+        if pos is None:
+          creates.append(record)
           continue
-        if match.type == 'SOA':
-          mseq = int(match.content.split(' ')[2])
-          useq = int(record.content.split(' ')[2])
-          if useq < mseq:
-            log.error(
-              'refusing to update SOA record (serial %r is less than %r)', useq, mseq)
-            continue
-        updates[match] = record
-    for record in records:
-      deletes.append(record)
-    return self.putChanges(context, creates, updates, deletes)
+        matched.add(pos)
+        refused += self._planUpdate(context, updates, pos, record)
+    context.deleted = set(range(len(context.records))) - matched
+    deletes = [context.records[pos] for pos in sorted(context.deleted)]
+    return aadict(
+      context=context, creates=creates, updates=updates, deletes=deletes,
+      refused=refused)
+
+  #----------------------------------------------------------------------------
+  def _planUpdate(self, context, updates, pos, record):
+    # plans the update of the existing record at `pos` to `record` (if
+    # they differ), and returns 1 if the update was refused, 0 if not.
+    match = context.records[pos]
+    if not self._recordChanged(match, record):
+      return 0
+    if match.type == 'SOA':
+      mseq = int(match.content.split(' ')[2])
+      useq = int(record.content.split(' ')[2])
+      if useq < mseq:
+        log.error(
+          'refusing to update SOA record (serial %r is less than %r)', useq, mseq)
+        return 1
+    updates[match] = record
+    context.updated[pos] = record
+    return 0
+
+  #----------------------------------------------------------------------------
+  def _assignRecords(self, context, records, positions):
+    '''
+    Pairs the new records `records` with the existing records at
+    `positions` in `context.records`, all of the same RRset and none
+    of them identical, and returns a list of (record, position) pairs,
+    where position is ``None`` for the records that must be created.
+    Since every pair is one update (instead of a delete and a create),
+    as many pairs as possible are made; among those, the pairs that
+    differ in the fewest fields (see :meth:`_recordCost`) are chosen
+    first.
+    '''
+    if not positions:
+      return [(record, None) for record in records]
+    costs = sorted(
+      (self._recordCost(context.records[pos], record), ridx, pidx)
+      for ridx, record in enumerate(records)
+      for pidx, pos in enumerate(positions))
+    assigned = {}
+    used     = set()
+    for cost, ridx, pidx in costs:
+      if ridx in assigned or pidx in used:
+        continue
+      assigned[ridx] = positions[pidx]
+      used.add(pidx)
+    return [(record, assigned.get(ridx)) for ridx, record in enumerate(records)]
+
+  #----------------------------------------------------------------------------
+  def _recordCost(self, record, newrecord):
+    # the number of fields that updating `record` to `newrecord` changes
+    return sum(
+      getattr(record, field) != getattr(newrecord, field)
+      for field in ('priority', 'weight', 'port', 'ttl')) \
+      + ( self._normalizeContent(record) != self._normalizeContent(newrecord) )
+
+  #----------------------------------------------------------------------------
+  def scheduleChanges(self, creates, updates, deletes):
+    '''
+    Arranges the record changes into a list of phases, each a list of
+    calls that are independent of each other (and can therefore be
+    made concurrently), according to :attr:`capabilities`. Each call
+    is an object with an `op` attribute and:
+
+    * for ``create`` and ``delete``: a list of `records`
+    * for ``update``: a list of (record, newrecord) `changes`
+    * for ``type``: the `rtype` and its `creates`, `updates` and
+      `deletes` (see :meth:`putChangesByType`)
+
+    The creates, updates and deletes are kept in separate phases, in
+    that order, so that, for example, a zone is never left without any
+    NS records.
+    '''
+    caps = self.capabilities
+    # note: drivers written before `capabilities` existed implement
+    # by-type changes by overriding `putChangesByType` alone
+    if caps.bytype or self._overrides('putChangesByType'):
+      types = {}
+      for record in creates:
+        types.setdefault(record.type, aadict(creates=[], updates={}, deletes=[])) \
+          .creates.append(record)
+      for record, newrecord in updates.items():
+        types.setdefault(record.type, aadict(creates=[], updates={}, deletes=[])) \
+          .updates[record] = newrecord
+      for record in deletes:
+        types.setdefault(record.type, aadict(creates=[], updates={}, deletes=[])) \
+          .deletes.append(record)
+      return [[aadict(op='type', rtype=rtype, **changes)
+               for rtype, changes in sorted(types.items())]]
+    ret = []
+    for op, attr, items in (
+        ('create', 'records', creates),
+        ('update', 'changes', list(updates.items())),
+        ('delete', 'records', deletes)):
+      size = max(1, caps.batch[op] or 1)
+      ret.append([aadict(op=op, **{attr: items[idx:idx + size]})
+                  for idx in range(0, len(items), size)])
+    return ret
+
+  #----------------------------------------------------------------------------
+  def estimateRequests(self, creates, updates, deletes):
+    '''
+    Returns the approximate number of requests to the hosted DNS
+    provider that applying the specified changes will take.
+    '''
+    cost = self.capabilities.cost
+    return sum(
+      cost[call.op]
+      for phase in self.scheduleChanges(creates, updates, deletes)
+      for call in phase)
 
   #----------------------------------------------------------------------------
   def putChanges(self, context, creates, updates, deletes):
-    types = {}
-    for record in creates:
-      if record.type not in types:
-        types[record.type] = aadict(creates=[], updates={}, deletes=[])
-      types[record.type].creates.append(record)
-    for record, newrecord in updates.items():
-      if record.type not in types:
-        types[record.type] = aadict(creates=[], updates={}, deletes=[])
-      types[record.type].updates[record] = newrecord
-    for record in deletes:
-      if record.type not in types:
-        types[record.type] = aadict(creates=[], updates={}, deletes=[])
-      types[record.type].deletes.append(record)
-    for rtype, params in types.items():
-      self.putChangesByType(context, rtype, **params)
+    # note: `controller` keeps the number of calls actually in flight
+    # within the provider's (adaptive) limit
+    controller = self.controller
+    for phase in self.scheduleChanges(creates, updates, deletes):
+      pmap(
+        lambda call: controller.call(self._putCall, context, call),
+        phase, controller.maxlimit)
     return aadict(
       created=len(creates), updated=len(updates), deleted=len(deletes))
 
+  #----------------------------------------------------------------------------
+  def _putCall(self, context, call):
+    if call.op == 'type':
+      return self.putChangesByType(
+        context, call.rtype, call.creates, call.updates, call.deletes)
+    if call.op == 'update':
+      for record, newrecord in call.changes:
+        log.info('updating %s record: %s (%s)', record.type, record.name, newrecord.content)
+      if len(call.changes) == 1:
+        return self.updateRecord(context, *call.changes[0])
+      return self.updateRecords(context, call.changes)
+    for record in call.records:
+      log.info('%s %s record: %s (%s)',
+               'creating' if call.op == 'create' else 'deleting',
+               record.type, record.name, record.content)
+    if call.op == 'create':
+      if len(call.records) == 1:
+        return self.createRecord(context, call.records[0])
+      return self.createRecords(context, call.records)
+    if len(call.records) == 1:
+      return self.deleteRecord(context, call.records[0])
+    return self.deleteRecords(context, call.records)
+
   #----------------------------------------------------------------------------
   def putChangesByType(self, context, rtype, creates, updates, deletes):
+    '''
+    Applies all the changes to the records of type `rtype` together;
+    only called if :attr:`capabilities` has `bytype` set or a subclass
+    overrides this method. The default implementation applies the
+    creates, updates (a dict mapping existing records to their new
+    version) and deletes one record at a time, in that order.
+    '''
     for record in creates:
       log.info('creating %s record: %s (%s)', record.type, record.name, record.content)
       self.createRecord(context, record)
@@ -187,41 +733,100 @@ class Driver(object):
       self.deleteRecord(context, record)
 
   #----------------------------------------------------------------------------
-  def _matchRecord(self, context, record):
+  def _overrides(self, *names):
+    # whether or not this driver's class overrides any of the methods
+    # `names`. note that unbound methods (in python 2) are created on
+    # each access, i.e. they must be compared by their functions.
+    return any(
+      six.get_unbound_function(getattr(type(self), name))
+      is not six.get_unbound_function(getattr(Driver, name))
+      for name in names)
+
+  #----------------------------------------------------------------------------
+  def _recordKey(self, record):
+    # todo: what about SRV and NAPTR records... add more?...
+    return (record.rclass, record.type, record.priority, record.name)
+
+  #----------------------------------------------------------------------------
+  def _rrsetKey(self, record):
+    return (record.rclass, record.type, record.name)
+
+  #----------------------------------------------------------------------------
+  def _indexRecords(self, records):
+    '''
+    Builds a lookup index of `records` for use by :meth:`_matchIndex`
+    so that matching a complete zone does not require a scan of all
+    existing records per new record. The index maps the record key
+    (see :meth:`_recordKey`) extended with the normalized record
+    content (see :meth:`_normalizeContent`) to the positions of the
+    records with that key and content in `bycontent`, and the RRset
+    key (see :meth:`_rrsetKey`) to the positions of the records in that
+    RRset in `byrrset`. If `records` is a RecordStore, the index is
+    built directly from its columns.
+    '''
+    ret = aadict(bycontent={}, byrrset={})
+    if isinstance(records, RecordStore) and not self._overrides(
+        '_recordKey', '_rrsetKey', '_normalizeContent'):
+      items = (
+        (key, (key[0], key[1], key[3]), normalizeContent(key[1], content, key[0] or 'IN'))
+        for key, content in six.moves.zip(records.keys(), records.contents()))
+    else:
+      items = (
+        (self._recordKey(rec), self._rrsetKey(rec), self._normalizeContent(rec))
+        for rec in records)
+    for pos, (key, rrset, content) in enumerate(items):
+      ret.bycontent.setdefault(key + (content,), []).append(pos)
+      ret.byrrset.setdefault(rrset, []).append(pos)
+    return ret
+
+  #----------------------------------------------------------------------------
+  def _matchRecord(self, context, record, index=None):
+    pos = self._matchIndex(context, record, index)
+    return None if pos is None else context.records[pos]
+
+  #----------------------------------------------------------------------------
+  def _matchIndex(self, context, record, index=None, matched=None):
+    '''
+    Returns the position in `context.records` of an existing record
+    that is identical to `record` (i.e. has the same key and
+    normalized content)
+    and is not in the set of positions `matched`, or ``None`` if there
+    is none.
+    '''
     if not context.records:
       return None
-    records = [rec
-               for rec in context.records
-               if rec.rclass == record.rclass
-                 and rec.type == record.type
-                 and rec.priority == record.priority
-                 and rec.name == record.name
-               # todo: what about SRV and NAPTR records... add more?...
-    ]
-    if len(records) > 1:
-      # todo: are MX and NS records really the only ones that can be multiple?...
-      if record.type not in ('MX', 'NS'):
-        raise error.UnexpectedZoneState(
-          _('multiple records found for type "{type}"', type=record.type))
-      records = [rec for rec in records if rec.content == record.content]
-    if not records:
-      return None
-    if len(records) == 1:
-      return records[0]
-    raise error.UnexpectedZoneState(
-      _('multiple records found for type "{type}" with same content "{content}"',
-        type=record.type, content=record.content))
+    if index is None:
+      index = self._indexRecords(context.records)
+    positions = index.bycontent.get(
+      self._recordKey(record) + (self._normalizeContent(record),))
+    for pos in positions or ():
+      if not matched or pos not in matched:
+        return pos
+    return None
 
   #----------------------------------------------------------------------------
   def _recordChanged(self, record, newrecord):
     if record.ttl == newrecord.ttl \
-        and record.content == newrecord.content \
-        and record.priority == newrecord.priority:
+        and record.priority == newrecord.priority \
+        and ( record.content == newrecord.content
+              or self._normalizeContent(record) == self._normalizeContent(newrecord) ):
       # todo: anything else?... eg. for SRV and NAPTR records...
       #       ie. weight, proto, port, etc.
       return False
     return True
 
+  #----------------------------------------------------------------------------
+  def _normalizeContent(self, record):
+    '''
+    Returns the canonical version of `record`'s content that records
+    are matched and compared by (see
+    :func:`dnssync.api.record.normalizeContent`), so that differences
+    in notation alone do not cause updates. It is applied to both the
+    existing and the new record, so drivers whose provider rewrites
+    record content can apply the same rewrite here.
+    '''
+    return normalizeContent(record.type, record.content, record.rclass or 'IN')
+
   #----------------------------------------------------------------------------
   def createRecord(self, context, record):
     raise NotImplementedError()
@@ -234,6 +839,37 @@ class Driver(object):
   def deleteRecord(self, context, record):
     raise NotImplementedError()
 
+  #----------------------------------------------------------------------------
+  def createRecords(self, context, records):
+    '''
+    Creates all of `records` in as few requests as possible; only
+    called with more than one record if :attr:`capabilities` allows
+    batched creates.
+    '''
+    for record in records:
+      self.createRecord(context, record)
+
+  #----------------------------------------------------------------------------
+  def updateRecords(self, context, items):
+    '''
+    Updates each existing record to its new version in the list of
+    (record, newrecord) `items` in as few requests as possible; only
+    called with more than one item if :attr:`capabilities` allows
+    batched updates.
+    '''
+    for record, newrecord in items:
+      self.updateRecord(context, record, newrecord)
+
+  #----------------------------------------------------------------------------
+  def deleteRecords(self, context, records):
+    '''
+    Deletes all of `records` in as few requests as possible; only
+    called with more than one record if :attr:`capabilities` allows
+    batched deletes.
+    '''
+    for record in records:
+      self.deleteRecord(context, record)
+
 
 #------------------------------------------------------------------------------
 # end of $Id$
@@ -19,27 +19,42 @@
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #------------------------------------------------------------------------------
 
+import os
 import sys
-import difflib
 import subprocess
 import logging
 import socket
+import threading
+import itertools
+import collections
+from distutils.spawn import find_executable
 
 import six
+import dns.rdataclass
+import dns.rdatatype
 import dns.zone
+import dns.exception
+import dns.query
 import dns.resolver
 from aadict import aadict
 from six.moves import StringIO
 
 from .i18n import _
-from .util import absdom, reldom
+from .util import absdom, reldom, filedigest
 from .error import *
-from .record import Record
+from .record import Record, recordsToZone, recordsToRdatas
+from .parallel import pmap, concurrently
+from .zonefile import ZoneFile
+from .zonemd import zoneDigests, changedNames
+from .extsort import streamChanges
 
 #------------------------------------------------------------------------------
 
 log = logging.getLogger(__name__)
 
+DEFAULT_QUERIES = 16
+DEFAULT_RETRIES = 2
+
 #------------------------------------------------------------------------------
 def writeZone(ctxt, zone, fp):
   fp.write(';; -*- coding: utf-8{config} -*-\n'.format(
@@ -60,58 +75,345 @@ def cmd_download(ctxt):
 
 #------------------------------------------------------------------------------
 def renderDiff(lines, fp=None):
-  fp = fp or sys.stdout
-  from blessings import Terminal
-  if not Terminal().is_a_tty:
+  '''
+  Writes the diff `lines` (any iterable, which is only iterated over
+  once) to `fp` (defaults to stdout) as they are generated, colorized
+  by ``colordiff`` if available and writing to a terminal. Returns the
+  number of lines.
+  '''
+  fp    = fp or sys.stdout
+  lines = iter(lines)
+  first = next(lines, None)
+  if first is None:
+    return 0
+  lines = itertools.chain([first], lines)
+  count = [0]
+  def _counted():
     for line in lines:
-      fp.write(line + '\n')
+      count[0] += 1
+      yield line + '\n'
+  from blessings import Terminal
+  if Terminal().is_a_tty and find_executable('colordiff'):
+    try:
+      with open(os.devnull, 'wb') as devnull:
+        proc = subprocess.Popen(
+          'colordiff', shell=True, close_fds=True,
+          stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull)
+      def _copy():
+        for chunk in iter(lambda: proc.stdout.read(65536), b''):
+          fp.write(chunk)
+      thread = threading.Thread(target=_copy)
+      thread.start()
+      try:
+        for line in _counted():
+          proc.stdin.write(line)
+      finally:
+        proc.stdin.close()
+        thread.join()
+        proc.wait()
+      return count[0]
+    except EnvironmentError as err:
+      log.debug('colordiff failed: %s', err)
+  for line in _counted():
+    fp.write(line)
+  return count[0]
+
+#------------------------------------------------------------------------------
+def zoneChanges(zoneA, zoneB, names=None):
+  '''
+  Compares the zones `zoneA` and `zoneB` node by node and rdataset by
+  rdataset, and returns the list of differences. If `names`, a set of
+  :class:`dns.name.Name` objects, is specified, only those nodes are
+  compared (see :func:`dnssync.api.zonemd.changedNames`). Each
+  difference is an object with the attributes:
+
+  * `name`: the owner name (a :class:`dns.name.Name`)
+  * `rdtype`: the rdata type
+  * `old`: the rdataset in `zoneA`, or None if the rdataset was added
+  * `new`: the rdataset in `zoneB`, or None if the rdataset was removed
+
+  The differences are sorted by owner name (in DNSSEC canonical order)
+  and then rdata type.
+  '''
+  ret = []
+  for name, nodeA in zoneA.nodes.items():
+    if names is not None and name not in names:
+      continue
+    nodeB = zoneB.nodes.get(name)
+    other = dict(((rds.rdclass, rds.rdtype, rds.covers), rds)
+                 for rds in ( nodeB.rdatasets if nodeB else [] ))
+    for rdsA in nodeA.rdatasets:
+      rdsB = other.pop((rdsA.rdclass, rdsA.rdtype, rdsA.covers), None)
+      if rdsB is not None and rdsA.ttl == rdsB.ttl and set(rdsA) == set(rdsB):
+        continue
+      ret.append(aadict(name=name, rdtype=rdsA.rdtype, old=rdsA, new=rdsB))
+    for rdsB in other.values():
+      ret.append(aadict(name=name, rdtype=rdsB.rdtype, old=None, new=rdsB))
+  for name, nodeB in zoneB.nodes.items():
+    if name in zoneA.nodes or ( names is not None and name not in names ):
+      continue
+    for rdsB in nodeB.rdatasets:
+      ret.append(aadict(name=name, rdtype=rdsB.rdtype, old=None, new=rdsB))
+  ret.sort(key=lambda change: (change.name, change.rdtype))
+  return ret
+
+#------------------------------------------------------------------------------
+def _rrText(name, rdataset, rdata):
+  return '%s %d %s %s %s' % (
+    name.to_text(), rdataset.ttl,
+    dns.rdataclass.to_text(rdataset.rdclass),
+    dns.rdatatype.to_text(rdataset.rdtype),
+    rdata.to_text(relativize=False))
+
+#------------------------------------------------------------------------------
+def generateDiff(changes, labelA, labelB):
+  '''
+  Generates the lines of the `changes` returned by :func:`zoneChanges`
+  (or generated by :func:`dnssync.api.extsort.streamChanges`) in
+  unified diff format, with one hunk per changed rdataset, as each
+  change is generated (i.e. nothing if there are no changes).
+  '''
+  header = True
+  for change in changes:
+    if header:
+      yield '--- ' + labelA
+      yield '+++ ' + labelB
+      header = False
+    yield '@@ %s %s @@' % (
+      change.name.to_text(), dns.rdatatype.to_text(change.rdtype))
+    old = list(change.old or [])
+    new = list(change.new or [])
+    if change.old is not None and change.new is not None \
+        and change.old.ttl == change.new.ttl:
+      oldset = set(old)
+      newset = set(new)
+      for rdata in old:
+        yield ( ' ' if rdata in newset else '-' ) \
+          + _rrText(change.name, change.old, rdata)
+      for rdata in new:
+        if rdata not in oldset:
+          yield '+' + _rrText(change.name, change.new, rdata)
+      continue
+    for rdata in old:
+      yield '-' + _rrText(change.name, change.old, rdata)
+    for rdata in new:
+      yield '+' + _rrText(change.name, change.new, rdata)
+
+#------------------------------------------------------------------------------
+def renderChanges(changes, labelA, labelB):
+  '''
+  Returns the list of lines generated by :func:`generateDiff` (an
+  empty list if there are no changes).
+  '''
+  return list(generateDiff(changes, labelA, labelB))
+
+#------------------------------------------------------------------------------
+def zonediff(zoneA, zoneB, labelA, labelB, fp=None, names=None):
+  return renderDiff(
+    generateDiff(zoneChanges(zoneA, zoneB, names), labelA, labelB), fp)
+
+#------------------------------------------------------------------------------
+def isInSync(ctxt):
+  '''
+  Checks, as cheaply as possible, whether or not the hosted zone and
+  the local zonefile are known to be in sync, i.e. the hosted zone's
+  current SOA serial and the zonefile's content digest are the same as
+  the last time they were found (or made) to be in sync. This requires
+  the snapshot cache to be enabled and the driver to support
+  :meth:`dnssync.api.Driver.getSerial`.
+
+  As a side effect, the zonefile digest and hosted zone serial are
+  stored in `ctxt` for use by :func:`markInSync`.
+  '''
+  cache = ctxt.driver.cache
+  if not cache:
+    return False
+  ctxt.serial = ctxt.driver.getSerial(ctxt.domain)
+  if ctxt.serial is None:
+    return False
+  ctxt.digest = filedigest(ctxt.zonefile)
+  state = cache.loadSyncState(ctxt.driver.name, ctxt.driver.account, ctxt.domain)
+  if not state or state.serial != ctxt.serial or state.digest != ctxt.digest:
+    return False
+  log.info(
+    'zone "%s" (serial %s) unchanged since last in sync with zonefile "%s"',
+    ctxt.domain, ctxt.serial, ctxt.zonefile)
+  return True
+
+#------------------------------------------------------------------------------
+def markInSync(ctxt, serial):
+  '''
+  Records that the hosted zone, at SOA serial `serial`, is in sync
+  with the local zonefile (see :func:`isInSync`).
+  '''
+  if serial is None or not ctxt.digest:
     return
-  try:
-    proc = subprocess.Popen(
-      'colordiff', shell=True, close_fds=True,
-      stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    output, errput = proc.communicate('\n'.join(lines))
-    if errput:
-      for line in lines:
-        fp.write(line + '\n')
-      return
-    fp.write(output + '\n')
-  except Exception as err:
-    for line in lines:
-      fp.write(line + '\n')
+  ctxt.driver.cache.saveSyncState(
+    ctxt.driver.name, ctxt.driver.account, ctxt.domain, serial, ctxt.digest)
+
+#------------------------------------------------------------------------------
+def hostedDigest(ctxt):
+  '''
+  Returns the stored zone digest (see
+  :func:`dnssync.api.zonemd.zoneDigests`) of the hosted zone at its
+  current SOA serial, as determined by :func:`isInSync`, or ``None``
+  if unknown. This requires the snapshot cache to be enabled.
+  '''
+  if not ctxt.driver.cache or ctxt.serial is None:
+    return None
+  return ctxt.driver.cache.loadDigest(
+    ctxt.driver.name, ctxt.driver.account, ctxt.domain, ctxt.serial)
 
 #------------------------------------------------------------------------------
-def zonediff(zoneA, zoneB, labelA, labelB, fp=None):
-  pbuf  = six.StringIO()
-  lbuf  = six.StringIO()
-  zoneA.to_file(pbuf, relativize=False)
-  zoneB.to_file(lbuf, relativize=False)
-  pbuf = sorted(pbuf.getvalue().split('\n'))
-  lbuf = sorted(lbuf.getvalue().split('\n'))
-  count = 0
-  lines = [line.rstrip() for line in difflib.unified_diff(
-    pbuf, lbuf, fromfile=labelA, tofile=labelB)]
-  if lines:
-    renderDiff(lines, fp)
-  return len(lines)
+def getHostedZone(ctxt):
+  '''
+  Fetches the hosted zone and returns a tuple of the zone and its
+  digests. The zone digest is stored (if the snapshot cache is
+  enabled) so that later comparisons against an unchanged hosted zone
+  only need to digest the local zone. Since the zone may have changed
+  since its serial was determined (see :func:`isInSync`), the digest
+  is only stored if the fetched zone's SOA has that same serial.
+  '''
+  zone    = ctxt.driver.get(ctxt.domain)
+  digests = zoneDigests(zone)
+  if ctxt.driver.cache and ctxt.serial is not None:
+    soa = zone.get_rdataset(zone.origin, dns.rdatatype.SOA)
+    if soa and soa[0].serial == ctxt.serial:
+      ctxt.driver.cache.saveDigest(
+        ctxt.driver.name, ctxt.driver.account, ctxt.domain, ctxt.serial,
+        digests.digest)
+    else:
+      log.debug(
+        'not storing digest of zone "%s": fetched serial differs from %s',
+        ctxt.domain, ctxt.serial)
+  return (zone, digests)
+
+#------------------------------------------------------------------------------
+def openZonefile(ctxt):
+  '''
+  Returns a :class:`dnssync.api.zonefile.ZoneFile` for the local
+  zonefile, which is parsed with up to ``--parse-jobs`` processes and,
+  if the "cachedir" parameter is set, served from the compiled zone
+  cache when unchanged.
+  '''
+  return ZoneFile(
+    ctxt.zonefile, ctxt.domain,
+    jobs   = getattr(ctxt.options, 'parsejobs', None) or 1,
+    cache  = ctxt.driver.zonecache if ctxt.driver else None,
+    digest = ctxt.digest)
 
 #------------------------------------------------------------------------------
 def cmd_diff(ctxt):
+  if isInSync(ctxt):
+    return 0
+  if getattr(ctxt.options, 'external', False):
+    return externalDiff(ctxt)
   # todo: sort by: type => name => priority
-  pzone = ctxt.driver.get(ctxt.domain)
-  lzone = dns.zone.from_file(ctxt.zonefile, origin=ctxt.domain, relativize=False)
-  return zonediff(pzone, lzone,
-    _('{domain} <service "{service}">', domain=ctxt.domain, service=ctxt.driver.name),
-    _('{domain} <zonefile "{zonefile}">', domain=ctxt.domain, zonefile=ctxt.zonefile))
+  ret      = 0
+  digest   = hostedDigest(ctxt)
+  if digest is None:
+    # the hosted zone must be fetched: do so (i.e. log in, switch zones
+    # and fetch the records) while the local zonefile is being parsed
+    (pzone, pdigests), lzone = concurrently(
+      lambda: getHostedZone(ctxt), openZonefile(ctxt).load)
+    ldigests = zoneDigests(lzone)
+  else:
+    lzone    = openZonefile(ctxt).load()
+    ldigests = zoneDigests(lzone)
+    if ldigests.digest != digest:
+      pzone, pdigests = getHostedZone(ctxt)
+  if ldigests.digest != digest:
+    if ldigests.digest != pdigests.digest:
+      ret = zonediff(pzone, lzone,
+        _('{domain} <service "{service}">', domain=ctxt.domain, service=ctxt.driver.name),
+        _('{domain} <zonefile "{zonefile}">', domain=ctxt.domain, zonefile=ctxt.zonefile),
+        ctxt.output, names=changedNames(pdigests, ldigests))
+  if not ret:
+    log.info(
+      'zone "%s" is identical to zonefile "%s" (digest %s)',
+      ctxt.domain, ctxt.zonefile, ldigests.digest)
+    markInSync(ctxt, ctxt.serial)
+  return ret
+
+#------------------------------------------------------------------------------
+def externalDiff(ctxt):
+  '''
+  The ``diff --external`` variant of :func:`cmd_diff`: instead of
+  building both zones in memory, the hosted records and the zonefile
+  are streamed through an external-memory sort and merge-compared
+  (see :func:`dnssync.api.extsort.streamChanges`), and the diff lines
+  are written as they are generated, which produces the same diff with
+  bounded memory. Note that drivers fetch the hosted records as a
+  whole; they are released as they are sorted (see :func:`_drain`).
+  '''
+  changes = streamChanges(
+    recordsToRdatas(_drain(ctxt.driver.loadRecords(ctxt.domain)), ctxt.domain),
+    openZonefile(ctxt).iterate_rdatas())
+  ret = renderDiff(
+    generateDiff(changes,
+      _('{domain} <service "{service}">', domain=ctxt.domain, service=ctxt.driver.name),
+      _('{domain} <zonefile "{zonefile}">', domain=ctxt.domain, zonefile=ctxt.zonefile)),
+    ctxt.output)
+  if not ret:
+    markInSync(ctxt, ctxt.serial)
+  return ret
+
+#------------------------------------------------------------------------------
+def _drain(records):
+  # generates the `records` in order and, if they are a list, removes
+  # them from it as it goes, so that each record can be freed as soon
+  # as it has been consumed (e.g. sorted into a run)
+  if not isinstance(records, list):
+    for record in records:
+      yield record
+    return
+  records.reverse()
+  while records:
+    yield records.pop()
 
 #------------------------------------------------------------------------------
 def cmd_upload(ctxt):
-  lzone = dns.zone.from_file(ctxt.zonefile, origin=ctxt.domain, relativize=False)
-  res   = ctxt.driver.put(ctxt.domain, lzone)
+  res = None
+  if isInSync(ctxt):
+    res = aadict(created=0, updated=0, deleted=0)
+  else:
+    lzone  = openZonefile(ctxt)
+    digest = hostedDigest(ctxt)
+    if digest is None:
+      if lzone.jobs > 1:
+        # the zonefile is parsed in worker processes (i.e. the zone is
+        # expected to fit in memory): fetch the hosted zone's records
+        # while it is being parsed. otherwise, the zonefile is streamed
+        # into the planner after the fetch.
+        lzone = concurrently(
+          lambda: ctxt.driver.prefetchRecords(ctxt.domain), lzone.load)[1]
+    else:
+      # the hosted zone's digest is known: compare it with the local
+      # zone's before fetching (and planning against) the hosted zone
+      lzone = lzone.load()
+      if zoneDigests(lzone).digest == digest:
+        log.info(
+          'zone "%s" is identical to zonefile "%s" (digest %s)',
+          ctxt.domain, ctxt.zonefile, digest)
+        res = aadict(created=0, updated=0, deleted=0)
+        markInSync(ctxt, ctxt.serial)
+    if res is None and getattr(ctxt.options, 'estimate', False):
+      plan = ctxt.driver.plan(ctxt.domain, lzone)
+      ctxt.output.write(_(
+        '{changes} change(s) would take about {requests} request(s).',
+        changes=len(plan.creates) + len(plan.updates) + len(plan.deletes),
+        requests=ctxt.driver.estimateRequests(
+          plan.creates, plan.updates, plan.deletes)) + '\n')
+      return 0
+    if res is None:
+      res = ctxt.driver.put(ctxt.domain, lzone)
+      if ctxt.digest and not res.refused:
+        markInSync(ctxt, ctxt.driver.getSerial(ctxt.domain))
   if res and 'created' in res:
-    print _(
+    ctxt.stats = res
+    ctxt.output.write(_(
       '{created} record(s) created, {updated} record(s) updated, and {deleted} record(s) deleted.',
-      created=res.created, updated=res.updated, deleted=res.deleted)
+      created=res.created, updated=res.updated, deleted=res.deleted) + '\n')
   return 0
 
 #------------------------------------------------------------------------------
@@ -121,44 +423,110 @@ def cmd_list(ctxt):
   return 0
 
 #------------------------------------------------------------------------------
-def getDnsRecords(record, resolver):
-  try:
-    ans = resolver.query(record.name, rdtype=record.type, rdclass=record.rclass)
-  except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-    return []
+def makeResolver(server=None):
+  '''
+  Returns a new :class:`dns.resolver.Resolver` that sends its queries
+  to `server` (a hostname or IP address) if specified, or to the
+  system's default nameservers otherwise. The resolver is safe to
+  share between threads.
+  '''
+  if not server:
+    return dns.resolver.Resolver()
+  return dns.resolver.Resolver(
+    StringIO('nameserver ' + socket.gethostbyname(server)))
+
+#------------------------------------------------------------------------------
+def getDnsRecords(record, resolver, retries=0):
+  '''
+  Queries `resolver` for all records with the same name, type and
+  class as `record` and returns them as a list of Record objects
+  (which is empty if the name or type does not exist). Queries that
+  time out are retried up to `retries` times, the last attempt being
+  made over TCP. Note that truncated UDP responses are always
+  re-queried over TCP by the resolver itself.
+  '''
+  for attempt in range(retries + 1):
+    try:
+      ans = resolver.query(
+        record.name, rdtype=record.type, rdclass=record.rclass,
+        tcp=( attempt > 0 and attempt == retries ))
+      break
+    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+      return []
+    except dns.exception.Timeout:
+      if attempt >= retries:
+        raise
+      log.debug('query for %s %s timed out (attempt %d of %d)',
+                record.name, record.type, attempt + 1, retries + 1)
   rdset = ans.response.answer[0].to_rdataset()
   # todo: is there a better place to get this TTL from?...
   return [Record.from_rdata([ans.qname, record.ttl, rdat]) for rdat in rdset]
 
+#------------------------------------------------------------------------------
+def transferZone(domain, server, timeout=None, lifetime=None):
+  '''
+  Fetches the complete zone `domain` from `server` via a zone transfer
+  (AXFR) and returns it as a :class:`dns.zone.Zone`. Waiting for any
+  single response message is limited to `timeout` seconds, and the
+  whole transfer to `lifetime` seconds. Raises an exception (typically
+  a :class:`dns.exception.DNSException`, :class:`socket.error` or
+  :class:`EOFError`) if the transfer fails, times out or is refused.
+  '''
+  address = socket.gethostbyname(server)
+  return dns.zone.from_xfr(
+    dns.query.xfr(
+      address, domain, relativize=False, timeout=timeout, lifetime=lifetime),
+    relativize=False)
+
+#------------------------------------------------------------------------------
+def queryZone(zone, resolver, queries=1, retries=0):
+  '''
+  Queries `resolver` for each distinct (name, type) pair in `zone`,
+  with up to `queries` concurrent queries, and returns the answers as
+  a new :class:`dns.zone.Zone`. Since TTLs cannot be reliably
+  extracted from DNS, the TTLs are taken from `zone`.
+  '''
+  # one query per distinct (name, type) pair, in zone order
+  lookups = collections.OrderedDict()
+  for rdata in zone.iterate_rdatas():
+    record = Record.from_rdata(rdata)
+    lookups.setdefault((record.name, record.type), record)
+  results = pmap(
+    lambda record: getDnsRecords(record, resolver, retries=retries),
+    lookups.values(), queries)
+  return recordsToZone(
+    [rec for recs in results for rec in recs], zone.origin.to_text())
+
 #------------------------------------------------------------------------------
 def cmd_verify(ctxt):
-  lzone    = dns.zone.from_file(ctxt.zonefile, origin=ctxt.domain, relativize=False)
+  lzone    = openZonefile(ctxt).load()
   server   = ctxt.options.server
-  resolver = dns.resolver
-  if server:
-    sio = StringIO('nameserver ' + socket.gethostbyname(server))
-    resolver = dns.resolver.Resolver(sio)
-
-  # TODO: i should really be building this from dns.zone.* calls...
-  #       but dnspython is *so* unintuitive! ugh.
-  records = dict()
-  for rdata in lzone.iterate_rdatas():
-    record = Record.from_rdata(rdata)
-    if record.name not in records:
-      records[record.name] = dict()
-    if record.type in records[record.name]:
-      continue
-    records[record.name][record.type] = getDnsRecords(record, resolver)
-  data = '\n'.join(rec.toText()
-                   for name, types in records.items()
-                   for recs in types.values()
-                   for rec in recs)
-  dzone = dns.zone.from_text(data, origin=ctxt.domain, relativize=False)
-  # /TODO
+  resolver = makeResolver(server)
+  dzone    = None
+  queries  = getattr(ctxt.options, 'queries', None) or DEFAULT_QUERIES
+  retries  = getattr(ctxt.options, 'retries', None)
+  if retries is None:
+    retries = DEFAULT_RETRIES
+
+  if server and getattr(ctxt.options, 'axfr', False):
+    try:
+      # note: the transfer is bounded by the resolver's timeouts, so
+      # that an unresponsive server falls back to queries too
+      dzone = transferZone(
+        ctxt.domain, server, timeout=resolver.timeout, lifetime=resolver.lifetime)
+    except (dns.exception.DNSException, socket.error, EOFError) as err:
+      log.info(
+        'zone transfer of "%s" from "%s" failed (%s: %s) -- falling back'
+        ' to per-name queries', ctxt.domain, server,
+        err.__class__.__name__, err)
+
+  if dzone is None:
+    dzone = queryZone(lzone, resolver, queries, retries)
 
   return zonediff(lzone, dzone,
     _('{domain} <zonefile "{zonefile}">', domain=ctxt.domain, zonefile=ctxt.zonefile),
-    _('{domain} <DNS "{server}">', domain=ctxt.domain, server=server or 'default'))
+    _('{domain} <DNS "{server}">', domain=ctxt.domain, server=server or 'default'),
+    ctxt.output)
 
 #------------------------------------------------------------------------------
 def run(command, driver, options):
@@ -169,6 +537,7 @@ def run(command, driver, options):
     driver   = driver,
     domain   = absdom(options.domain) if options.domain else None,
     zonefile = getattr(options, 'zonefile', None),
+    output   = sys.stdout,
   )
 
   if command != 'list':
@@ -181,6 +550,96 @@ def run(command, driver, options):
 
   return cmd(context)
 
+#------------------------------------------------------------------------------
+def runZone(command, zone, options):
+  '''
+  Runs `command` against a single `zone` (see :func:`runAll`), with
+  all output captured, and returns the result object.
+  '''
+  ret = aadict(
+    domain  = zone.domain,
+    status  = None,
+    stats   = None,
+    error   = zone.error,
+    output  = six.StringIO(),
+  )
+  if ret.error:
+    return ret
+  context = aadict(
+    options  = options,
+    config   = options.config,
+    driver   = zone.driver,
+    domain   = absdom(zone.domain),
+    zonefile = zone.zonefile,
+    output   = ret.output,
+  )
+  try:
+    ret.status = globals()['cmd_' + command](context)
+    ret.stats  = context.stats
+  except Exception as err:
+    log.debug('zone "%s" failed', zone.domain, exc_info=True)
+    ret.error = err
+  return ret
+
+#------------------------------------------------------------------------------
+def runAll(command, zones, options, jobs=1):
+  '''
+  Runs `command` (e.g. "diff" or "upload") against each of the
+  `zones`, which is a list of objects with `domain`, `zonefile`,
+  `driver` and `error` attributes (zones with an `error` are only
+  reported). Zones that share a driver, i.e. an account, are run on
+  that driver one at a time (unless the driver supports concurrent
+  zones) and up to `jobs` accounts are run concurrently. The `jobs`
+  budget is split between the accounts, so that at most `jobs` zones
+  are run at once.
+
+  Returns a list of results in the same order as `zones`, each with
+  `domain`, `status`, `stats`, `error` and `output` attributes.
+  '''
+  results = [None] * len(zones)
+  groups  = collections.OrderedDict()
+  for idx, zone in enumerate(zones):
+    groups.setdefault(id(zone.driver) if zone.driver else -idx - 1, []).append(idx)
+  def _runZone(idx):
+    results[idx] = runZone(command, zones[idx], options)
+  # each account gets an equal share of the budget (but at least one)
+  share = max(1, jobs // len(groups)) if groups else 1
+  def _runGroup(idxs):
+    driver = zones[idxs[0]].driver
+    pmap(_runZone, idxs, share if driver and driver.concurrentZones else 1)
+  pmap(_runGroup, list(groups.values()), jobs)
+  return results
+
+#------------------------------------------------------------------------------
+def writeReport(command, results, fp=None):
+  '''
+  Writes the captured output of each of the `results` returned by
+  :func:`runAll`, followed by a one-line-per-zone summary, to `fp`
+  (defaults to stdout). Returns the overall exit status: 0 if all
+  zones are in sync, 1 if any differences were found, and 20 if any
+  zone failed.
+  '''
+  fp = fp or sys.stdout
+  for result in results:
+    fp.write(result.output.getvalue())
+  ret = 0
+  for result in results:
+    if result.error:
+      ret = 20
+      msg = _('ERROR: {}: {}', result.error.__class__.__name__, result.error)
+    elif command == 'upload' and result.stats:
+      msg = _(
+        '{created} created, {updated} updated, {deleted} deleted',
+        created=result.stats.created, updated=result.stats.updated,
+        deleted=result.stats.deleted)
+    elif result.status:
+      ret = ret or 1
+      msg = _('differs')
+    else:
+      msg = _('in sync')
+    fp.write(_('{domain}: {status}', domain=result.domain, status=msg) + '\n')
+  return ret
+
 #------------------------------------------------------------------------------
 # end of $Id$
 # $ChangeLog$
@@ -24,9 +24,20 @@ class ConfigurationError(Error): pass
 class DomainNotFound(Error): pass
 class DriverError(Error): pass
 class AuthenticationError(DriverError): pass
+class TransportError(DriverError): pass
 class UnsupportedRecordType(Error): pass
 class UnexpectedZoneState(Error): pass
 
+class RateLimited(DriverError):
+  '''
+  Raised when the hosted DNS provider refuses a request because too
+  many are being made; `retryAfter`, if known, is the number of
+  seconds after which it may be re-tried.
+  '''
+  def __init__(self, message=None, retryAfter=None):
+    super(RateLimited, self).__init__(message)
+    self.retryAfter = retryAfter
+
 #------------------------------------------------------------------------------
 # end of $Id$
 #------------------------------------------------------------------------------
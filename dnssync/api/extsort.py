@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+'''
+External-memory (sort-merge) zone comparison: each side is sorted in
+canonical order into bounded-size runs on disk, and the two sorted
+streams are then merge-compared RRset by RRset, so that sorting and
+comparing holds only about `RUNSIZE` records per zone in memory,
+regardless of the size of the zones.
+'''
+
+import heapq
+import itertools
+import tempfile
+
+import dns.name
+import dns.rdata
+import dns.rdataclass
+import dns.rdataset
+from six.moves import cPickle as pickle
+from six.moves import StringIO
+from aadict import aadict
+
+#------------------------------------------------------------------------------
+
+# the maximum number of records held in memory (per zone) while sorting
+RUNSIZE = 100000
+
+#------------------------------------------------------------------------------
+def canonicalKey(name):
+  '''
+  Returns a key for the :class:`dns.name.Name` `name` that sorts in
+  DNSSEC canonical order (RFC 4034, section 6.1), i.e. the same order
+  as the names themselves, but that is made of plain strings and can
+  therefore be stored and compared cheaply.
+  '''
+  return tuple(label.lower() for label in reversed(name.labels))
+
+#------------------------------------------------------------------------------
+def _item(name, ttl, rdata):
+  wire = StringIO()
+  rdata.to_wire(wire)
+  return (canonicalKey(name), rdata.rdtype, rdata.covers(), wire.getvalue(),
+          ttl, name.labels, rdata.rdclass)
+
+#------------------------------------------------------------------------------
+def _writeRun(items, tmpdir):
+  fp = tempfile.TemporaryFile(prefix='dnssync-', suffix='.run', dir=tmpdir)
+  dump = pickle.Pickler(fp, pickle.HIGHEST_PROTOCOL).dump
+  for item in items:
+    dump(item)
+  fp.seek(0)
+  return fp
+
+#------------------------------------------------------------------------------
+def _readRun(fp):
+  load = pickle.Unpickler(fp).load
+  while True:
+    try:
+      yield load()
+    except EOFError:
+      return
+
+#------------------------------------------------------------------------------
+def sortedRdatasets(rdatas, runsize=RUNSIZE, tmpdir=None):
+  '''
+  Generates the rdatasets of the (name, ttl, rdata) tuples `rdatas`
+  (e.g. as generated by :meth:`dns.zone.Zone.iterate_rdatas` or
+  :meth:`dnssync.api.zonefile.ZoneFile.iterate_rdatas`) in canonical
+  order, as (key, name, rdataset) tuples, where `key` is the
+  (:func:`canonicalKey`, rdtype, covers) tuple of the rdataset. The
+  tuples are sorted in runs of up to `runsize` records, which are
+  stored in temporary files in `tmpdir` and then merged.
+  '''
+  runs = []
+  try:
+    items = []
+    for name, ttl, rdata in rdatas:
+      items.append(_item(name, ttl, rdata))
+      if len(items) >= runsize:
+        items.sort()
+        runs.append(_writeRun(items, tmpdir))
+        items = []
+    items.sort()
+    merged = heapq.merge(*( [_readRun(fp) for fp in runs] + [iter(items)] ))
+    for key, group in itertools.groupby(merged, key=lambda item: item[:3]):
+      rdataset = None
+      for item in group:
+        if rdataset is None:
+          name     = dns.name.Name(item[5])
+          rdataset = dns.rdataset.Rdataset(item[6], item[1], item[2])
+        rdataset.add(
+          dns.rdata.from_wire(item[6], item[1], item[3], 0, len(item[3])), item[4])
+      yield (key, name, rdataset)
+  finally:
+    for fp in runs:
+      fp.close()
+
+#------------------------------------------------------------------------------
+def streamChanges(rdatasA, rdatasB, runsize=RUNSIZE, tmpdir=None):
+  '''
+  The external-memory equivalent of
+  :func:`dnssync.api.engine.zoneChanges`: compares the zones whose
+  (name, ttl, rdata) tuples are `rdatasA` and `rdatasB`, and generates
+  the same differences in the same order. See
+  :func:`sortedRdatasets` for `runsize` and `tmpdir`.
+  '''
+  setsA = sortedRdatasets(rdatasA, runsize, tmpdir)
+  setsB = sortedRdatasets(rdatasB, runsize, tmpdir)
+  curA  = next(setsA, None)
+  curB  = next(setsB, None)
+  while curA is not None or curB is not None:
+    if curB is None or ( curA is not None and curA[0] < curB[0] ):
+      yield aadict(name=curA[1], rdtype=curA[2].rdtype, old=curA[2], new=None)
+      curA = next(setsA, None)
+      continue
+    if curA is None or curB[0] < curA[0]:
+      yield aadict(name=curB[1], rdtype=curB[2].rdtype, old=None, new=curB[2])
+      curB = next(setsB, None)
+      continue
+    rdsA = curA[2]
+    rdsB = curB[2]
+    if rdsA.ttl != rdsB.ttl or set(rdsA) != set(rdsB):
+      yield aadict(name=curA[1], rdtype=rdsA.rdtype, old=rdsA, new=rdsB)
+    curA = next(setsA, None)
+    curB = next(setsB, None)
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import sys
+import time
+import threading
+
+import six
+
+from .error import RateLimited
+
+#------------------------------------------------------------------------------
+def pmap(func, items, jobs=1):
+  '''
+  Calls `func` once for each element in `items` and returns the list
+  of results in the same order as `items`. If `jobs` is greater than
+  one, up to `jobs` calls are executed concurrently by a pool of
+  worker threads; otherwise the calls are made sequentially in the
+  current thread.
+
+  If any call raises an exception, no further calls are started, and
+  once all in-progress calls have completed the first exception is
+  re-raised in the calling thread.
+  '''
+  items = list(items)
+  if not jobs or jobs <= 1 or len(items) <= 1:
+    return [func(item) for item in items]
+  results = [None] * len(items)
+  errors  = []
+  lock    = threading.Lock()
+  pending = iter(enumerate(items))
+  def _worker():
+    while True:
+      with lock:
+        if errors:
+          return
+        try:
+          idx, item = next(pending)
+        except StopIteration:
+          return
+      try:
+        results[idx] = func(item)
+      except Exception:
+        with lock:
+          errors.append(sys.exc_info())
+        return
+  threads = [threading.Thread(target=_worker)
+             for idx in range(min(jobs, len(items)))]
+  for thread in threads:
+    thread.daemon = True
+    thread.start()
+  for thread in threads:
+    thread.join()
+  if errors:
+    six.reraise(*errors[0])
+  return results
+
+#------------------------------------------------------------------------------
+def concurrently(*funcs):
+  '''
+  Calls each of the argument-less `funcs` in its own thread and, once
+  all have completed, returns the list of their results (in the same
+  order). Used to overlap independent, e.g. network-bound and
+  CPU-bound, phases of an operation; errors are handled as by
+  :func:`pmap`.
+  '''
+  return pmap(lambda func: func(), funcs, len(funcs))
+
+#------------------------------------------------------------------------------
+class Controller(object):
+  '''
+  Adapts the number of concurrent calls made to a hosted DNS provider
+  using additive-increase/multiplicative-decrease feedback, so that
+  throughput stays close to what the provider accepts without manual
+  tuning. One controller is shared by all operations against one
+  account.
+
+  Calls are made with :meth:`call`; at most :attr:`limit` (rounded
+  down, but at least one and at most `maxlimit`) are in flight at any
+  time. Each call that completes promptly raises the limit by about
+  one per "window" of calls. A call that raises
+  :class:`dnssync.api.RateLimited`, a :meth:`congested` signal (e.g.
+  an HTTP 429 or 5xx response), or a call that takes more than
+  `slowdown` times the fastest call seen, halves it (once per window,
+  i.e. only for calls started since the last decrease). Calls that take
+  less than :attr:`MINSLOW` seconds are never considered slow. A retry
+  hint (e.g. a "Retry-After" header) additionally pauses all new calls
+  (and, via :meth:`wait`, requests) until it has passed.
+  '''
+
+  DECREASE  = 0.5
+  SLOWDOWN  = 4.0
+  MINSLOW   = 0.5     # seconds
+  ATTEMPTS  = 5
+  BACKOFF   = 1.0     # seconds, if a rate limit has no retry hint
+
+  #----------------------------------------------------------------------------
+  def __init__(self, maxlimit=1, initial=None, *args, **kw):
+    super(Controller, self).__init__(*args, **kw)
+    self.maxlimit = max(1, maxlimit)
+    self.limit    = float(min(self.maxlimit, initial or self.maxlimit))
+    self.inflight = 0
+    self.fastest  = None
+    self.holdtill = 0
+    self.epoch    = 0
+    self.cond     = threading.Condition()
+    self.local    = threading.local()
+
+  #----------------------------------------------------------------------------
+  def acquire(self):
+    '''
+    Blocks until a new call may be made, and returns its epoch (to be
+    passed to :meth:`release`).
+    '''
+    with self.cond:
+      while True:
+        wait = self.holdtill - time.time()
+        if wait <= 0 and self.inflight < max(1, int(self.limit)):
+          self.inflight += 1
+          return self.epoch
+        self.cond.wait(wait if wait > 0 else None)
+
+  #----------------------------------------------------------------------------
+  def wait(self):
+    '''
+    Blocks until any pause requested by a retry hint has passed.
+    '''
+    with self.cond:
+      while True:
+        wait = self.holdtill - time.time()
+        if wait <= 0:
+          return
+        self.cond.wait(wait)
+
+  #----------------------------------------------------------------------------
+  def release(self, epoch, latency=None):
+    '''
+    Releases the slot of a call that started in `epoch` and completed
+    successfully, taking `latency` seconds.
+    '''
+    with self.cond:
+      self.inflight -= 1
+      if latency is not None:
+        if self.fastest is None or latency < self.fastest:
+          self.fastest = latency
+        if latency > max(self.MINSLOW, self.SLOWDOWN * self.fastest):
+          self._decrease(epoch)
+        elif self.limit < self.maxlimit:
+          self.limit = min(self.maxlimit, self.limit + 1.0 / self.limit)
+      self.cond.notify_all()
+
+  #----------------------------------------------------------------------------
+  def congested(self, epoch=None, retryAfter=None):
+    '''
+    Signals that the provider is overloaded or is rate-limiting calls,
+    optionally asking for no calls to be made for `retryAfter`
+    seconds. If `epoch` is not specified, the epoch of the
+    :meth:`call` that the current thread is making (if any) is used,
+    so that repeated signals from within one call (e.g. for each
+    retried request) only decrease the limit once.
+    '''
+    if epoch is None:
+      epoch = getattr(self.local, 'epoch', None)
+    with self.cond:
+      self._decrease(self.epoch if epoch is None else epoch)
+      if retryAfter:
+        self.holdtill = max(self.holdtill, time.time() + retryAfter)
+      self.cond.notify_all()
+
+  #----------------------------------------------------------------------------
+  def _decrease(self, epoch):
+    if epoch != self.epoch:
+      return
+    self.epoch += 1
+    self.limit  = max(1.0, self.limit * self.DECREASE)
+
+  #----------------------------------------------------------------------------
+  def call(self, func, *args, **kw):
+    '''
+    Calls ``func(*args, **kw)`` within the controller's limits and
+    returns its result. If the call raises
+    :class:`dnssync.api.RateLimited`, it is re-tried (after the retry
+    hint or a backoff) up to :attr:`ATTEMPTS` times in total.
+    '''
+    outer = getattr(self.local, 'epoch', None)
+    for attempt in range(self.ATTEMPTS):
+      epoch = self.local.epoch = self.acquire()
+      start = time.time()
+      try:
+        ret = func(*args, **kw)
+      except RateLimited as err:
+        with self.cond:
+          self.inflight -= 1
+        self.congested(
+          epoch, err.retryAfter or self.BACKOFF * ( 2 ** attempt ))
+        if attempt + 1 >= self.ATTEMPTS:
+          raise
+        continue
+      except Exception:
+        self.release(epoch)
+        raise
+      finally:
+        self.local.epoch = outer
+      self.release(epoch, time.time() - start)
+      return ret
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -19,17 +19,38 @@
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #------------------------------------------------------------------------------
 
+import re
+
+import dns.exception
+import dns.name
+import dns.rdata
 import dns.rdataclass
+import dns.rdatatype
+import dns.tokenizer
+import dns.ttl
+import dns.zone
 from aadict import aadict
 
 #------------------------------------------------------------------------------
 
-FORMATS = {
-  '*'    : '{name} {ttl} {rclass} {type} {content}',
-  'MX'   : '{name} {ttl} {rclass} {type} {priority} {content}',
-  'SRV'  : '{name} {ttl} {rclass} {type} {priority} {weight} {port} {content}',
+RDATA_FORMATS = {
+  '*'    : '{content}',
+  'MX'   : '{priority} {content}',
+  'SRV'  : '{priority} {weight} {port} {content}',
 }
 
+FORMATS = {
+  key : '{name} {ttl} {rclass} {type} ' + fmt
+  for key, fmt in RDATA_FORMATS.items()}
+
+ADDRESS_TYPES = ('A', 'AAAA')
+address_cre   = re.compile(r'^[0-9a-fA-F.:]+$')
+
+# the record types whose `content` is only a domain name (the other
+# fields, e.g. an MX record's priority, are stored separately)
+NAME_TYPES    = ('NS', 'CNAME', 'PTR', 'DNAME', 'MX', 'SRV')
+TEXT_TYPES    = ('TXT', 'SPF')
+
 #------------------------------------------------------------------------------
 def escapeContent(text):
   if not text:
@@ -46,8 +67,55 @@ def escapeContent(text):
     parts.append(text)
   return '"' + '" "'.join([dns.rdata._escapify(part) for part in parts]) + '"'
 
+#------------------------------------------------------------------------------
+def normalizeContent(rtype, content, rclass='IN'):
+  '''
+  Returns a canonical version of the `content` of a record of type
+  `rtype` that is only equal to that of another record if their data
+  is the same in DNS terms, ignoring how it happens to be written:
+  the case and trailing dot of domain names, the notation of IPv4 and
+  IPv6 addresses (e.g. "::0" and "::"), and whether or not (and how)
+  TXT data is quoted. Content that cannot be parsed is returned as-is.
+  '''
+  if not content:
+    return content
+  try:
+    if rtype in TEXT_TYPES:
+      if not content.startswith('"'):
+        return content
+      text = content
+      if not isinstance(text, str):
+        text = text.encode('utf-8')
+      rdata = dns.rdata.from_text(
+        dns.rdataclass.from_text(rclass), dns.rdatatype.from_text(rtype),
+        dns.tokenizer.Tokenizer(text))
+      return ''.join(rdata.strings)
+    if rtype in NAME_TYPES:
+      return dns.name.from_text(content).to_digestable()
+    rdata = dns.rdata.from_text(
+      dns.rdataclass.from_text(rclass), dns.rdatatype.from_text(rtype),
+      dns.tokenizer.Tokenizer(str(content)), dns.name.root, False)
+    return rdata.to_digestable()
+  except Exception:
+    return content
+
 #------------------------------------------------------------------------------
 class Record(object):
+  '''
+  A single DNS resource record. The core fields (see
+  :attr:`FIELDS`) are stored in slots; any other (typically
+  driver-specific, e.g. a provider's record ID) attributes that are
+  passed to the constructor, passed to :meth:`update` or assigned are
+  kept in the `extras` dict, and are readable as attributes.
+
+  Records are mutable (and are used as keys of the `updates` dict
+  passed to :meth:`dnssync.api.Driver.putChanges`), so they compare
+  and hash by identity; use :meth:`sameAs` to compare them by value.
+  '''
+
+  FIELDS = ('id', 'name', 'ttl', 'rclass', 'type', 'priority', 'weight', 'port', 'content')
+
+  __slots__ = FIELDS + ('extras',)
 
   TYPE_SOA              = 'SOA'
   TYPE_NS               = 'NS'
@@ -67,16 +135,11 @@ class Record(object):
                priority=None, weight=None, port=None,
                *args, **kw):
     super(Record, self).__init__(*args)
-    self.id       = id
-    self.name     = name
-    self.ttl      = ttl
-    self.rclass   = rclass
-    self.type     = type
-    self.priority = priority
-    self.weight   = weight
-    self.port     = port
-    self.content  = content
-    self.update(**kw)
+    # note: the slots are set directly, bypassing :meth:`__setattr__`,
+    # since records are created in bulk
+    for setter, val in zip(_slotSetters, (
+        id, name, ttl, rclass, type, priority, weight, port, content, kw or None)):
+      setter(self, val)
 
   #----------------------------------------------------------------------------
   @staticmethod
@@ -112,27 +175,202 @@ class Record(object):
       setattr(self, key, val)
     return self
 
+  #----------------------------------------------------------------------------
+  def __setattr__(self, key, val):
+    if key in _slotNames:
+      object.__setattr__(self, key, val)
+    elif self.extras is None:
+      object.__setattr__(self, 'extras', {key: val})
+    else:
+      self.extras[key] = val
+
+  #----------------------------------------------------------------------------
+  def __getattr__(self, key):
+    # note: only called for attributes that are not core fields
+    try:
+      return object.__getattribute__(self, 'extras')[key]
+    except (AttributeError, KeyError, TypeError):
+      raise AttributeError(key)
+
+  #----------------------------------------------------------------------------
+  def _values(self):
+    return (self.id, self.name, self.ttl, self.rclass, self.type,
+            self.priority, self.weight, self.port, self.content)
+
+  #----------------------------------------------------------------------------
+  def sameAs(self, other):
+    '''
+    Returns whether or not this record has the same core fields and
+    extras as the record `other`.
+    '''
+    return isinstance(other, Record) \
+      and self._values() == other._values() \
+      and ( self.extras or None ) == ( other.extras or None )
+
+  #----------------------------------------------------------------------------
+  def __getstate__(self):
+    return self._values() + (self.extras,)
+
+  #----------------------------------------------------------------------------
+  def __setstate__(self, state):
+    for key, val in zip(Record.__slots__, state):
+      setattr(self, key, val)
+
   #----------------------------------------------------------------------------
   def toDict(self):
-    return aadict(self.__dict__)
+    ret = aadict(zip(Record.FIELDS, self._values()))
+    if self.extras:
+      ret.update(self.extras)
+    return ret
+
+  #----------------------------------------------------------------------------
+  def _format(self, fmt):
+    content = self.content
+    if self.type == Record.TYPE_TXT:
+      content = escapeContent(content)
+    return fmt.format(
+      name=self.name, ttl=self.ttl, rclass=self.rclass, type=self.type,
+      priority=self.priority, weight=self.weight, port=self.port,
+      content=content)
 
   #----------------------------------------------------------------------------
   def toText(self):
-    fmt = FORMATS.get(self.type) or FORMATS.get('*')
-    dat = self.toDict()
-    if dat.type == Record.TYPE_TXT:
-      dat.content = escapeContent(dat.content)
-    return fmt.format(**dat)
+    return self._format(FORMATS.get(self.type) or FORMATS.get('*'))
+
+  #----------------------------------------------------------------------------
+  def toRdataText(self):
+    '''
+    Returns the text representation of only the data portion of this
+    record, i.e. everything that follows the record type in a zone
+    file.
+    '''
+    return self._format(RDATA_FORMATS.get(self.type) or RDATA_FORMATS.get('*'))
+
+  #----------------------------------------------------------------------------
+  def toRdata(self, origin=None):
+    '''
+    Returns this record's data as a :class:`dns.rdata.Rdata` object.
+    Relative names in the data are made absolute with `origin`.
+    '''
+    rdclass = dns.rdataclass.from_text(self.rclass)
+    rdtype  = dns.rdatatype.from_text(self.type)
+    if self.type in ADDRESS_TYPES and address_cre.match(self.content):
+      # shortcut: address records do not need any tokenizing (and
+      # the rdata constructor validates the address)
+      return dns.rdata.get_rdata_class(rdclass, rdtype)(
+        rdclass, rdtype, str(self.content))
+    text = self.toRdataText()
+    if not isinstance(text, str):
+      text = text.encode('utf-8')
+    return dns.rdata.from_text(
+      rdclass, rdtype, dns.tokenizer.Tokenizer(text), origin, False)
 
   #----------------------------------------------------------------------------
   def __repr__(self):
+    items = list(zip(Record.FIELDS, self._values()))
+    if self.extras:
+      items = sorted(items + list(self.extras.items()))
+    else:
+      items.sort()
     ret = '<Record'
-    for key, val in sorted(self.toDict().items()):
+    for key, val in items:
       if val is not None:
         ret += ' ' + key + '=' + repr(val)
     ret += '>'
     return ret
 
+_slotNames   = frozenset(Record.__slots__)
+_slotSetters = [getattr(Record, key).__set__ for key in Record.__slots__]
+
+#------------------------------------------------------------------------------
+def _raiseRecordError(record, err):
+  raise dns.exception.SyntaxError(
+    '%s: %s' % (record.toText(), str(err) or err.__class__.__name__))
+
+#------------------------------------------------------------------------------
+def recordsToZone(records, origin, rdclass=dns.rdataclass.IN):
+  '''
+  Builds a (non-relativized) :class:`dns.zone.Zone` named `origin`
+  directly from the list of :class:`.Record` objects `records`. This
+  is equivalent to, but much cheaper than, rendering the records as
+  text and parsing the result with :func:`dns.zone.from_text`:
+  records outside of the zone are ignored, the TTL of an rdataset is
+  the lowest TTL of its records, and the zone must have an SOA and NS
+  record at its origin. Invalid records raise a
+  :class:`dns.exception.SyntaxError` that identifies the record.
+  '''
+  if not isinstance(origin, dns.name.Name):
+    origin = dns.name.from_text(origin)
+  zone  = dns.zone.Zone(origin, rdclass, relativize=False)
+  # note: the zone's nodes are looked up by owner name text first, so
+  # that each owner name is only parsed, validated and hashed once.
+  nodes = dict()
+  for record in records:
+    node = nodes.get(record.name)
+    if node is None:
+      try:
+        name = dns.name.from_text(record.name, origin)
+      except Exception as err:
+        _raiseRecordError(record, err)
+      if not name.is_subdomain(origin):
+        nodes[record.name] = False
+        continue
+      node = nodes[record.name] = zone.nodes.setdefault(name, zone.node_factory())
+    elif node is False:
+      continue
+    try:
+      ttl   = dns.ttl.from_text(str(record.ttl))
+      rdata = record.toRdata(origin)
+    except Exception as err:
+      _raiseRecordError(record, err)
+    if rdata.rdclass != rdclass:
+      _raiseRecordError(record, "RR class is not zone's class")
+    node.find_rdataset(rdclass, rdata.rdtype, rdata.covers(), True).add(rdata, ttl)
+  zone.check_origin()
+  return zone
+
+#------------------------------------------------------------------------------
+def recordsToRdatas(records, origin, rdclass=dns.rdataclass.IN):
+  '''
+  Generates the (name, ttl, rdata) tuples of the :class:`.Record`
+  objects `records`, in the same format as
+  :meth:`dns.zone.Zone.iterate_rdatas`, i.e. the streaming equivalent
+  of :func:`recordsToZone`: records outside of the zone are skipped,
+  and :class:`dns.zone.NoSOA` or :class:`dns.zone.NoNS` is raised once
+  all the records have been generated if the zone origin is missing
+  either of them.
+  '''
+  if not isinstance(origin, dns.name.Name):
+    origin = dns.name.from_text(origin)
+  names = dict()
+  types = set()
+  for record in records:
+    name = names.get(record.name)
+    if name is None:
+      try:
+        name = dns.name.from_text(record.name, origin)
+      except Exception as err:
+        _raiseRecordError(record, err)
+      if not name.is_subdomain(origin):
+        name = False
+      names[record.name] = name
+    if name is False:
+      continue
+    try:
+      ttl   = dns.ttl.from_text(str(record.ttl))
+      rdata = record.toRdata(origin)
+    except Exception as err:
+      _raiseRecordError(record, err)
+    if rdata.rdclass != rdclass:
+      _raiseRecordError(record, "RR class is not zone's class")
+    if name == origin:
+      types.add(rdata.rdtype)
+    yield (name, ttl, rdata)
+  if dns.rdatatype.SOA not in types:
+    raise dns.zone.NoSOA()
+  if dns.rdatatype.NS not in types:
+    raise dns.zone.NoNS()
+
 #------------------------------------------------------------------------------
 # end of $Id$
 #------------------------------------------------------------------------------
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import os
+import json
+import base64
+import hashlib
+import logging
+import tempfile
+
+import requests
+
+try:
+  from cryptography.fernet import Fernet, InvalidToken
+  from cryptography.hazmat.backends import default_backend
+  from cryptography.hazmat.primitives import hashes
+  from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:
+  Fernet = None
+
+from .i18n import _
+
+#------------------------------------------------------------------------------
+
+log = logging.getLogger(__name__)
+
+MAGIC       = b'dnssync-session-2\n'
+PLAINMAGIC  = b'dnssync-session-plain-1\n'
+SALTSIZE    = 16
+ITERATIONS  = 100000
+
+#------------------------------------------------------------------------------
+class InvalidSession(Exception): pass
+
+#------------------------------------------------------------------------------
+def _fernet(secret, salt):
+  if not isinstance(secret, bytes):
+    secret = secret.encode('utf-8')
+  kdf = PBKDF2HMAC(
+    algorithm=hashes.SHA256(), length=32, salt=salt, iterations=ITERATIONS,
+    backend=default_backend())
+  return Fernet(base64.urlsafe_b64encode(kdf.derive(secret)))
+
+#------------------------------------------------------------------------------
+def seal(secret, data):
+  '''
+  Encrypts and authenticates the bytes `data` with the passphrase
+  `secret`, returning the sealed bytes: a Fernet token (see the
+  `cryptography` package), with the key derived from `secret` by
+  PBKDF2 with a random salt. Requires the `cryptography` package.
+  '''
+  salt = os.urandom(SALTSIZE)
+  return MAGIC + salt + _fernet(secret, salt).encrypt(data)
+
+#------------------------------------------------------------------------------
+def unseal(secret, sealed):
+  '''
+  The inverse of :func:`seal`; raises :class:`InvalidSession` if
+  `sealed` was not sealed with `secret` or has been modified.
+  '''
+  if not sealed.startswith(MAGIC) or len(sealed) <= len(MAGIC) + SALTSIZE:
+    raise InvalidSession(_('unknown session format'))
+  salt = sealed[len(MAGIC):len(MAGIC) + SALTSIZE]
+  try:
+    return _fernet(secret, salt).decrypt(sealed[len(MAGIC) + SALTSIZE:])
+  except InvalidToken:
+    raise InvalidSession(_('session authentication failed'))
+
+#------------------------------------------------------------------------------
+class SessionStore(object):
+  '''
+  An on-disk store of the cookies of authenticated provider sessions,
+  keyed by driver name and account, so that a later dnssync run can
+  re-use a session instead of logging in again. Each session is kept
+  in its own file, sealed with the passphrase `secret` (see
+  :func:`seal`) and only readable by the current user.
+
+  If the optional `cryptography` package is not installed, the
+  sessions are stored unencrypted (but still only readable by the
+  current user) and a warning is logged.
+  '''
+
+  #----------------------------------------------------------------------------
+  def __init__(self, directory, secret, *args, **kw):
+    super(SessionStore, self).__init__(*args, **kw)
+    self.directory = directory
+    self.secret    = secret
+    self.encrypted = Fernet is not None
+    if not self.encrypted:
+      log.warning(
+        'the "cryptography" package is not installed: login sessions are'
+        ' stored unencrypted in %s (readable only by the current user)',
+        directory)
+    if not os.path.isdir(directory):
+      os.makedirs(directory, 0o700)
+
+  #----------------------------------------------------------------------------
+  def _path(self, driver, account):
+    key = hashlib.sha1(
+      ( driver + '\0' + ( account or '' ) ).encode('utf-8')).hexdigest()
+    return os.path.join(self.directory, key + '.session')
+
+  #----------------------------------------------------------------------------
+  def load(self, driver, account, cookies):
+    '''
+    Adds the cookies of the stored session of `account` with `driver`
+    to the cookie jar `cookies`. Returns whether or not a session was
+    found; stored sessions that cannot be decrypted are discarded.
+    '''
+    path = self._path(driver, account)
+    try:
+      with open(path, 'rb') as fp:
+        data = json.loads(self._unseal(fp.read()).decode('utf-8'))
+    except (IOError, OSError):
+      return False
+    except (InvalidSession, ValueError) as err:
+      log.warning('discarding stored session %s: %s', path, err)
+      self.delete(driver, account)
+      return False
+    for cookie in data:
+      cookies.set_cookie(requests.cookies.create_cookie(**cookie))
+    return True
+
+  #----------------------------------------------------------------------------
+  def save(self, driver, account, cookies):
+    '''
+    Stores the cookies in the cookie jar `cookies` as the session of
+    `account` with `driver`.
+    '''
+    data = [
+      dict(
+        name    = cookie.name,
+        value   = cookie.value,
+        domain  = cookie.domain,
+        path    = cookie.path,
+        secure  = cookie.secure,
+        expires = cookie.expires,
+      )
+      for cookie in cookies]
+    sealed = self._seal(json.dumps(data).encode('utf-8'))
+    # note: mkstemp creates the file only readable by the current user
+    fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as fp:
+        fp.write(sealed)
+      os.rename(tmp, self._path(driver, account))
+    except Exception:
+      os.unlink(tmp)
+      raise
+
+  #----------------------------------------------------------------------------
+  def _seal(self, data):
+    if self.encrypted:
+      return seal(self.secret, data)
+    return PLAINMAGIC + data
+
+  #----------------------------------------------------------------------------
+  def _unseal(self, sealed):
+    # note: only the format that this store writes is accepted, i.e.
+    # sessions stored with(out) `cryptography` are discarded (and the
+    # driver logs in again) once it is (un)installed
+    if self.encrypted:
+      return unseal(self.secret, sealed)
+    if not sealed.startswith(PLAINMAGIC):
+      raise InvalidSession(_('unknown session format'))
+    return sealed[len(PLAINMAGIC):]
+
+  #----------------------------------------------------------------------------
+  def delete(self, driver, account):
+    try:
+      os.unlink(self._path(driver, account))
+    except OSError:
+      pass
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import array
+import socket
+
+import six
+import dns.rdataclass
+import dns.rdatatype
+
+from .record import Record
+
+#------------------------------------------------------------------------------
+
+NONE          = -1
+MAXID         = 2 ** ( array.array('l').itemsize * 8 - 1 )
+
+# per-record flags
+FLAG_PACKED   = 0x01          # content is a packed A/AAAA address
+FLAG_UNICODE  = 0x02          # content was a unicode (not byte) string
+
+ADDRESS_FAMILIES = {
+  dns.rdatatype.A    : socket.AF_INET,
+  dns.rdatatype.AAAA : socket.AF_INET6,
+}
+
+#------------------------------------------------------------------------------
+def _int(value):
+  return NONE if value is None else value
+
+#------------------------------------------------------------------------------
+def _val(value):
+  return None if value == NONE else value
+
+#------------------------------------------------------------------------------
+def _code(fromText, text, codes):
+  ret = codes.get(text)
+  if ret is None:
+    ret = codes[text] = 0 if text is None else fromText(text)
+  return ret
+
+#------------------------------------------------------------------------------
+def _text(toText, code):
+  return None if not code else str(toText(code))
+
+#------------------------------------------------------------------------------
+def _pack(family, text):
+  # returns the packed form of the address `text`, or None if `text` is
+  # not an address in canonical notation (e.g. "::0" instead of "::"),
+  # i.e. if it would not be unpacked as exactly the same text
+  try:
+    ret = socket.inet_pton(family, str(text))
+  except (socket.error, UnicodeError, ValueError):
+    return None
+  return ret if socket.inet_ntop(family, ret) == text else None
+
+#------------------------------------------------------------------------------
+class RecordStore(object):
+  '''
+  A compact, columnar container of :class:`dnssync.api.Record`
+  objects for very large zones. Instead of one object per record, the
+  fields are kept in typed arrays: owner names are interned (each
+  distinct name is stored once), record classes and types are stored
+  as their numeric codes, TTLs, priorities, weights and ports as
+  integers, A and AAAA addresses (in canonical notation) in packed
+  binary form, and all other content in a single shared buffer. Record
+  IDs and other driver-specific attributes (see
+  :attr:`dnssync.api.Record.extras`) are kept in an integer array if
+  they are non-negative integers and in sparse dicts otherwise.
+
+  A RecordStore can be used wherever a list of records is expected
+  (e.g. as the return value of :meth:`dnssync.api.Driver.loadRecords`):
+  indexing and iterating it materializes Record objects on demand. For
+  bulk operations, the per-field accessors (:meth:`name`,
+  :meth:`content`, :meth:`keys`, etc.) avoid creating Records at all.
+  Note that each access returns a new Record, i.e. changes made to it
+  are not reflected in the store.
+  '''
+
+  #----------------------------------------------------------------------------
+  def __init__(self, records=None):
+    self._names    = []
+    self._nameids  = {}
+    self._id       = array.array('l')
+    self._name     = array.array('i')
+    self._rclass   = array.array('H')
+    self._type     = array.array('H')
+    self._flags    = array.array('B')
+    self._ttl      = array.array('i')
+    self._priority = array.array('i')
+    self._weight   = array.array('i')
+    self._port     = array.array('i')
+    self._offset   = array.array('L', [0])
+    self._content  = bytearray()
+    self._ids      = {}
+    self._extras   = {}
+    self._codes    = ({}, {})
+    if records is not None:
+      self.extend(records)
+
+  #----------------------------------------------------------------------------
+  def _intern(self, name):
+    ret = self._nameids.get(name)
+    if ret is None:
+      ret = self._nameids[name] = len(self._names)
+      self._names.append(name)
+    return ret
+
+  #----------------------------------------------------------------------------
+  def append(self, record):
+    idx   = len(self._type)
+    rtype = _code(dns.rdatatype.from_text, record.type, self._codes[0])
+    flags = 0
+    data  = record.content
+    if data is None:
+      data = b''
+      flags |= FLAG_PACKED
+    else:
+      if isinstance(data, six.text_type):
+        flags |= FLAG_UNICODE
+      packed = rtype in ADDRESS_FAMILIES and _pack(ADDRESS_FAMILIES[rtype], data)
+      if packed:
+        data = packed
+        flags |= FLAG_PACKED
+      elif flags & FLAG_UNICODE:
+        data = data.encode('utf-8')
+    self._name.append(self._intern(record.name))
+    self._rclass.append(_code(dns.rdataclass.from_text, record.rclass, self._codes[1]))
+    self._type.append(rtype)
+    self._flags.append(flags)
+    self._ttl.append(_int(record.ttl))
+    self._priority.append(_int(record.priority))
+    self._weight.append(_int(record.weight))
+    self._port.append(_int(record.port))
+    self._content.extend(data)
+    self._offset.append(len(self._content))
+    if isinstance(record.id, six.integer_types) and 0 <= record.id < MAXID:
+      self._id.append(record.id)
+    else:
+      self._id.append(NONE)
+      if record.id is not None:
+        self._ids[idx] = record.id
+    if record.extras:
+      self._extras[idx] = dict(record.extras)
+
+  #----------------------------------------------------------------------------
+  def extend(self, records):
+    for record in records:
+      self.append(record)
+
+  #----------------------------------------------------------------------------
+  def __len__(self):
+    return len(self._type)
+
+  #----------------------------------------------------------------------------
+  def __iter__(self):
+    for idx in range(len(self)):
+      yield self[idx]
+
+  #----------------------------------------------------------------------------
+  def __getitem__(self, idx):
+    if isinstance(idx, slice):
+      return [self[cur] for cur in range(*idx.indices(len(self)))]
+    if idx < 0:
+      idx += len(self)
+    if not 0 <= idx < len(self):
+      raise IndexError(idx)
+    ret = Record(
+      id       = _val(self._id[idx]) if idx not in self._ids else self._ids[idx],
+      name     = self.name(idx),
+      ttl      = _val(self._ttl[idx]),
+      rclass   = _text(dns.rdataclass.to_text, self._rclass[idx]),
+      type     = self.type(idx),
+      priority = _val(self._priority[idx]),
+      weight   = _val(self._weight[idx]),
+      port     = _val(self._port[idx]),
+      content  = self.content(idx),
+    )
+    extras = self._extras.get(idx)
+    if extras:
+      ret.update(**extras)
+    return ret
+
+  #----------------------------------------------------------------------------
+  def name(self, idx):
+    return self._names[self._name[idx]]
+
+  #----------------------------------------------------------------------------
+  def type(self, idx):
+    return _text(dns.rdatatype.to_text, self._type[idx])
+
+  #----------------------------------------------------------------------------
+  def content(self, idx):
+    flags = self._flags[idx]
+    data  = bytes(self._content[self._offset[idx]:self._offset[idx + 1]])
+    if flags & FLAG_PACKED:
+      if not data:
+        return None
+      data = socket.inet_ntop(ADDRESS_FAMILIES[self._type[idx]], data)
+      return six.text_type(data) if flags & FLAG_UNICODE else data
+    if flags & FLAG_UNICODE:
+      return data.decode('utf-8')
+    return data
+
+  #----------------------------------------------------------------------------
+  def keys(self):
+    '''
+    Generates the matching key of each record, i.e. the tuple
+    ``(rclass, type, priority, name)`` (see
+    :meth:`dnssync.api.Driver._recordKey`), in order, without
+    materializing any records.
+    '''
+    rclasses = {}
+    rtypes   = {}
+    for idx in range(len(self)):
+      rclass = self._rclass[idx]
+      if rclass not in rclasses:
+        rclasses[rclass] = _text(dns.rdataclass.to_text, rclass)
+      rtype = self._type[idx]
+      if rtype not in rtypes:
+        rtypes[rtype] = _text(dns.rdatatype.to_text, rtype)
+      yield (rclasses[rclass], rtypes[rtype],
+             _val(self._priority[idx]), self._names[self._name[idx]])
+
+  #----------------------------------------------------------------------------
+  def contents(self):
+    '''
+    Generates the content of each record, in order.
+    '''
+    for idx in range(len(self)):
+      yield self.content(idx)
+
+  #----------------------------------------------------------------------------
+  def texts(self):
+    '''
+    Generates the zone file text line of each record, in order (see
+    :meth:`dnssync.api.Record.toText`).
+    '''
+    for record in self:
+      yield record.toText()
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+# these are regression benchmarks: rather than asserting absolute
+# timings, which vary wildly between machines, they check how the
+# run time of an operation grows with the size of the input. since
+# they still depend on wall-clock timings, they only run when the
+# DNSSYNC_BENCHMARK environment variable is set, e.g.:
+#
+#   DNSSYNC_BENCHMARK=1 nosetests dnssync/api/test_benchmark.py
+
+import unittest
+import os
+import time
+import shutil
+import tempfile
+
+from aadict import aadict
+
+from dnssync import api
+
+from dnssync.api.record import recordsToZone
+from dnssync.api import engine, util
+
+from .test_driver import FakeDriver, rec
+from .test_record import textToZone
+
+#------------------------------------------------------------------------------
+benchmark = unittest.skipUnless(
+  os.environ.get('DNSSYNC_BENCHMARK'),
+  'benchmarks only run with DNSSYNC_BENCHMARK set')
+
+#------------------------------------------------------------------------------
+def bestof(count, func, *args, **kw):
+  ret = None
+  for idx in range(count):
+    start = time.time()
+    func(*args, **kw)
+    dur = time.time() - start
+    if ret is None or dur < ret:
+      ret = dur
+  return ret
+
+#------------------------------------------------------------------------------
+class TestBenchmark(unittest.TestCase):
+
+  # the growth factor of the input size
+  SCALE = 8
+
+  # the maximum acceptable run-time growth factor -- linear scaling
+  # would be ``SCALE``, quadratic would be ``SCALE ** 2``
+  LIMIT = SCALE * 3
+
+  #----------------------------------------------------------------------------
+  def assertScales(self, func, size):
+    small = bestof(3, func, size)
+    large = bestof(3, func, size * self.SCALE)
+    ratio = large / max(small, 0.0001)
+    self.assertLess(
+      ratio, self.LIMIT,
+      'run time grew by %.1fx (%.4fs => %.4fs) for a %dx larger input'
+      % (ratio, small, large, self.SCALE))
+
+  #----------------------------------------------------------------------------
+  def makeZone(self, size, offset=0):
+    records = [
+      rec('example.com.', 'SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300'),
+      rec('example.com.', 'NS', 'ns1.example.com.'),
+    ]
+    records += [rec('host%d.example.com.' % (idx,), 'A', '10.0.%d.%d' % divmod((idx + offset) % 65536, 256))
+                for idx in range(size)]
+    return recordsToZone(records, 'example.com.')
+
+  #----------------------------------------------------------------------------
+  @benchmark
+  def test_zoneChanges(self):
+    zones = dict()
+    for size in (2000, 2000 * self.SCALE):
+      zones[size] = (self.makeZone(size), self.makeZone(size, size // 100))
+    def diff(size):
+      zoneA, zoneB = zones[size]
+      self.assertEqual(len(engine.zoneChanges(zoneA, zoneB)), size)
+    self.assertScales(diff, 2000)
+
+  #----------------------------------------------------------------------------
+  @benchmark
+  def test_put_planning(self):
+    def plan(size):
+      records    = [rec('host%d.example.com.' % (idx,), 'A', '10.0.%d.%d' % divmod(idx % 65536, 256))
+                    for idx in range(size)]
+      newrecords = [rec('host%d.example.com.' % (idx,), 'A', '10.1.%d.%d' % divmod(idx % 65536, 256))
+                    if idx % 2 else rec(r.name, r.type, r.content)
+                    for idx, r in enumerate(records)]
+      driver = FakeDriver(records)
+      driver.makePutContext = lambda name, zone: aadict(
+        name=name, zone=zone, records=records, newrecords=newrecords)
+      res = driver.put('example.com.', None)
+      self.assertEqual(res.updated, size // 2)
+    self.assertScales(plan, 2000)
+
+  #----------------------------------------------------------------------------
+  @benchmark
+  def test_recordsToZone(self):
+    records = [
+      rec('example.com.', 'SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300'),
+      rec('example.com.', 'NS', 'ns1.example.com.'),
+    ]
+    records += [rec('host%d.example.com.' % (idx,), 'A', '10.0.%d.%d' % divmod(idx % 65536, 256))
+                for idx in range(4000)]
+    records += [rec('txt%d.example.com.' % (idx,), 'TXT', 'some text %d' % (idx,))
+                for idx in range(1000)]
+    direct = bestof(3, recordsToZone, records, 'example.com.')
+    text   = bestof(3, textToZone, records, 'example.com.')
+    self.assertLess(
+      direct, text,
+      'building a zone directly (%.4fs) was slower than a text round-trip (%.4fs)'
+      % (direct, text))
+
+  #----------------------------------------------------------------------------
+  @benchmark
+  def test_canonicalization(self):
+    # simulates the per-record (and per-content-token) name
+    # canonicalization that the drivers do, e.g. PowerDNS's getRecords
+    # and createRecord, on a large zone with the usual mix of names
+    records = []
+    for idx in range(5000):
+      records.append(('Host%d.Example.com' % (idx,), 'mail.example.com.'))
+      records.append(('host%d.example.com.' % (idx,), '10 mx%d.example.com.' % (idx % 10,)))
+      records.append(('host%d.example.com' % (idx,), 'ns1.example.com ns2.example.com'))
+    def canonicalize(absdom, reldom):
+      for name, content in records:
+        absdom(name)
+        ' '.join(absdom(comp) for comp in content.split())
+        reldom(name)
+        ' '.join(reldom(comp) for comp in content.split(' '))
+    # start from empty caches so that entries left by other tests do
+    # not trigger a generation swap in the middle of the measurement
+    util._absdom_cache.clear()
+    util._reldom_cache.clear()
+    raw    = bestof(3, canonicalize, util._absdom, util._reldom)
+    cached = bestof(3, canonicalize, util.absdom, util.reldom)
+    self.assertLess(
+      cached, raw / 2,
+      'cached canonicalization (%.4fs) was not much faster than uncached (%.4fs)'
+      % (cached, raw))
+
+  #----------------------------------------------------------------------------
+  @benchmark
+  def test_overlap(self):
+    # measures the latency saved by fetching the hosted zone while the
+    # local zonefile is being parsed, with a stand-in provider whose
+    # "network" latency is about as long as the parsing
+    tmpdir = tempfile.mkdtemp(prefix='dnssync-test-')
+    try:
+      path = os.path.join(tmpdir, 'example.com.zone')
+      with open(path, 'w') as fp:
+        self.makeZone(3000).to_file(fp, relativize=False)
+      ctxt   = aadict(
+        domain='example.com.', zonefile=path, driver=None, options=aadict())
+      parse  = bestof(3, lambda: engine.openZonefile(ctxt).load())
+      driver = FakeDriver([
+        rec('example.com.', 'SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300'),
+        rec('example.com.', 'NS', 'ns1.example.com.'),
+      ])
+      realGetRecords = driver.getRecords
+      def getRecords(name):
+        time.sleep(parse)
+        return realGetRecords(name)
+      driver.getRecords = getRecords
+      ctxt.driver = driver
+      def sequential():
+        engine.getHostedZone(ctxt)
+        engine.zoneDigests(engine.openZonefile(ctxt).load())
+      def overlapped():
+        # as done by ``diff``
+        hosted, local = engine.concurrently(
+          lambda: engine.getHostedZone(ctxt), engine.openZonefile(ctxt).load)
+        engine.zoneDigests(local)
+      before = bestof(3, sequential)
+      after  = bestof(3, overlapped)
+      self.assertLess(
+        after, before * 0.8,
+        'overlapped fetch and parse (%.4fs) was not faster than sequential (%.4fs)'
+        % (after, before))
+    finally:
+      shutil.rmtree(tmpdir)
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import os
+import json
+import pickle
+import shutil
+import sqlite3
+import tempfile
+
+import dns.name
+import dns.zone
+
+from dnssync import api
+from dnssync.api import cache as cachemod
+from dnssync.api.cache import SnapshotCache, ZoneCache
+from dnssync.api.zonefile import ZoneFile
+
+from .test_driver import FakeDriver, rec, ZONE
+from .test_zonefile import BIGZONE
+
+#------------------------------------------------------------------------------
+SOA = 'ns1.example.com. hostmaster.example.com. {} 7200 1800 1209600 300'
+
+#------------------------------------------------------------------------------
+class SerialDriver(FakeDriver):
+
+  serial = 2
+
+  #----------------------------------------------------------------------------
+  def __init__(self, *args, **kw):
+    super(SerialDriver, self).__init__(*args, **kw)
+    self.fetches = 0
+
+  #----------------------------------------------------------------------------
+  def getSerial(self, name):
+    return self.serial
+
+  #----------------------------------------------------------------------------
+  def getRecords(self, name):
+    self.fetches += 1
+    return [rec(r.name, r.type, r.content, r.ttl, r.priority, pid=idx)
+            for idx, r in enumerate(self.records)]
+
+#------------------------------------------------------------------------------
+class TestCache(unittest.TestCase):
+
+  maxDiff = None
+
+  #----------------------------------------------------------------------------
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp(prefix='dnssync-test-')
+
+  #----------------------------------------------------------------------------
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  #----------------------------------------------------------------------------
+  def records(self):
+    return [
+      rec('example.com.', 'SOA', SOA.format(2)),
+      rec('example.com.', 'NS', 'ns1.example.com.'),
+      rec('example.com.', 'NS', 'ns2.example.com.'),
+      rec('example.com.', 'MX', 'mail.example.com.', priority=10),
+      rec('example.com.', 'MX', 'mail2.example.com.', priority=20),
+      rec('www.example.com.', 'A', '10.0.0.1'),
+      rec('mail.example.com.', 'A', '10.0.0.3'),
+      rec('ftp.example.com.', 'A', '10.0.0.4'),
+    ]
+
+  #----------------------------------------------------------------------------
+  def test_snapshot(self):
+    cache = SnapshotCache(os.path.join(self.tmpdir, 'sub', 'snapshots.db'))
+    self.assertIsNone(cache.load('fake', 'user', 'example.com.'))
+    cache.save('fake', 'user', 'example.com.', 7, [
+      rec('www.example.com.', 'A', '10.0.0.1', zoneedit_id='123')])
+    snap = cache.load('fake', 'user', 'example.com.')
+    self.assertEqual(snap.serial, 7)
+    self.assertEqual([r.toDict() for r in snap.records], [dict(
+      id=None, name='www.example.com.', ttl=3600, rclass='IN', type='A',
+      content='10.0.0.1', priority=None, weight=None, port=None,
+      zoneedit_id='123')])
+    self.assertIsInstance(snap.records[0].content, str)
+    self.assertIsNone(cache.load('fake', 'other', 'example.com.'))
+    cache.delete('fake', 'user', 'example.com.')
+    self.assertIsNone(cache.load('fake', 'user', 'example.com.'))
+
+  #----------------------------------------------------------------------------
+  def test_snapshot_format(self):
+    path  = os.path.join(self.tmpdir, 'snapshots.db')
+    cache = SnapshotCache(path)
+    cache.save('fake', 'user', 'example.com.', 7, [
+      rec('www.example.com.', 'TXT', u'caf\xe9', pid=3)])
+    def stored(data=None):
+      conn = sqlite3.connect(path)
+      try:
+        with conn:
+          if data is not None:
+            conn.execute('UPDATE snapshot SET records = ?', (sqlite3.Binary(data),))
+          return bytes(conn.execute('SELECT records FROM snapshot').fetchone()[0])
+      finally:
+        conn.close()
+    data = json.loads(stored().decode('utf-8'))
+    self.assertEqual(data['version'], SnapshotCache.SNAPSHOT_VERSION)
+    self.assertEqual(data['records'], [dict(
+      name='www.example.com.', ttl=3600, rclass='IN', type='TXT',
+      content=u'caf\xe9', pid=3)])
+    self.assertEqual(
+      cache.load('fake', 'user', 'example.com.').records[0].content, u'caf\xe9')
+    # snapshots of other versions, and pickled ones, are ignored
+    stored(json.dumps(dict(version=0, records=[])).encode('utf-8'))
+    self.assertIsNone(cache.load('fake', 'user', 'example.com.'))
+    stored(pickle.dumps([dict(name='www.example.com.')], 2))
+    self.assertIsNone(cache.load('fake', 'user', 'example.com.'))
+
+  #----------------------------------------------------------------------------
+  def test_loadRecords(self):
+    driver = SerialDriver(self.records(), params=dict(cachedir=self.tmpdir, username='u'))
+    first  = driver.loadRecords('example.com.')
+    second = driver.loadRecords('example.com.')
+    self.assertEqual(driver.fetches, 1)
+    self.assertEqual(
+      [r.toDict() for r in first], [r.toDict() for r in second])
+    driver.serial = 3
+    driver.loadRecords('example.com.')
+    self.assertEqual(driver.fetches, 2)
+
+  #----------------------------------------------------------------------------
+  def test_loadRecords_nocache(self):
+    driver = SerialDriver(self.records())
+    driver.loadRecords('example.com.')
+    driver.loadRecords('example.com.')
+    self.assertEqual(driver.fetches, 2)
+
+  #----------------------------------------------------------------------------
+  def test_put_updates_snapshot(self):
+    self.checkPutUpdatesSnapshot()
+
+  #----------------------------------------------------------------------------
+  def test_put_updates_snapshot_columnar(self):
+    self.checkPutUpdatesSnapshot(columnar='true')
+
+  #----------------------------------------------------------------------------
+  def checkPutUpdatesSnapshot(self, **params):
+    driver = SerialDriver(
+      self.records(), params=dict(cachedir=self.tmpdir, username='u', **params))
+    zone   = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    def deleteRecord(context, record):
+      # the provider bumps the serial on every change
+      driver.serial = 3
+      FakeDriver.deleteRecord(driver, context, record)
+    driver.deleteRecord = deleteRecord
+    driver.put('example.com.', zone)
+    self.assertEqual(driver.fetches, 1)
+    self.assertEqual(driver.calls, [
+      ('update', 'www.example.com.', 'A', '10.0.0.2'),
+      ('delete', 'ftp.example.com.', 'A', '10.0.0.4'),
+    ])
+    snap = driver.cache.load('fake', 'u', 'example.com.')
+    self.assertEqual(snap.serial, 3)
+    self.assertEqual(
+      sorted((r.name, r.type, r.content, r.pid) for r in snap.records), [
+        ('example.com.', 'MX', 'mail.example.com.', 3),
+        ('example.com.', 'MX', 'mail2.example.com.', 4),
+        ('example.com.', 'NS', 'ns1.example.com.', 1),
+        ('example.com.', 'NS', 'ns2.example.com.', 2),
+        ('example.com.', 'SOA', SOA.format(3), 0),
+        ('mail.example.com.', 'A', '10.0.0.3', 6),
+        ('www.example.com.', 'A', '10.0.0.2', 5),
+      ])
+    # a second put against the unchanged zone needs no fetch at all
+    driver.calls = []
+    driver.put('example.com.', zone)
+    self.assertEqual(driver.fetches, 1)
+    self.assertEqual(driver.calls, [])
+
+  #----------------------------------------------------------------------------
+  def test_put_create_invalidates(self):
+    driver = SerialDriver(self.records()[:-2], params=dict(cachedir=self.tmpdir, username='u'))
+    zone   = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    driver.put('example.com.', zone)
+    self.assertIsNone(driver.cache.load('fake', 'u', 'example.com.'))
+
+  #----------------------------------------------------------------------------
+  def test_put_error_invalidates(self):
+    driver = SerialDriver(self.records(), params=dict(cachedir=self.tmpdir, username='u'))
+    zone   = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    driver.loadRecords('example.com.')
+    self.assertIsNotNone(driver.cache.load('fake', 'u', 'example.com.'))
+    def deleteRecord(context, record):
+      raise api.DriverError('could not delete record')
+    driver.deleteRecord = deleteRecord
+    with self.assertRaises(api.DriverError):
+      driver.put('example.com.', zone)
+    self.assertIsNone(driver.cache.load('fake', 'u', 'example.com.'))
+
+  #----------------------------------------------------------------------------
+  def zonefile(self, text, name='example.com.zone'):
+    path = os.path.join(self.tmpdir, name)
+    with open(path, 'w') as fp:
+      fp.write(text)
+    return path
+
+  #----------------------------------------------------------------------------
+  def rdatas(self, zone):
+    return sorted(
+      (name.to_text(), ttl, rdata.to_text()) for name, ttl, rdata in zone.iterate_rdatas())
+
+  #----------------------------------------------------------------------------
+  def test_zonecache(self):
+    cache = ZoneCache(os.path.join(self.tmpdir, 'zones'))
+    path  = self.zonefile(BIGZONE + 'txt IN TXT "x" "y z"\nsrv IN SRV 1 2 3 host0\n')
+    zone  = ZoneFile(path, 'example.com.', cache=cache)
+    self.assertIsNone(zone.cached())
+    parsed = zone.load()
+    zone   = ZoneFile(path, 'example.com.', cache=cache)
+    self.assertIsNotNone(zone.cached())
+    self.assertEqual(self.rdatas(zone.load()), self.rdatas(parsed))
+    self.assertEqual(self.rdatas(zone), self.rdatas(parsed))
+    self.assertEqual(
+      sorted(r.toText() for r in zone.records()),
+      sorted(r.toText() for r in ZoneFile(path, 'example.com.').records()))
+    # a different origin is a different entry
+    self.assertIsNone(ZoneFile(path, 'example.net.', cache=cache).cached())
+
+  #----------------------------------------------------------------------------
+  def test_zonecache_modified(self):
+    cache = ZoneCache(os.path.join(self.tmpdir, 'zones'))
+    path  = self.zonefile(ZONE)
+    ZoneFile(path, 'example.com.', cache=cache).load()
+    self.assertIsNotNone(cache.load(path, dns.name.from_text('example.com.')))
+    # same size and mtime, but different content
+    info = os.stat(path)
+    self.zonefile(ZONE.replace('10.0.0.2', '10.0.0.9'))
+    os.utime(path, (info.st_atime, info.st_mtime))
+    zone = ZoneFile(path, 'example.com.', cache=cache)
+    self.assertIsNone(zone.cached())
+    self.assertIn('10.0.0.9', [r.to_text() for n, t, r in zone.load().iterate_rdatas()])
+
+  #----------------------------------------------------------------------------
+  def test_zonecache_digest_lazy(self):
+    cache = ZoneCache(os.path.join(self.tmpdir, 'zones'))
+    path  = self.zonefile(ZONE)
+    ZoneFile(path, 'example.com.', cache=cache).load()
+    digests = []
+    realDigest = cachemod.filedigest
+    def filedigest(path):
+      digests.append(path)
+      return realDigest(path)
+    cachemod.filedigest = filedigest
+    try:
+      # a size change alone invalidates the entry, without a digest
+      self.zonefile(ZONE + 'ftp 3600 IN A 10.0.0.4\n')
+      zone = ZoneFile(path, 'example.com.', cache=cache)
+      self.assertIsNone(zone.cached())
+      self.assertIsNone(zone.digest)
+      self.assertEqual(digests, [])
+    finally:
+      cachemod.filedigest = realDigest
+
+  #----------------------------------------------------------------------------
+  def test_zonecache_include(self):
+    cache = ZoneCache(os.path.join(self.tmpdir, 'zones'))
+    other = self.zonefile('www 3600 IN A 10.0.0.2\n', name='other.zone')
+    path  = self.zonefile(
+      '\n'.join(line for line in ZONE.split('\n') if not line.startswith('www'))
+      + '$INCLUDE ' + other + '\n')
+    zone  = ZoneFile(path, 'example.com.', cache=cache).load()
+    self.assertIn('10.0.0.2', [r.to_text() for n, t, r in zone.iterate_rdatas()])
+    self.assertIsNone(cache.load(path, dns.name.from_text('example.com.')))
+    self.zonefile('www 3600 IN A 10.0.0.9\n', name='other.zone')
+    zone  = ZoneFile(path, 'example.com.', cache=cache).load()
+    self.assertIn('10.0.0.9', [r.to_text() for n, t, r in zone.iterate_rdatas()])
+
+  #----------------------------------------------------------------------------
+  def test_zonecache_corrupt(self):
+    cache = ZoneCache(os.path.join(self.tmpdir, 'zones'))
+    path  = self.zonefile(ZONE)
+    ZoneFile(path, 'example.com.', cache=cache).load()
+    entry = cache._entry(path, dns.name.from_text('example.com.'))
+    with open(entry, 'rb') as fp:
+      data = fp.read()
+    with open(entry, 'wb') as fp:
+      fp.write(data[:-3])
+    self.assertIsNone(cache.load(path, dns.name.from_text('example.com.')))
+
+  #----------------------------------------------------------------------------
+  def test_zonecache_evict(self):
+    cache = ZoneCache(os.path.join(self.tmpdir, 'zones'))
+    paths = [self.zonefile(ZONE, name='zone{}'.format(idx)) for idx in range(3)]
+    sizes = []
+    for idx, path in enumerate(paths):
+      ZoneFile(path, 'example.com.', cache=cache).load()
+      entry = cache._entry(path, dns.name.from_text('example.com.'))
+      os.utime(entry, (1000 + idx, 1000 + idx))
+      sizes.append(os.stat(entry).st_size)
+    cache.maxsize = sum(sizes) - 1
+    # using the oldest entry protects it from eviction
+    self.assertIsNotNone(ZoneFile(paths[0], 'example.com.', cache=cache).cached())
+    cache.evict()
+    self.assertEqual(
+      [bool(ZoneFile(path, 'example.com.', cache=cache).cached()) for path in paths],
+      [True, False, True])
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
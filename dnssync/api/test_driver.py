@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import threading
+import time
+import shutil
+import tempfile
+
+import dns.zone
+from aadict import aadict
+
+from dnssync import api
+
+#------------------------------------------------------------------------------
+ZONE = '''\
+$ORIGIN example.com.
+@     3600 IN SOA  ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300
+@     3600 IN NS   ns1.example.com.
+@     3600 IN NS   ns2.example.com.
+@     3600 IN MX   10 mail.example.com.
+@     3600 IN MX   20 mail2.example.com.
+www   3600 IN A    10.0.0.2
+mail  3600 IN A    10.0.0.3
+'''
+
+#------------------------------------------------------------------------------
+def rec(name, type, content, ttl=3600, priority=None, **kw):
+  return api.Record(
+    name=name, ttl=ttl, rclass='IN', type=type, content=content,
+    priority=priority, **kw)
+
+#------------------------------------------------------------------------------
+class FakeDriver(api.Driver):
+
+  name = 'fake'
+
+  #----------------------------------------------------------------------------
+  def __init__(self, records=None, params=None, *args, **kw):
+    super(FakeDriver, self).__init__(None, aadict(params or {}), *args, **kw)
+    self.records = records or []
+    self.calls   = []
+
+  #----------------------------------------------------------------------------
+  def _zones(self):
+    self.calls.append(('zones',))
+    return {'example.com.': 1}
+
+  #----------------------------------------------------------------------------
+  def getRecords(self, name):
+    return self.records[:]
+
+  #----------------------------------------------------------------------------
+  def createRecord(self, context, record):
+    self.calls.append(('create', record.name, record.type, record.content))
+
+  #----------------------------------------------------------------------------
+  def updateRecord(self, context, record, newrecord):
+    self.calls.append(('update', record.name, record.type, newrecord.content))
+
+  #----------------------------------------------------------------------------
+  def deleteRecord(self, context, record):
+    self.calls.append(('delete', record.name, record.type, record.content))
+
+#------------------------------------------------------------------------------
+class TestDriver(unittest.TestCase):
+
+  maxDiff = None
+
+  #----------------------------------------------------------------------------
+  def put(self, records, text=ZONE):
+    driver = FakeDriver(records)
+    zone   = dns.zone.from_text(text, origin='example.com.', relativize=False)
+    res    = driver.put('example.com.', zone)
+    return res, sorted(driver.calls)
+
+  #----------------------------------------------------------------------------
+  def baseRecords(self):
+    return [
+      rec('example.com.', 'SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300'),
+      rec('example.com.', 'NS', 'ns1.example.com.'),
+      rec('example.com.', 'NS', 'ns2.example.com.'),
+      rec('example.com.', 'MX', 'mail.example.com.', priority=10),
+      rec('example.com.', 'MX', 'mail2.example.com.', priority=20),
+      rec('www.example.com.', 'A', '10.0.0.2'),
+      rec('mail.example.com.', 'A', '10.0.0.3'),
+    ]
+
+  #----------------------------------------------------------------------------
+  def test_put_nochange(self):
+    res, calls = self.put(self.baseRecords())
+    self.assertEqual(res, dict(created=0, updated=0, deleted=0))
+    self.assertEqual(calls, [])
+
+  #----------------------------------------------------------------------------
+  def test_put_changes(self):
+    records = self.baseRecords()
+    records[3].content = 'old-mail.example.com.'
+    records[5].content = '10.0.0.1'
+    records.append(rec('ftp.example.com.', 'A', '10.0.0.4'))
+    records.append(rec('example.com.', 'NS', 'ns3.example.com.'))
+    res, calls = self.put(records)
+    self.assertEqual(res, dict(created=0, updated=2, deleted=2))
+    self.assertEqual(calls, [
+      ('delete', 'example.com.', 'NS', 'ns3.example.com.'),
+      ('delete', 'ftp.example.com.', 'A', '10.0.0.4'),
+      ('update', 'example.com.', 'MX', 'mail.example.com.'),
+      ('update', 'www.example.com.', 'A', '10.0.0.2'),
+    ])
+
+  #----------------------------------------------------------------------------
+  def test_put_soa_serial_regression(self):
+    records = self.baseRecords()
+    records[0].content = 'ns1.example.com. hostmaster.example.com. 3 7200 1800 1209600 300'
+    res, calls = self.put(records)
+    self.assertEqual(res, dict(created=0, updated=0, deleted=0, refused=1))
+    self.assertEqual(calls, [])
+
+  #----------------------------------------------------------------------------
+  def test_put_multiple(self):
+    records = self.baseRecords()
+    records.append(rec('www.example.com.', 'A', '10.0.0.9'))
+    res, calls = self.put(records)
+    self.assertEqual(res, dict(created=0, updated=0, deleted=1))
+    self.assertEqual(calls, [('delete', 'www.example.com.', 'A', '10.0.0.9')])
+
+  #----------------------------------------------------------------------------
+  def test_put_roundrobin(self):
+    records = self.baseRecords()
+    records += [
+      rec('www.example.com.', 'A', '10.0.0.5'),
+      rec('www.example.com.', 'A', '10.0.0.6'),
+      rec('www.example.com.', 'TXT', 'a'),
+      rec('www.example.com.', 'TXT', 'b'),
+    ]
+    res, calls = self.put(records, ZONE + (
+      'www 3600 IN A 10.0.0.5\n'
+      'www 3600 IN A 10.0.0.7\n'
+      'www 3600 IN A 10.0.0.8\n'
+      'www 3600 IN TXT "c"\n'
+      'www 3600 IN TXT "b"\n'))
+    self.assertEqual(res, dict(created=1, updated=2, deleted=0))
+    self.assertEqual(calls, [
+      ('create', 'www.example.com.', 'A', '10.0.0.8'),
+      ('update', 'www.example.com.', 'A', '10.0.0.7'),
+      ('update', 'www.example.com.', 'TXT', 'c'),
+    ])
+
+  #----------------------------------------------------------------------------
+  def test_put_assignment(self):
+    # the MX records are paired so that each update changes as few
+    # fields as possible (here: only the priority)
+    records = self.baseRecords()
+    records[3].priority = 30
+    records[4].priority = 40
+    driver  = FakeDriver(records)
+    driver.updateRecord = lambda context, record, newrecord: driver.calls.append(
+      (record.content, record.priority, newrecord.content, newrecord.priority))
+    res = driver.put(
+      'example.com.', dns.zone.from_text(ZONE, origin='example.com.', relativize=False))
+    self.assertEqual(res, dict(created=0, updated=2, deleted=0))
+    self.assertEqual(sorted(driver.calls), [
+      ('mail.example.com.', 30, 'mail.example.com.', 10),
+      ('mail2.example.com.', 40, 'mail2.example.com.', 20),
+    ])
+
+  #----------------------------------------------------------------------------
+  def test_put_normalized(self):
+    # records are matched by their normalized content, so a reordered
+    # RRset in a different notation does not cause any writes
+    records = self.baseRecords()
+    records[1].content = 'NS2.Example.com'
+    records[2].content = 'NS1.Example.com'
+    records[3].content = 'MAIL.example.com'
+    res, calls = self.put(records)
+    self.assertEqual(res, dict(created=0, updated=0, deleted=0))
+    self.assertEqual(calls, [])
+
+  #----------------------------------------------------------------------------
+  def test_put_concurrent(self):
+    records = [rec('h%d.example.com.' % (idx,), 'A', '10.0.0.%d' % (idx,))
+               for idx in range(12)]
+    driver  = FakeDriver(records, params=dict(jobs='4'))
+    lock    = threading.Lock()
+    state   = dict(active=0, peak=0)
+    def deleteRecord(context, record):
+      with lock:
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+      time.sleep(0.01)
+      driver.calls.append(('delete', record.name))
+      with lock:
+        state['active'] -= 1
+    driver.deleteRecord = deleteRecord
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    res  = driver.put('example.com.', zone)
+    self.assertEqual(res, dict(created=7, updated=0, deleted=12))
+    self.assertEqual(len([c for c in driver.calls if c[0] == 'delete']), 12)
+    self.assertEqual(state['peak'], 4)
+
+  #----------------------------------------------------------------------------
+  def test_put_concurrent_error(self):
+    driver = FakeDriver(params=dict(jobs=4))
+    def createRecord(context, record):
+      raise api.DriverError('could not add record')
+    driver.createRecord = createRecord
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    with self.assertRaises(api.DriverError):
+      driver.put('example.com.', zone)
+
+  #----------------------------------------------------------------------------
+  def test_put_multiple_samecontent(self):
+    records = self.baseRecords()
+    records.append(rec('example.com.', 'NS', 'ns1.example.com.'))
+    res, calls = self.put(records)
+    self.assertEqual(res, dict(created=0, updated=0, deleted=1))
+    self.assertEqual(calls, [('delete', 'example.com.', 'NS', 'ns1.example.com.')])
+
+  #----------------------------------------------------------------------------
+  def test_put_batched(self):
+    driver = FakeDriver(self.baseRecords()[:1])
+    driver.capabilities = aadict(
+      api.Driver.capabilities,
+      batch = aadict(create=4, update=1, delete=1))
+    def createRecords(context, records):
+      driver.calls.append(('creates', len(records)))
+    driver.createRecords = createRecords
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    plan = driver.plan('example.com.', zone)
+    self.assertEqual(
+      driver.estimateRequests(plan.creates, plan.updates, plan.deletes), 2)
+    res  = driver.put('example.com.', zone)
+    self.assertEqual(res, dict(created=6, updated=0, deleted=0))
+    self.assertEqual(sorted(driver.calls), [('creates', 2), ('creates', 4)])
+
+  #----------------------------------------------------------------------------
+  def test_put_bytype(self):
+    records = self.baseRecords()
+    records[3].content = 'old-mail.example.com.'
+    records.append(rec('ftp.example.com.', 'A', '10.0.0.4'))
+    records.append(rec('example.com.', 'NS', 'ns3.example.com.'))
+    driver = FakeDriver(records, params=dict(jobs=4))
+    driver.capabilities = aadict(
+      api.Driver.capabilities,
+      bytype = True,
+      cost   = aadict(api.Driver.capabilities.cost, type=3))
+    def putChangesByType(context, rtype, creates, updates, deletes):
+      driver.calls.append((rtype, len(creates), len(updates), len(deletes)))
+    driver.putChangesByType = putChangesByType
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    plan = driver.plan('example.com.', zone)
+    self.assertEqual(
+      driver.estimateRequests(plan.creates, plan.updates, plan.deletes), 9)
+    res  = driver.put('example.com.', zone)
+    self.assertEqual(res, dict(created=0, updated=1, deleted=2))
+    self.assertEqual(sorted(driver.calls), [
+      ('A', 0, 0, 1), ('MX', 0, 1, 0), ('NS', 0, 0, 1)])
+
+  #----------------------------------------------------------------------------
+  def test_put_bytype_override(self):
+    # drivers that only override `putChangesByType` (i.e. that predate
+    # `capabilities`) still have their changes applied by type
+    class TypeDriver(FakeDriver):
+      def putChangesByType(self, context, rtype, creates, updates, deletes):
+        self.calls.append((rtype, len(creates), len(updates), len(deletes)))
+    records = self.baseRecords()
+    records[3].content = 'old-mail.example.com.'
+    records.append(rec('ftp.example.com.', 'A', '10.0.0.4'))
+    driver = TypeDriver(records)
+    res = driver.put(
+      'example.com.', dns.zone.from_text(ZONE, origin='example.com.', relativize=False))
+    self.assertEqual(res, dict(created=0, updated=1, deleted=1))
+    self.assertEqual(sorted(driver.calls), [('A', 0, 0, 1), ('MX', 0, 1, 0)])
+    # and the default implementation applies them record by record
+    driver = FakeDriver(records)
+    driver.capabilities = aadict(api.Driver.capabilities, bytype=True)
+    res = driver.put(
+      'example.com.', dns.zone.from_text(ZONE, origin='example.com.', relativize=False))
+    self.assertEqual(res, dict(created=0, updated=1, deleted=1))
+    self.assertEqual(sorted(driver.calls), [
+      ('delete', 'ftp.example.com.', 'A', '10.0.0.4'),
+      ('update', 'example.com.', 'MX', 'mail.example.com.'),
+    ])
+
+  #----------------------------------------------------------------------------
+  def test_put_capability_jobs(self):
+    records = [rec('h%d.example.com.' % (idx,), 'A', '10.0.0.%d' % (idx,))
+               for idx in range(6)]
+    driver  = FakeDriver(records, params=dict(jobs='4'))
+    driver.capabilities = aadict(api.Driver.capabilities, jobs=1)
+    lock    = threading.Lock()
+    state   = dict(active=0, peak=0)
+    def deleteRecord(context, record):
+      with lock:
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+      time.sleep(0.01)
+      with lock:
+        state['active'] -= 1
+    driver.deleteRecord = deleteRecord
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    driver.put('example.com.', zone)
+    self.assertEqual(state['peak'], 1)
+
+  #----------------------------------------------------------------------------
+  def test_put_ratelimited(self):
+    driver = FakeDriver(self.baseRecords()[:1], params=dict(jobs=4))
+    driver.controller.BACKOFF = 0.01
+    failed = []
+    def createRecord(context, record):
+      if not failed:
+        failed.append(record.name)
+        raise api.RateLimited('too many requests')
+      driver.calls.append(('create', record.name))
+    driver.createRecord = createRecord
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    res  = driver.put('example.com.', zone)
+    self.assertEqual(res, dict(created=6, updated=0, deleted=0))
+    self.assertEqual(len(driver.calls), 6)
+    self.assertEqual(driver.controller.epoch, 1)
+
+  #----------------------------------------------------------------------------
+  def test_checkRateLimit(self):
+    driver = FakeDriver()
+    driver.checkRateLimit('Record not found')
+    with self.assertRaises(api.RateLimited):
+      driver.checkRateLimit('Too many requests; please try again later')
+
+  #----------------------------------------------------------------------------
+  def test_zones_memoized(self):
+    driver = FakeDriver()
+    self.assertEqual(driver.zoneId('example.com.'), 1)
+    self.assertEqual(driver.list(), ['example.com.'])
+    self.assertEqual(driver.calls, [('zones',)])
+    with self.assertRaises(api.DomainNotFound):
+      driver.zoneId('example.org.')
+    self.assertEqual(driver.calls, [('zones',)])
+
+  #----------------------------------------------------------------------------
+  def test_zones_persisted(self):
+    tmpdir = tempfile.mkdtemp(prefix='dnssync-test-')
+    try:
+      params = dict(cachedir=tmpdir, catalogttl='3600', username='me')
+      driver = FakeDriver(params=params)
+      self.assertEqual(driver.zoneId('example.com.'), 1)
+      self.assertEqual(driver.calls, [('zones',)])
+      # a later run uses the stored catalog...
+      driver = FakeDriver(params=params)
+      self.assertEqual(driver.zoneId('example.com.'), 1)
+      self.assertEqual(driver.calls, [])
+      # ... but re-fetches it (once) for unknown zones
+      with self.assertRaises(api.DomainNotFound):
+        driver.zoneId('example.org.')
+      with self.assertRaises(api.DomainNotFound):
+        driver.zoneId('example.net.')
+      self.assertEqual(driver.calls, [('zones',)])
+      # and an expired catalog is re-fetched
+      driver = FakeDriver(params=dict(params, catalogttl='0.000001'))
+      driver.zones()
+      self.assertEqual(driver.calls, [('zones',)])
+    finally:
+      shutil.rmtree(tmpdir)
+
+  #----------------------------------------------------------------------------
+  def test_prefetchRecords(self):
+    driver = FakeDriver(self.baseRecords())
+    fetches = []
+    realGetRecords = driver.getRecords
+    def getRecords(name):
+      fetches.append(name)
+      return realGetRecords(name)
+    driver.getRecords = getRecords
+    driver.prefetchRecords('example.com.')
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    res  = driver.put('example.com.', zone)
+    self.assertEqual(res, dict(created=0, updated=0, deleted=0))
+    self.assertEqual(fetches, ['example.com.'])
+    driver.put('example.com.', zone)
+    self.assertEqual(fetches, ['example.com.', 'example.com.'])
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
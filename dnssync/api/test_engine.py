@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import six
+import dns.name
+import dns.zone
+import dns.exception
+import dns.resolver
+from aadict import aadict
+
+from dnssync import api
+from dnssync.api import engine
+
+from .test_driver import FakeDriver, rec, ZONE
+
+#------------------------------------------------------------------------------
+def zoneRecords(domain):
+  return [
+    rec(domain, 'SOA', 'ns1.{0} hostmaster.{0} 2 7200 1800 1209600 300'.format(domain)),
+    rec(domain, 'NS', 'ns1.' + domain),
+    rec(domain, 'NS', 'ns2.' + domain),
+    rec(domain, 'MX', 'mail.' + domain, priority=10),
+    rec(domain, 'MX', 'mail2.' + domain, priority=20),
+    rec('www.' + domain, 'A', '10.0.0.2'),
+    rec('mail.' + domain, 'A', '10.0.0.3'),
+  ]
+
+#------------------------------------------------------------------------------
+class ZoneDriver(FakeDriver):
+
+  #----------------------------------------------------------------------------
+  def __init__(self, zones, *args, **kw):
+    super(ZoneDriver, self).__init__(*args, **kw)
+    self.hosted = zones
+    self.active = 0
+    self.peak   = 0
+
+  #----------------------------------------------------------------------------
+  def getRecords(self, name):
+    with self.lock:
+      self.active += 1
+      self.peak = max(self.peak, self.active)
+    try:
+      time.sleep(0.01)
+      if name not in self.hosted:
+        raise api.DomainNotFound(name)
+      return self.hosted[name][:]
+    finally:
+      with self.lock:
+        self.active -= 1
+
+#------------------------------------------------------------------------------
+class FakeResolver(object):
+  '''
+  A stand-in for :class:`dns.resolver.Resolver` that answers from a
+  zone, simulating latency and (optionally) a number of timeouts.
+  '''
+
+  #----------------------------------------------------------------------------
+  def __init__(self, zone, timeouts=0):
+    self.zone     = zone
+    self.timeouts = timeouts
+    self.timeout  = 2.0
+    self.lifetime = 30.0
+    self.lock     = threading.Lock()
+    self.queries  = []
+    self.active   = 0
+    self.peak     = 0
+
+  #----------------------------------------------------------------------------
+  def query(self, qname, rdtype, rdclass, tcp=False):
+    with self.lock:
+      self.queries.append((qname, rdtype, tcp))
+      self.active += 1
+      self.peak = max(self.peak, self.active)
+      timeout = self.timeouts > 0
+      self.timeouts -= 1
+    try:
+      time.sleep(0.01)
+      if timeout:
+        raise dns.exception.Timeout()
+      rrset = self.zone.get_rrset(qname, rdtype)
+      if rrset is None:
+        raise dns.resolver.NoAnswer()
+      return aadict(qname=rrset.name, response=aadict(answer=[rrset]))
+    finally:
+      with self.lock:
+        self.active -= 1
+
+#------------------------------------------------------------------------------
+class TestEngine(unittest.TestCase):
+
+  maxDiff = None
+
+  #----------------------------------------------------------------------------
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp(prefix='dnssync-test-')
+
+  #----------------------------------------------------------------------------
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  #----------------------------------------------------------------------------
+  def zonefile(self, domain):
+    path = os.path.join(self.tmpdir, domain + 'zone')
+    with open(path, 'w') as fp:
+      fp.write(ZONE.replace('example.com.', domain))
+    return path
+
+  #----------------------------------------------------------------------------
+  def zone(self, domain, driver):
+    return aadict(
+      domain=domain, zonefile=self.zonefile(domain), driver=driver, error=None)
+
+  #----------------------------------------------------------------------------
+  def test_zonediff(self):
+    zoneA = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    zoneB = dns.zone.from_text(
+      ZONE
+        .replace('mail2.example.com.', 'mail3.example.com.')
+        .replace('mail  3600', 'mail  600')
+        .replace('www   3600 IN A    10.0.0.2', 'ftp   3600 IN A    10.0.0.4')
+      + 'www   3600 IN AAAA ::1\n',
+      origin='example.com.', relativize=False)
+    self.assertEqual(engine.zonediff(zoneA, zoneA, 'a', 'b'), 0)
+    out = six.StringIO()
+    self.assertEqual(engine.zonediff(zoneA, zoneB, 'a', 'b', out), 15)
+    self.assertEqual(out.getvalue().split('\n'), [
+      '--- a',
+      '+++ b',
+      '@@ example.com. MX @@',
+      ' example.com. 3600 IN MX 10 mail.example.com.',
+      '-example.com. 3600 IN MX 20 mail2.example.com.',
+      '+example.com. 3600 IN MX 20 mail3.example.com.',
+      '@@ ftp.example.com. A @@',
+      '+ftp.example.com. 3600 IN A 10.0.0.4',
+      '@@ mail.example.com. A @@',
+      '-mail.example.com. 3600 IN A 10.0.0.3',
+      '+mail.example.com. 600 IN A 10.0.0.3',
+      '@@ www.example.com. A @@',
+      '-www.example.com. 3600 IN A 10.0.0.2',
+      '@@ www.example.com. AAAA @@',
+      '+www.example.com. 3600 IN AAAA ::1',
+      '',
+    ])
+
+  #----------------------------------------------------------------------------
+  def test_zoneChanges(self):
+    zoneA = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    zoneB = dns.zone.from_text(
+      ZONE.replace('www ', 'web '), origin='example.com.', relativize=False)
+    self.assertEqual(
+      [(c.name.to_text(), c.rdtype, c.old is not None, c.new is not None)
+       for c in engine.zoneChanges(zoneA, zoneB)],
+      [('web.example.com.', 1, False, True), ('www.example.com.', 1, True, False)])
+
+  #----------------------------------------------------------------------------
+  def verify(self, resolver, transfer=None, **options):
+    makeResolver, transferZone = engine.makeResolver, engine.transferZone
+    engine.makeResolver = lambda server: resolver
+    engine.transferZone = transfer
+    try:
+      return engine.runZone(
+        'verify', self.zone('example.com.', None), aadict(config=None, **options))
+    finally:
+      engine.makeResolver, engine.transferZone = makeResolver, transferZone
+
+  #----------------------------------------------------------------------------
+  def test_verify(self):
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    resolver = FakeResolver(zone)
+    res = self.verify(resolver, queries=4)
+    self.assertIsNone(res.error)
+    self.assertEqual(res.status, 0)
+    self.assertEqual(len(resolver.queries), 5)
+    self.assertEqual(resolver.peak, 4)
+    del zone.nodes[dns.name.from_text('www.example.com.')]
+    res = self.verify(FakeResolver(zone))
+    self.assertEqual(res.status, 4)
+    self.assertIn('-www.example.com. 3600 IN A 10.0.0.2', res.output.getvalue())
+
+  #----------------------------------------------------------------------------
+  def test_verify_retries(self):
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    resolver = FakeResolver(zone, timeouts=2)
+    res = self.verify(resolver, queries=1, retries=2)
+    self.assertEqual(res.status, 0)
+    self.assertEqual(
+      [tcp for qname, rdtype, tcp in resolver.queries[:3]], [False, False, True])
+    res = self.verify(FakeResolver(zone, timeouts=2), queries=1, retries=1)
+    self.assertIsInstance(res.error, dns.exception.Timeout)
+
+  #----------------------------------------------------------------------------
+  def test_verify_axfr(self):
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    transfers = []
+    def transfer(domain, server, timeout=None, lifetime=None):
+      transfers.append((domain, server, timeout, lifetime))
+      return zone
+    resolver = FakeResolver(zone)
+    res = self.verify(resolver, transfer, server='ns1.example.com', axfr=True)
+    self.assertEqual(res.status, 0)
+    self.assertEqual(transfers, [('example.com.', 'ns1.example.com', 2.0, 30.0)])
+    self.assertEqual(resolver.queries, [])
+    # the transferred zone may have records not in the zonefile
+    xzone = dns.zone.from_text(
+      ZONE + 'ftp 3600 IN A 10.0.0.4\n', origin='example.com.', relativize=False)
+    res = self.verify(
+      resolver, lambda domain, server, **kw: xzone, server='ns1.example.com', axfr=True)
+    self.assertIn('+ftp.example.com. 3600 IN A 10.0.0.4', res.output.getvalue())
+
+  #----------------------------------------------------------------------------
+  def test_verify_axfr_refused(self):
+    zone = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    for error in (dns.exception.FormError, dns.exception.Timeout):
+      def transfer(domain, server, **kw):
+        raise error()
+      resolver = FakeResolver(zone)
+      res = self.verify(resolver, transfer, server='ns1.example.com', axfr=True)
+      self.assertIsNone(res.error)
+      self.assertEqual(res.status, 0)
+      self.assertEqual(len(resolver.queries), 5)
+
+  #----------------------------------------------------------------------------
+  def test_runAll(self):
+    drv1 = ZoneDriver({
+      'a.example.': zoneRecords('a.example.'),
+      'b.example.': zoneRecords('b.example.')[:-1],
+    })
+    drv1.concurrentZones = False
+    drv2 = ZoneDriver({'c.example.': zoneRecords('c.example.')})
+    zones = [
+      self.zone('a.example.', drv1),
+      self.zone('b.example.', drv1),
+      self.zone('c.example.', drv2),
+      self.zone('d.example.', drv2),
+      aadict(domain='e.example.', zonefile=None, driver=None,
+             error=api.ConfigurationError('no driver')),
+    ]
+    options = aadict(config=None)
+    results = engine.runAll('diff', zones, options, jobs=4)
+    self.assertEqual(
+      [(res.domain, res.status and 'differs', res.error.__class__.__name__ if res.error else None)
+       for res in results],
+      [
+        ('a.example.', 0, None),
+        ('b.example.', 'differs', None),
+        ('c.example.', 0, None),
+        ('d.example.', None, 'DomainNotFound'),
+        ('e.example.', None, 'ConfigurationError'),
+      ])
+    self.assertEqual(drv1.peak, 1)
+    out = six.StringIO()
+    self.assertEqual(engine.writeReport('diff', results, out), 20)
+    self.assertEqual(
+      out.getvalue().split('\n')[-6:],
+      [
+        'a.example.: in sync',
+        'b.example.: differs',
+        'c.example.: in sync',
+        'd.example.: ERROR: DomainNotFound: d.example.',
+        'e.example.: ERROR: ConfigurationError: no driver',
+        '',
+      ])
+
+  #----------------------------------------------------------------------------
+  def test_runAll_jobs(self):
+    state = aadict(active=0, peak=0, lock=threading.Lock())
+    def runZone(command, zone, options):
+      with state.lock:
+        state.active += 1
+        state.peak = max(state.peak, state.active)
+      time.sleep(0.02)
+      with state.lock:
+        state.active -= 1
+      return aadict(domain=zone.domain)
+    drivers = [ZoneDriver({}), ZoneDriver({})]
+    zones = [self.zone('z%d.example.' % idx, drivers[idx % 2]) for idx in range(8)]
+    orig = engine.runZone
+    engine.runZone = runZone
+    try:
+      results = engine.runAll('diff', zones, aadict(config=None), jobs=4)
+    finally:
+      engine.runZone = orig
+    self.assertEqual([res.domain for res in results], [zone.domain for zone in zones])
+    self.assertLessEqual(state.peak, 4)
+
+  #----------------------------------------------------------------------------
+  def test_runAll_upload(self):
+    drv = ZoneDriver({'a.example.': zoneRecords('a.example.')[:-1]})
+    results = engine.runAll(
+      'upload', [self.zone('a.example.', drv)], aadict(config=None))
+    self.assertEqual(results[0].stats, dict(created=1, updated=0, deleted=0))
+    out = six.StringIO()
+    self.assertEqual(engine.writeReport('upload', results, out), 0)
+    self.assertEqual(
+      out.getvalue(),
+      '1 record(s) created, 0 record(s) updated, and 0 record(s) deleted.\n'
+      'a.example.: 1 created, 0 updated, 0 deleted\n')
+
+  #----------------------------------------------------------------------------
+  def test_insync_precheck(self):
+    drv = ZoneDriver({'a.example.': zoneRecords('a.example.')},
+                     params=dict(cachedir=self.tmpdir, username='u'))
+    drv.serial  = 2
+    drv.fetches = 0
+    drv.getSerial = lambda name: drv.serial
+    realGet = drv.getRecords
+    def getRecords(name):
+      drv.fetches += 1
+      return realGet(name)
+    drv.getRecords = getRecords
+    zone = self.zone('a.example.', drv)
+    def run(command):
+      return engine.runZone(command, zone, aadict(config=None))
+    self.assertEqual(run('diff').status, 0)
+    self.assertEqual(drv.fetches, 1)
+    # unchanged => no fetch
+    self.assertEqual(run('diff').status, 0)
+    self.assertEqual(run('upload').stats, dict(created=0, updated=0, deleted=0))
+    self.assertEqual(drv.fetches, 1)
+    # remote change => fetch
+    drv.serial = 3
+    self.assertEqual(run('diff').status, 0)
+    self.assertEqual(drv.fetches, 2)
+    # local change => full diff (from the still-valid snapshot), and an
+    # upload brings them back in sync
+    with open(zone.zonefile, 'a') as fp:
+      fp.write('ftp 3600 IN A 10.0.0.4\n')
+    self.assertNotEqual(run('diff').status, 0)
+    self.assertEqual(run('upload').stats, dict(created=1, updated=0, deleted=0))
+    self.assertEqual(drv.calls, [('create', 'ftp.a.example.', 'A', '10.0.0.4')])
+    self.assertEqual(run('upload').stats, dict(created=0, updated=0, deleted=0))
+    self.assertEqual(len(drv.calls), 1)
+    self.assertEqual(drv.fetches, 2)
+
+  #----------------------------------------------------------------------------
+  def test_digest_precheck(self):
+    drv = ZoneDriver({'a.example.': zoneRecords('a.example.')},
+                     params=dict(cachedir=self.tmpdir, username='u'))
+    drv.getSerial = lambda name: 2
+    drv.gets = 0
+    realGet = drv.get
+    def get(name):
+      drv.gets += 1
+      return realGet(name)
+    drv.get = get
+    zone = self.zone('a.example.', drv)
+    def run(command):
+      return engine.runZone(command, zone, aadict(config=None))
+    self.assertEqual(run('diff').status, 0)
+    self.assertEqual(drv.gets, 1)
+    # a zonefile edit that does not change the zone is detected by
+    # digest, without fetching the hosted zone
+    with open(zone.zonefile, 'a') as fp:
+      fp.write('; just a comment\n')
+    self.assertEqual(run('diff').status, 0)
+    with open(zone.zonefile, 'a') as fp:
+      fp.write('; another comment\n')
+    self.assertEqual(run('upload').stats, dict(created=0, updated=0, deleted=0))
+    self.assertEqual(drv.gets, 1)
+    self.assertEqual(drv.calls, [])
+    # a real change is only diff'ed on the changed names
+    with open(zone.zonefile, 'a') as fp:
+      fp.write('ftp 3600 IN A 10.0.0.4\n')
+    res = run('diff')
+    self.assertNotEqual(res.status, 0)
+    self.assertEqual(drv.gets, 2)
+    self.assertEqual(
+      res.output.getvalue().splitlines()[2:],
+      ['@@ ftp.a.example. A @@', '+ftp.a.example. 3600 IN A 10.0.0.4'])
+
+  #----------------------------------------------------------------------------
+  def test_digest_serial_changed(self):
+    # the hosted zone changed between determining its serial and
+    # fetching it: its digest must not be stored under the old serial
+    drv = ZoneDriver({'a.example.': zoneRecords('a.example.')},
+                     params=dict(cachedir=self.tmpdir, username='u'))
+    drv.getSerial = lambda name: 1
+    zone = self.zone('a.example.', drv)
+    engine.runZone('diff', zone, aadict(config=None))
+    self.assertIsNone(drv.cache.loadDigest('fake', 'u', 'a.example.', 1))
+    drv.getSerial = lambda name: 2
+    engine.runZone('diff', zone, aadict(config=None))
+    self.assertIsNotNone(drv.cache.loadDigest('fake', 'u', 'a.example.', 2))
+
+  #----------------------------------------------------------------------------
+  def test_upload_streaming(self):
+    drv  = ZoneDriver({'a.example.': zoneRecords('a.example.')})
+    zone = self.zone('a.example.', drv)
+    puts = []
+    realPut = drv.put
+    def put(name, lzone):
+      puts.append((lzone.__class__.__name__, name in drv._prefetched))
+      return realPut(name, lzone)
+    drv.put = put
+    # the zonefile is streamed into the planner unless it is parsed
+    # in worker processes, in which case the hosted zone is prefetched
+    engine.runZone('upload', zone, aadict(config=None))
+    engine.runZone('upload', zone, aadict(config=None, parsejobs=2))
+    self.assertEqual(puts, [('ZoneFile', False), ('Zone', True)])
+
+  #----------------------------------------------------------------------------
+  def test_diff_external(self):
+    drv  = ZoneDriver({'a.example.': zoneRecords('a.example.')})
+    zone = self.zone('a.example.', drv)
+    with open(zone.zonefile, 'a') as fp:
+      fp.write('ftp 3600 IN A 10.0.0.4\nwww 3600 IN A 10.0.0.5\n')
+    res = engine.runZone('diff', zone, aadict(config=None))
+    ext = engine.runZone('diff', zone, aadict(config=None, external=True))
+    self.assertIsNone(ext.error)
+    self.assertEqual(ext.status, res.status)
+    self.assertEqual(ext.output.getvalue(), res.output.getvalue())
+    self.assertIn('+ftp.a.example. 3600 IN A 10.0.0.4', ext.output.getvalue())
+
+  #----------------------------------------------------------------------------
+  def test_renderDiff_streaming(self):
+    out = six.StringIO()
+    def lines():
+      for idx in range(3):
+        # each line is written before the next one is generated
+        self.assertEqual(out.getvalue().count('\n'), idx)
+        yield 'line %d' % (idx,)
+    self.assertEqual(engine.renderDiff(lines(), out), 3)
+    self.assertEqual(out.getvalue(), 'line 0\nline 1\nline 2\n')
+    self.assertEqual(engine.renderDiff(iter([]), out), 0)
+    # the hosted records are released as they are consumed
+    records = [1, 2, 3]
+    drained = engine._drain(records)
+    self.assertEqual(next(drained), 1)
+    self.assertEqual(records, [3, 2])
+    self.assertEqual(list(drained), [2, 3])
+    self.assertEqual(records, [])
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+
+import dns.name
+import dns.zone
+
+from .engine import zoneChanges, renderChanges
+from .extsort import canonicalKey, sortedRdatasets, streamChanges
+from .test_zonefile import BIGZONE
+
+#------------------------------------------------------------------------------
+def parse(text):
+  return dns.zone.from_text(text, origin='example.com.', relativize=False)
+
+#------------------------------------------------------------------------------
+class TestExtsort(unittest.TestCase):
+
+  maxDiff = None
+
+  #----------------------------------------------------------------------------
+  def test_canonicalKey(self):
+    names = [dns.name.from_text(name) for name in (
+      'example.', 'a.example.', 'yljkjljk.a.example.', 'Z.a.example.',
+      'zABC.a.EXAMPLE.', 'z.example.', '\\001.z.example.', '*.z.example.',
+      '\\200.z.example.', 'example.com.', 'com.')]
+    self.assertEqual(
+      sorted(names, key=canonicalKey), sorted(names))
+
+  #----------------------------------------------------------------------------
+  def test_sortedRdatasets(self):
+    zone = parse(BIGZONE)
+    sets = list(sortedRdatasets(zone.iterate_rdatas(), runsize=50))
+    self.assertEqual(
+      [(name, rds.rdtype) for key, name, rds in sets],
+      sorted((name, rds.rdtype) for name, node in zone.nodes.items()
+             for rds in node.rdatasets))
+    for key, name, rds in sets:
+      self.assertEqual(rds, zone.nodes[name].find_rdataset(rds.rdclass, rds.rdtype))
+      self.assertEqual(rds.ttl, zone.nodes[name].find_rdataset(rds.rdclass, rds.rdtype).ttl)
+
+  #----------------------------------------------------------------------------
+  def test_streamChanges(self):
+    zoneA = parse(BIGZONE)
+    zoneB = parse(
+      BIGZONE
+      .replace('host7 IN A 10.1.0.7', 'host7 IN A 10.1.0.77')
+      .replace('host12 IN A 10.1.0.12\n  IN TXT "a;(b" "c d"', 'host12 IN A 10.1.0.12\n  IN TXT "x"')
+      .replace('host20 IN A 10.2.0.20\n', 'host20 60 IN A 10.2.0.20\n')
+      .replace('host4 IN A 10.2.0.4\n', '')
+      + 'new IN MX 10 host1\n')
+    for zoneX, zoneY in ((zoneA, zoneB), (zoneB, zoneA), (zoneA, zoneA)):
+      expect = renderChanges(zoneChanges(zoneX, zoneY), 'a', 'b')
+      for runsize in (7, 1000):
+        self.assertEqual(
+          renderChanges(streamChanges(
+            zoneX.iterate_rdatas(), zoneY.iterate_rdatas(), runsize=runsize), 'a', 'b'),
+          expect)
+    self.assertEqual(len(list(streamChanges(
+      zoneA.iterate_rdatas(), zoneB.iterate_rdatas(), runsize=7))), 5)
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
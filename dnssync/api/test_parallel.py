@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import threading
+import time
+
+from dnssync import api
+from .parallel import pmap, Controller
+
+#------------------------------------------------------------------------------
+class TestParallel(unittest.TestCase):
+
+  #----------------------------------------------------------------------------
+  def test_pmap_sequential(self):
+    self.assertEqual(pmap(lambda x: x * 2, [1, 2, 3]), [2, 4, 6])
+
+  #----------------------------------------------------------------------------
+  def test_pmap_order(self):
+    def func(item):
+      time.sleep(0.01 * (5 - item))
+      return item
+    self.assertEqual(pmap(func, range(5), jobs=5), list(range(5)))
+
+  #----------------------------------------------------------------------------
+  def test_pmap_bounded(self):
+    lock    = threading.Lock()
+    state   = dict(active=0, peak=0)
+    def func(item):
+      with lock:
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+      time.sleep(0.01)
+      with lock:
+        state['active'] -= 1
+    pmap(func, range(20), jobs=3)
+    self.assertEqual(state['peak'], 3)
+
+  #----------------------------------------------------------------------------
+  def test_pmap_error(self):
+    called = []
+    def func(item):
+      called.append(item)
+      if item == 2:
+        raise ValueError(item)
+      time.sleep(0.01)
+      return item
+    with self.assertRaises(ValueError):
+      pmap(func, range(100), jobs=2)
+    self.assertLess(len(called), 100)
+
+  #----------------------------------------------------------------------------
+  def test_controller_aimd(self):
+    ctl = Controller(8, initial=2)
+    for idx in range(50):
+      ctl.call(lambda: None)
+    self.assertEqual(ctl.limit, 8)
+    epoch = ctl.acquire()
+    ctl.congested(epoch)
+    self.assertEqual(ctl.limit, 4)
+    # a second signal from a call started before the decrease is ignored
+    ctl.congested(epoch)
+    self.assertEqual(ctl.limit, 4)
+    ctl.release(epoch)
+
+  #----------------------------------------------------------------------------
+  def test_controller_bounded(self):
+    ctl   = Controller(3)
+    lock  = threading.Lock()
+    state = dict(active=0, peak=0)
+    def func(item):
+      with lock:
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+      time.sleep(0.01)
+      with lock:
+        state['active'] -= 1
+    pmap(lambda item: ctl.call(func, item), range(20), jobs=8)
+    self.assertEqual(state['peak'], 3)
+
+  #----------------------------------------------------------------------------
+  def test_controller_ratelimited(self):
+    ctl   = Controller(4)
+    calls = []
+    def func():
+      calls.append(time.time())
+      if len(calls) < 3:
+        raise api.RateLimited('slow down', retryAfter=0.05)
+      return 'done'
+    self.assertEqual(ctl.call(func), 'done')
+    self.assertEqual(len(calls), 3)
+    self.assertGreaterEqual(calls[2] - calls[0], 0.09)
+    # halved twice, then increased by the successful call
+    self.assertEqual(ctl.limit, 2)
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import pickle
+
+import dns.exception
+import dns.zone
+
+from dnssync import api
+from dnssync.api.record import recordsToZone, normalizeContent
+
+from .test_driver import rec
+
+#------------------------------------------------------------------------------
+def textToZone(records, origin):
+  # the "reference" implementation: a text round-trip
+  return dns.zone.from_text(
+    '\n'.join(record.toText() for record in records),
+    origin=origin, relativize=False)
+
+#------------------------------------------------------------------------------
+class TestRecord(unittest.TestCase):
+
+  maxDiff = None
+
+  #----------------------------------------------------------------------------
+  def records(self):
+    return [
+      rec('example.com.', 'SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300'),
+      rec('example.com.', 'NS', 'ns1.example.com.'),
+      rec('example.com.', 'NS', 'ns2'),
+      rec('example.com.', 'MX', 'mail.example.com.', priority=10),
+      rec('example.com.', 'MX', 'mail2', priority=20, ttl=600),
+      rec('example.com.', 'TXT', 'v=spf1 a mx ~all'),
+      rec('long.example.com.', 'TXT', 'x' * 300 + '; "quoted"'),
+      rec('www.example.com.', 'A', '10.0.0.2'),
+      rec('www.example.com.', 'AAAA', '::1'),
+      rec('ftp', 'CNAME', 'www'),
+      rec('_sip._tcp.example.com.', 'SRV', 'sip.example.com.', priority=10, weight=5, port=5060),
+      rec('other.com.', 'A', '10.0.0.9'),
+    ]
+
+  #----------------------------------------------------------------------------
+  def test_toText(self):
+    self.assertEqual(
+      [r.toText() for r in self.records()[3:5]],
+      ['example.com. 3600 IN MX 10 mail.example.com.',
+       'example.com. 600 IN MX 20 mail2'])
+
+  #----------------------------------------------------------------------------
+  def test_extras(self):
+    record = api.Record(name='www.example.com.', type='A', content='10.0.0.2', rid=7)
+    self.assertFalse(hasattr(record, '__dict__'))
+    self.assertEqual(record.rid, 7)
+    self.assertIsNone(getattr(record, 'zid', None))
+    record.update(zid=3, ttl=300)
+    self.assertEqual((record.zid, record.ttl), (3, 300))
+    self.assertEqual(record.toDict(), dict(
+      id=None, name='www.example.com.', ttl=300, rclass=None, type='A',
+      priority=None, weight=None, port=None, content='10.0.0.2', rid=7, zid=3))
+    self.assertEqual(
+      repr(record),
+      "<Record content='10.0.0.2' name='www.example.com.' rid=7 ttl=300 type='A' zid=3>")
+    self.assertTrue(pickle.loads(pickle.dumps(record, 2)).sameAs(record))
+    # other attributes can also be assigned
+    record.zid = 4
+    record.zoneedit_id = 'z1'
+    self.assertEqual(record.extras, dict(rid=7, zid=4, zoneedit_id='z1'))
+    self.assertFalse(hasattr(record, '__dict__'))
+
+  #----------------------------------------------------------------------------
+  def test_equality(self):
+    recA = rec('www.example.com.', 'A', '10.0.0.2')
+    recB = rec('www.example.com.', 'A', '10.0.0.2')
+    self.assertTrue(recA.sameAs(recB))
+    self.assertFalse(recA.sameAs(rec('www.example.com.', 'A', '10.0.0.2', ttl=300)))
+    self.assertFalse(recA.sameAs(recA.toDict()))
+    # records compare and hash by identity, so they can be modified
+    # while used as keys, and list and dict membership agree
+    self.assertNotEqual(recA, recB)
+    updates = {recA: recB}
+    deletes = [recA]
+    recA.update(content='10.0.0.3')
+    self.assertIs(updates[recA], recB)
+    self.assertIn(recA, deletes)
+    self.assertNotIn(recB, updates)
+    self.assertNotIn(recB, deletes)
+    recA.update(content='10.0.0.2')
+    self.assertFalse(recA.sameAs(recB.update(rid=1)))
+
+  #----------------------------------------------------------------------------
+  def test_recordsToZone(self):
+    records = self.records()
+    zone    = recordsToZone(records, 'example.com.')
+    self.assertEqual(zone, textToZone(records, 'example.com.'))
+    self.assertEqual(zone.origin.to_text(), 'example.com.')
+    self.assertEqual(
+      zone.find_rdataset('example.com.', 'MX').ttl, 600)
+
+  #----------------------------------------------------------------------------
+  def test_recordsToZone_invalid(self):
+    records = self.records() + [rec('bad.example.com.', 'A', 'not-an-ip')]
+    with self.assertRaises(dns.exception.SyntaxError) as cm:
+      recordsToZone(records, 'example.com.')
+    self.assertIn('bad.example.com. 3600 IN A not-an-ip', str(cm.exception))
+
+  #----------------------------------------------------------------------------
+  def test_recordsToZone_nosoa(self):
+    with self.assertRaises(dns.zone.NoSOA):
+      recordsToZone(self.records()[1:], 'example.com.')
+
+  #----------------------------------------------------------------------------
+  def test_normalizeContent(self):
+    same = [
+      ('A', '10.0.0.1', '10.0.0.1'),
+      ('AAAA', '::0', '::'),
+      ('AAAA', '2001:DB8::1', '2001:db8:0::1'),
+      ('NS', 'NS1.Example.com', 'ns1.example.com.'),
+      ('MX', 'mail.example.com.', 'MAIL.example.com'),
+      ('TXT', 'v=spf1 a mx ~all', '"v=spf1 a mx ~all"'),
+      ('TXT', 'some text', '"some" " text"'),
+      ('SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300',
+              'NS1.example.com hostmaster.EXAMPLE.com 2 7200 1800 1209600 300'),
+    ]
+    for rtype, contentA, contentB in same:
+      self.assertEqual(
+        normalizeContent(rtype, contentA), normalizeContent(rtype, contentB),
+        '%s: %r != %r' % (rtype, contentA, contentB))
+    different = [
+      ('A', '10.0.0.1', '10.0.0.2'),
+      ('CNAME', 'www.example.com.', 'www.example.com.example.com.'),
+      ('TXT', 'Some text', 'some text'),
+      ('TXT', '"a"', 'a"'),
+      ('SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300',
+              'ns1.example.com. hostmaster.example.com. 3 7200 1800 1209600 300'),
+    ]
+    for rtype, contentA, contentB in different:
+      self.assertNotEqual(
+        normalizeContent(rtype, contentA), normalizeContent(rtype, contentB),
+        '%s: %r == %r' % (rtype, contentA, contentB))
+    self.assertEqual(normalizeContent('A', 'not-an-ip'), 'not-an-ip')
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
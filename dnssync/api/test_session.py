@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from aadict import aadict
+from six.moves import BaseHTTPServer
+
+from dnssync import api
+from dnssync.api import session
+from .session import seal, unseal, InvalidSession, SessionStore
+from .test_transport import Server
+
+#------------------------------------------------------------------------------
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+  # no keep-alive, so that no handler thread outlives the test
+  protocol_version = 'HTTP/1.0'
+
+  #----------------------------------------------------------------------------
+  def log_message(self, *args):
+    pass
+
+  #----------------------------------------------------------------------------
+  def reply(self, status, body=b'', headers=None):
+    self.send_response(status)
+    for key, val in ( headers or {} ).items():
+      self.send_header(key, val)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  #----------------------------------------------------------------------------
+  def do_GET(self):
+    if self.path == '/login':
+      return self.reply(200, b'login form')
+    cookie = self.headers.get('Cookie') or ''
+    if cookie.startswith('sid=') and cookie[4:] in self.server.valid:
+      return self.reply(200, b'data')
+    return self.reply(302, headers={'Location': '/login'})
+
+  #----------------------------------------------------------------------------
+  def do_POST(self):
+    self.rfile.read(int(self.headers.get('Content-Length') or 0))
+    if self.path == '/login':
+      self.server.logins += 1
+      sid = 'session' + str(self.server.logins)
+      # the server-side session's "current zone"
+      self.server.valid[sid] = None
+      return self.reply(302, headers={'Location': '/data', 'Set-Cookie': 'sid=' + sid})
+    cookie = self.headers.get('Cookie') or ''
+    sid    = cookie[4:] if cookie.startswith('sid=') else None
+    if sid not in self.server.valid:
+      return self.reply(302, headers={'Location': '/login'})
+    if self.path.startswith('/switch?zone='):
+      self.server.valid[sid] = self.path.split('=', 1)[1]
+    else:
+      self.server.posts.append(self.server.valid[sid])
+    return self.reply(200)
+
+#------------------------------------------------------------------------------
+class LoginDriver(api.Driver):
+
+  name       = 'login'
+  LOGINPATHS = ('/login',)
+
+  #----------------------------------------------------------------------------
+  def __init__(self, base, params, *args, **kw):
+    super(LoginDriver, self).__init__(None, aadict(params), *args, **kw)
+    self.base     = base
+    self._session = None
+
+  #----------------------------------------------------------------------------
+  @property
+  def session(self):
+    with self.lock:
+      if self._session is None:
+        self._session = self.makeTransport()
+        self.resumeSession(self._session, self._login)
+    return self._session
+
+  #----------------------------------------------------------------------------
+  def _login(self):
+    self._session.post(self.base + '/login', allow_redirects=False, data={})
+
+  #----------------------------------------------------------------------------
+  def _switchToZone(self, name):
+    self.session.post(self.base + '/switch?zone=' + name)
+    self.currentZone = name
+
+#------------------------------------------------------------------------------
+class TestSession(unittest.TestCase):
+
+  #----------------------------------------------------------------------------
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp(prefix='dnssync-test-')
+    self.server = Server(('127.0.0.1', 0), Handler)
+    self.server.logins = 0
+    self.server.valid  = dict()
+    self.server.posts  = []
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.daemon = True
+    self.thread.start()
+    self.base = 'http://127.0.0.1:%d' % (self.server.server_address[1],)
+
+  #----------------------------------------------------------------------------
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    shutil.rmtree(self.tmpdir)
+
+  #----------------------------------------------------------------------------
+  @unittest.skipIf(session.Fernet is None, 'requires the "cryptography" package')
+  def test_seal(self):
+    sealed = seal('secret', b'some data')
+    self.assertNotIn(b'some data', sealed)
+    self.assertEqual(unseal('secret', sealed), b'some data')
+    self.assertNotEqual(seal('secret', b'some data'), sealed)
+    with self.assertRaises(InvalidSession):
+      unseal('other', sealed)
+    tampered = bytearray(sealed)
+    tampered[-40] ^= 1
+    tampered = bytes(tampered)
+    with self.assertRaises(InvalidSession):
+      unseal('secret', tampered)
+
+  #----------------------------------------------------------------------------
+  def test_store(self):
+    from requests.cookies import RequestsCookieJar
+    store = SessionStore(os.path.join(self.tmpdir, 'sessions'), 'secret')
+    jar   = RequestsCookieJar()
+    self.assertFalse(store.load('drv', 'acct', jar))
+    jar.set('sid', 'abc', domain='example.com', path='/')
+    store.save('drv', 'acct', jar)
+    path = store._path('drv', 'acct')
+    self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+    jar2 = RequestsCookieJar()
+    self.assertTrue(store.load('drv', 'acct', jar2))
+    self.assertEqual(jar2.get('sid', domain='example.com'), 'abc')
+    if store.encrypted:
+      other = SessionStore(os.path.join(self.tmpdir, 'sessions'), 'wrong')
+      self.assertFalse(other.load('drv', 'acct', RequestsCookieJar()))
+      self.assertFalse(os.path.exists(path))
+
+  #----------------------------------------------------------------------------
+  def test_store_unencrypted(self):
+    from requests.cookies import RequestsCookieJar
+    directory = os.path.join(self.tmpdir, 'sessions')
+    jar = RequestsCookieJar()
+    jar.set('sid', 'abc', domain='example.com', path='/')
+    if session.Fernet is not None:
+      SessionStore(directory, 'secret').save('drv', 'acct', jar)
+    orig = session.Fernet
+    session.Fernet = None
+    try:
+      store = SessionStore(directory, 'secret')
+      self.assertFalse(store.encrypted)
+      # encrypted sessions cannot be read (and are discarded)
+      self.assertFalse(store.load('drv', 'acct', RequestsCookieJar()))
+      store.save('drv', 'acct', jar)
+      path = store._path('drv', 'acct')
+      self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+      with open(path, 'rb') as fp:
+        self.assertTrue(fp.read().startswith(session.PLAINMAGIC))
+      jar2 = RequestsCookieJar()
+      self.assertTrue(store.load('drv', 'acct', jar2))
+      self.assertEqual(jar2.get('sid', domain='example.com'), 'abc')
+    finally:
+      session.Fernet = orig
+    if session.Fernet is not None:
+      # ... and vice versa
+      self.assertFalse(SessionStore(directory, 'secret').load(
+        'drv', 'acct', RequestsCookieJar()))
+
+  #----------------------------------------------------------------------------
+  def test_resume(self):
+    params = dict(cachedir=self.tmpdir, sessionkey='secret', username='me')
+    driver = LoginDriver(self.base, params)
+    self.assertEqual(driver.session.get(self.base + '/data').text, 'data')
+    self.assertEqual(self.server.logins, 1)
+    # a new run re-uses the stored session...
+    driver = LoginDriver(self.base, params)
+    self.assertEqual(driver.session.get(self.base + '/data').text, 'data')
+    self.assertEqual(self.server.logins, 1)
+    # ... and transparently logs in again once it has expired
+    self.server.valid.clear()
+    driver = LoginDriver(self.base, params)
+    self.assertEqual(driver.session.get(self.base + '/data').text, 'data')
+    self.assertEqual(self.server.logins, 2)
+    driver = LoginDriver(self.base, params)
+    self.assertEqual(driver.session.get(self.base + '/data').text, 'data')
+    self.assertEqual(self.server.logins, 2)
+
+  #----------------------------------------------------------------------------
+  def test_renew_current_zone(self):
+    params = dict(cachedir=self.tmpdir, sessionkey='secret', username='me')
+    driver = LoginDriver(self.base, params)
+    driver._switchToZone('example.com')
+    driver.session.post(self.base + '/records')
+    # the session expires between the zone switch and a record post:
+    # the new session must be switched back before the post is re-sent
+    self.server.valid.clear()
+    driver.session.post(self.base + '/records')
+    self.assertEqual(self.server.logins, 2)
+    self.assertEqual(self.server.posts, ['example.com', 'example.com'])
+    self.assertEqual(driver.currentZone, 'example.com')
+
+  #----------------------------------------------------------------------------
+  def test_disabled(self):
+    params = dict(cachedir=self.tmpdir, username='me')
+    for idx in range(2):
+      driver = LoginDriver(self.base, params)
+      self.assertEqual(driver.session.get(self.base + '/data').text, 'data')
+    self.assertEqual(self.server.logins, 2)
+    self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'sessions')))
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+
+import dns.zone
+
+from dnssync import api
+from .store import RecordStore
+from .test_driver import FakeDriver, rec, ZONE
+
+#------------------------------------------------------------------------------
+class TestStore(unittest.TestCase):
+
+  maxDiff = None
+
+  #----------------------------------------------------------------------------
+  def records(self):
+    return [
+      rec('example.com.', 'SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300'),
+      rec('example.com.', 'MX', 'mail.example.com.', priority=10, id=17),
+      rec('www.example.com.', 'A', '10.0.0.2', zoneedit_id='z1'),
+      rec('www.example.com.', 'AAAA', '2001:db8::1'),
+      rec('park.example.com.', 'A', 'PARK'),
+      rec('www.example.com.', 'TXT', u'café', ttl=None),
+      rec('_sip._tcp.example.com.', 'SRV', 'sip.example.com.', priority=10, weight=5, port=5060),
+      api.Record(name='empty.example.com.'),
+    ]
+
+  #----------------------------------------------------------------------------
+  def test_roundtrip(self):
+    records = self.records()
+    store   = RecordStore(records)
+    self.assertEqual(len(store), len(records))
+    self.assertEqual(
+      [record.toDict() for record in store], [record.toDict() for record in records])
+    self.assertTrue(store[-1].sameAs(records[-1]))
+    self.assertEqual(
+      [record.toDict() for record in store[1:3]], [record.toDict() for record in records[1:3]])
+    self.assertEqual(store[2].zoneedit_id, 'z1')
+    self.assertIsInstance(store.content(5), type(u''))
+    self.assertIsInstance(store.content(2), str)
+    with self.assertRaises(IndexError):
+      store[len(records)]
+    self.assertEqual(
+      list(RecordStore(records[:5]).texts()), [r.toText() for r in records[:5]])
+    # owner names are interned
+    self.assertEqual(len(store._names), 5)
+    # addresses are stored exactly as given (only canonical ones packed)
+    addrs = [
+      rec('www.example.com.', 'AAAA', '::0'),
+      rec('www.example.com.', 'AAAA', '2001:DB8::1'),
+      rec('www.example.com.', 'A', u'10.0.0.7'),
+      rec('www.example.com.', 'A', '10.0.0.7'),
+    ]
+    store = RecordStore(addrs)
+    self.assertEqual(
+      [(store.content(idx), type(store.content(idx))) for idx in range(len(store))],
+      [('::0', str), ('2001:DB8::1', str), (u'10.0.0.7', type(u'')), ('10.0.0.7', str)])
+    self.assertEqual(list(store._flags), [0, 0, 3, 1])
+
+  #----------------------------------------------------------------------------
+  def test_keys(self):
+    driver = FakeDriver()
+    records = self.records()
+    self.assertEqual(
+      list(RecordStore(records).keys()), [driver._recordKey(r) for r in records])
+
+  #----------------------------------------------------------------------------
+  def test_index_columns(self):
+    # the match index is built from the store's columns, without
+    # materializing any records (unless a driver overrides the keys)
+    class Store(RecordStore):
+      def __iter__(self):
+        raise AssertionError('records materialized')
+    records = self.records()[:-1]
+    index   = FakeDriver()._indexRecords(Store(records))
+    self.assertEqual(index, FakeDriver()._indexRecords(records))
+    class KeyDriver(FakeDriver):
+      def _rrsetKey(self, record):
+        return (record.type, record.name)
+    with self.assertRaises(AssertionError):
+      KeyDriver()._indexRecords(Store(records))
+
+  #----------------------------------------------------------------------------
+  def test_put(self):
+    base  = [
+      rec('example.com.', 'SOA', 'ns1.example.com. hostmaster.example.com. 2 7200 1800 1209600 300'),
+      rec('example.com.', 'NS', 'ns1.example.com.'),
+      rec('example.com.', 'NS', 'ns2.example.com.'),
+      rec('example.com.', 'MX', 'mail.example.com.', priority=10),
+      rec('example.com.', 'MX', 'mail2.example.com.', priority=20),
+      rec('www.example.com.', 'A', '10.0.0.2'),
+      rec('mail.example.com.', 'A', '10.0.0.3'),
+      rec('old.example.com.', 'A', '10.0.0.9'),
+    ]
+    text  = ZONE.replace('10.0.0.2', '10.0.0.4').replace('mail2', 'mail3') \
+      + 'ftp 3600 IN A 10.0.0.5\n'
+    zone  = dns.zone.from_text(text, origin='example.com.', relativize=False)
+    calls = []
+    for columnar in ('false', 'true'):
+      driver = FakeDriver(base, params=dict(columnar=columnar))
+      self.assertEqual(isinstance(driver.loadRecords('example.com.'), RecordStore),
+                       columnar == 'true')
+      res = driver.put('example.com.', zone)
+      calls.append((res, sorted(driver.calls)))
+    self.assertEqual(calls[0], calls[1])
+    self.assertEqual(calls[1][0], dict(created=1, updated=2, deleted=1))
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import threading
+import time
+
+from six.moves import BaseHTTPServer, socketserver
+
+from dnssync import api
+from .transport import Transport
+from .parallel import Controller
+
+#------------------------------------------------------------------------------
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+  protocol_version = 'HTTP/1.1'
+
+  #----------------------------------------------------------------------------
+  def log_message(self, *args):
+    pass
+
+  #----------------------------------------------------------------------------
+  def respond(self):
+    server = self.server
+    server.hits.append((self.command, self.path))
+    if self.command == 'POST':
+      self.rfile.read(int(self.headers.get('Content-Length') or 0))
+    if self.path == '/slow':
+      time.sleep(0.5)
+    status = 200
+    if self.path == '/flaky' and server.failures > 0:
+      server.failures -= 1
+      status = 503
+    if self.path == '/limited':
+      status = 429
+    body = b'ok'
+    self.send_response(status)
+    if status == 429:
+      self.send_header('Retry-After', '7')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  do_GET  = respond
+  do_POST = respond
+
+#------------------------------------------------------------------------------
+class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+  daemon_threads = True
+
+  #----------------------------------------------------------------------------
+  def handle_error(self, request, client_address):
+    # the client gave up on a slow response
+    pass
+
+#------------------------------------------------------------------------------
+class TestTransport(unittest.TestCase):
+
+  #----------------------------------------------------------------------------
+  def setUp(self):
+    self.server = Server(('127.0.0.1', 0), Handler)
+    self.server.hits     = []
+    self.server.failures = 0
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.daemon = True
+    self.thread.start()
+    self.base = 'http://127.0.0.1:%d' % (self.server.server_address[1],)
+
+  #----------------------------------------------------------------------------
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+
+  #----------------------------------------------------------------------------
+  def test_get(self):
+    transport = Transport()
+    for idx in range(3):
+      self.assertEqual(transport.get(self.base + '/').text, 'ok')
+    stats = transport.stats[self.base[7:]]
+    self.assertEqual(stats.requests, 3)
+    self.assertEqual(stats.retries, 0)
+    self.assertGreater(stats.latency, 0)
+
+  #----------------------------------------------------------------------------
+  def test_retry_get(self):
+    self.server.failures = 2
+    transport = Transport(backoff=0.01)
+    resp = transport.get(self.base + '/flaky')
+    self.assertEqual(resp.status_code, 200)
+    self.assertEqual(len(self.server.hits), 3)
+    self.assertEqual(transport.stats[self.base[7:]].retries, 2)
+
+  #----------------------------------------------------------------------------
+  def test_retry_congested(self):
+    # the retries of one controlled call only decrease the limit once
+    self.server.failures = 3
+    controller = Controller(8)
+    transport  = Transport(retries=3, backoff=0.01, controller=controller)
+    resp = controller.call(transport.get, self.base + '/flaky')
+    self.assertEqual(resp.status_code, 200)
+    self.assertEqual(len(self.server.hits), 4)
+    self.assertEqual(int(controller.limit), 4)
+
+  #----------------------------------------------------------------------------
+  def test_noretry_post(self):
+    self.server.failures = 1
+    transport = Transport(backoff=0.01)
+    resp = transport.post(self.base + '/flaky', data=dict(a='b'))
+    self.assertEqual(resp.status_code, 503)
+    self.assertEqual(self.server.hits, [('POST', '/flaky')])
+
+  #----------------------------------------------------------------------------
+  def test_timeout(self):
+    transport = Transport(timeout=0.1, retries=1, backoff=0.01)
+    with self.assertRaises(api.TransportError):
+      transport.get(self.base + '/slow')
+    self.assertEqual(len(self.server.hits), 2)
+    self.assertEqual(transport.stats[self.base[7:]].errors, 1)
+
+  #----------------------------------------------------------------------------
+  def test_deadline(self):
+    transport = Transport(deadline=0.1)
+    time.sleep(0.15)
+    with self.assertRaises(api.TransportError):
+      transport.get(self.base + '/')
+    self.assertEqual(self.server.hits, [])
+
+  #----------------------------------------------------------------------------
+  def test_ratelimited(self):
+    controller = Controller(4)
+    transport  = Transport(controller=controller)
+    with self.assertRaises(api.RateLimited) as cm:
+      transport.post(self.base + '/limited', data=dict(a='b'))
+    self.assertEqual(cm.exception.retryAfter, 7)
+    self.assertEqual(controller.limit, 2)
+    self.assertGreater(controller.holdtill, time.time() + 6)
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+
+from dnssync.api import util
+from dnssync.api.util import absdom, reldom, LRUCache
+
+#------------------------------------------------------------------------------
+class TestUtil(unittest.TestCase):
+
+  NAMES = [
+    'example.com', 'Example.COM.', 'www.example.com.', '*.example.com',
+    '*.Example.com.', '10.0.0.1', '10.0.0.1.', 'foo', '_sip._tcp.example.com',
+    '-bad-.example.com', '', '.', u'www.example.com', 'ns1.example.com ns2',
+  ]
+
+  #----------------------------------------------------------------------------
+  def test_absdom(self):
+    for name in self.NAMES:
+      self.assertEqual(absdom(name), util._absdom(name), name)
+      self.assertEqual(absdom(name), util._absdom(name), name)
+    self.assertEqual(absdom('Example.COM'), 'example.com.')
+    self.assertIs(absdom('Example.COM'), absdom('example.Com'))
+
+  #----------------------------------------------------------------------------
+  def test_reldom(self):
+    for name in self.NAMES:
+      self.assertEqual(reldom(name), util._reldom(name), name)
+      self.assertEqual(reldom(name, 'example.com'), util._reldom(name, 'example.com'), name)
+    self.assertEqual(reldom('WWW.example.com.', to='example.com'), 'www')
+    self.assertEqual(reldom('WWW.example.com.'), 'www.example.com')
+
+  #----------------------------------------------------------------------------
+  def test_LRUCache(self):
+    cache = LRUCache(4)
+    for key in 'abc':
+      cache[key] = key.upper()
+    self.assertEqual(len(cache), 3)
+    # "a" is used, and so survives the eviction of "b"
+    self.assertEqual(cache.get('a'), 'A')
+    for key in 'de':
+      cache[key] = key.upper()
+    self.assertLessEqual(len(cache), 4)
+    self.assertEqual(cache.get('a'), 'A')
+    self.assertIsNone(cache.get('b'))
+    self.assertEqual(cache.get('e'), 'E')
+    cache.clear()
+    self.assertIsNone(cache.get('a'))
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import os
+import shutil
+import tempfile
+
+import dns.exception
+import dns.zone
+
+from .record import Record
+from .zonefile import readHeader, splitZonefile, ZoneReader, ZoneFile
+from .test_driver import FakeDriver, ZONE
+
+#------------------------------------------------------------------------------
+BIGZONE = '''\
+$ORIGIN example.com.
+$TTL 300
+@     3600 IN SOA  ns1.example.com. hostmaster.example.com. (
+                   2 7200 1800 1209600 300 )
+@     3600 IN NS   ns1.example.com.
+@     3600 IN NS   ns2.example.com.
+''' + ''.join(
+  'host{0} IN A 10.1.{1}.{2}\n  IN TXT "a;(b" "c d" ; ( c\n'
+  '  IN SRV 10 5 5060 sip.example.com.\n'.format(idx, *divmod(idx, 256))
+  for idx in range(300)) + '''\
+$ORIGIN sub.example.com.
+$TTL 600
+''' + ''.join(
+  'host{0} IN A 10.2.{1}.{2}\n'.format(idx, *divmod(idx, 256))
+  for idx in range(300))
+
+#------------------------------------------------------------------------------
+class TestZonefile(unittest.TestCase):
+
+  maxDiff = None
+
+  #----------------------------------------------------------------------------
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp(prefix='dnssync-test-')
+
+  #----------------------------------------------------------------------------
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  #----------------------------------------------------------------------------
+  def zonefile(self, text=ZONE):
+    path = os.path.join(self.tmpdir, 'example.com.zone')
+    with open(path, 'w') as fp:
+      fp.write(text)
+    return path
+
+  #----------------------------------------------------------------------------
+  def rdatas(self, zone):
+    return sorted(
+      (name.to_text(), ttl, rdata.to_text()) for name, ttl, rdata in zone.iterate_rdatas())
+
+  #----------------------------------------------------------------------------
+  def test_readHeader(self):
+    path = self.zonefile(
+      ';; -*- coding: utf-8; dnssync-config: example.ini -*-\n' + ZONE)
+    self.assertEqual(
+      readHeader(path), dict(config='example.ini', origin='example.com.'))
+    self.assertEqual(
+      readHeader(self.zonefile('')), dict(config=None, origin=None))
+    # only the leading comments and directives are scanned
+    path = self.zonefile(
+      ';; a comment\n\n$TTL 300\n$origin example.com. ; the origin\n' + ZONE
+      + '; -*- dnssync-config: other.ini -*-\n$ORIGIN example.net.\n')
+    self.assertEqual(
+      readHeader(path), dict(config=None, origin='example.com.'))
+    self.assertEqual(
+      readHeader(self.zonefile('www IN A 10.0.0.1\n' + ZONE)),
+      dict(config=None, origin=None))
+
+  #----------------------------------------------------------------------------
+  def test_iterate_rdatas(self):
+    text = ZONE + '$TTL 600\nftp IN A 10.0.0.4\n  IN A 10.0.0.5\n@ 3600 IN TXT "x"\n'
+    zone = dns.zone.from_text(text, origin='example.com.', relativize=False)
+    self.assertEqual(
+      self.rdatas(ZoneFile(self.zonefile(text), 'example.com.')), self.rdatas(zone))
+
+  #----------------------------------------------------------------------------
+  def test_nonconsecutive(self):
+    # records of an RRset separated by other owner names are merged
+    # (de-duplicated and given the lowest TTL) as by a Zone, whether
+    # streamed or loaded, and parsed serially or in parallel
+    text = ZONE + 'ftp 600 IN A 10.0.0.4\nftp2 IN A 10.0.0.5\n' \
+      'ftp 300 IN A 10.0.0.4\nftp 600 IN A 10.0.0.6\n'
+    path = self.zonefile(text)
+    zone = dns.zone.from_text(text, origin='example.com.', relativize=False)
+    for jobs in (1, 2):
+      zfile = ZoneFile(path, 'example.com.', jobs=jobs, chunksize=64)
+      self.assertEqual(
+        [(ttl, rdata.to_text()) for name, ttl, rdata in zfile.iterate_rdatas()
+         if name.to_text() == 'ftp.example.com.'],
+        [(300, '10.0.0.4'), (300, '10.0.0.6')])
+      self.assertEqual(self.rdatas(zfile), self.rdatas(zone))
+      self.assertEqual(self.rdatas(zfile.load()), self.rdatas(zone))
+      # i.e. putting the zonefile onto the same zone makes no changes
+      driver = FakeDriver([Record.from_rdata(rdata) for rdata in zone.iterate_rdatas()])
+      self.assertEqual(
+        driver.put('example.com.', zfile), dict(created=0, updated=0, deleted=0))
+      self.assertEqual([call for call in driver.calls if call[0] != 'zones'], [])
+
+  #----------------------------------------------------------------------------
+  def test_generate(self):
+    text = ZONE + (
+      '$TTL 3600\n'
+      '$GENERATE 1-3 host$ A 10.0.0.$\n'
+      '$GENERATE 0-4/2 rev${10,3} 600 IN PTR h${0,2,x}\\$.example.com. ; comment\n'
+      '$GENERATE 14-15 x${-4,1,X} CNAME host${-12}\n')
+    zfile = ZoneFile(self.zonefile(text), 'example.com.')
+    self.assertEqual(
+      [item for item in self.rdatas(zfile) if item[0][:3] in ('hos', 'rev', 'xA.', 'xB.')],
+      [
+        ('host1.example.com.', 3600, '10.0.0.1'),
+        ('host2.example.com.', 3600, '10.0.0.2'),
+        ('host3.example.com.', 3600, '10.0.0.3'),
+        ('rev010.example.com.', 600, 'h00\\$.example.com.'),
+        ('rev012.example.com.', 600, 'h02\\$.example.com.'),
+        ('rev014.example.com.', 600, 'h04\\$.example.com.'),
+        ('xA.example.com.', 3600, 'host2.example.com.'),
+        ('xB.example.com.', 3600, 'host3.example.com.'),
+      ])
+    self.assertEqual(self.rdatas(zfile.load()), self.rdatas(zfile))
+    for line in ('$GENERATE 3-1 host$ A 10.0.0.$',
+                 '$GENERATE 1-3 host${0,2,n} A 10.0.0.$',
+                 '$GENERATE 1-3 host$ A',
+                 '$GENERATE 1-3 host$ BOGUS 10.0.0.$'):
+      zfile = ZoneFile(self.zonefile(ZONE + line + '\n'), 'example.com.')
+      with self.assertRaises(dns.exception.SyntaxError) as cm:
+        list(zfile.iterate_rdatas())
+      self.assertIn('example.com.zone:%d:' % (ZONE.count('\n') + 1,), str(cm.exception))
+
+  #----------------------------------------------------------------------------
+  def test_bounded(self):
+    path = self.zonefile(ZONE + ''.join(
+      'host{0} 300 IN A 10.1.0.{1}\n'.format(idx, idx % 256) for idx in range(500)))
+    with open(path) as fp:
+      reader = ZoneReader(fp, 'example.com.')
+      count  = 0
+      peak   = 0
+      for item in reader.rdatas():
+        count += 1
+        peak = max(peak, len(reader.zone.nodes))
+    self.assertEqual(count, 507)
+    self.assertEqual(peak, 1)
+
+  #----------------------------------------------------------------------------
+  def test_errors(self):
+    zfile = ZoneFile(self.zonefile(ZONE.replace('SOA', 'XX')), 'example.com.')
+    with self.assertRaises(dns.exception.SyntaxError) as cm:
+      list(zfile.iterate_rdatas())
+    self.assertIn('example.com.zone:2:', str(cm.exception))
+    zfile = ZoneFile(
+      self.zonefile('\n'.join(ZONE.split('\n')[:1] + ZONE.split('\n')[2:])),
+      'example.com.')
+    with self.assertRaises(dns.zone.NoSOA):
+      list(zfile.iterate_rdatas())
+
+  #----------------------------------------------------------------------------
+  def test_splitZonefile(self):
+    path   = self.zonefile(BIGZONE)
+    chunks = splitZonefile(path, 8, chunksize=1000)
+    self.assertEqual(len(chunks), 8)
+    self.assertEqual(chunks[0].start, 0)
+    self.assertEqual(chunks[-1].end, len(BIGZONE))
+    lines = BIGZONE.split('\n')
+    for prev, chunk in zip(chunks, chunks[1:]):
+      self.assertEqual(prev.end, chunk.start)
+      self.assertEqual(BIGZONE[:chunk.start].count('\n') + 1, chunk.line)
+      self.assertRegexpMatches(lines[chunk.line - 1], r'^host\d+ IN A ')
+    self.assertEqual(chunks[1].prefix, '$ORIGIN example.com.\n$TTL 300\n')
+    self.assertEqual(chunks[-1].prefix, '$ORIGIN sub.example.com.\n$TTL 600\n')
+    self.assertEqual(len(splitZonefile(path, 8)), 1)
+    path = self.zonefile(BIGZONE + '$INCLUDE other.zone\n')
+    self.assertEqual(len(splitZonefile(path, 8, chunksize=1000)), 1)
+
+  #----------------------------------------------------------------------------
+  def test_splitZonefile_relative_origin(self):
+    text = BIGZONE.replace('$ORIGIN sub.example.com.', '$ORIGIN sub') + (
+      '$ORIGIN deep\n' + ''.join(
+        'host{0} IN A 10.3.{1}.{2}\n'.format(idx, *divmod(idx, 256))
+        for idx in range(300)))
+    path   = self.zonefile(text)
+    chunks = splitZonefile(path, 8, chunksize=1000, origin='example.com.')
+    self.assertEqual(
+      sorted(set(chunk.prefix for chunk in chunks)),
+      ['', '$ORIGIN deep.sub.example.com.\n$TTL 600\n',
+       '$ORIGIN example.com.\n$TTL 300\n', '$ORIGIN sub.example.com.\n$TTL 600\n'])
+    self.assertEqual(len(splitZonefile(
+      self.zonefile('$ORIGIN sub\n' + text), 8, chunksize=1000)), 1)
+    zone  = ZoneFile(self.zonefile(text), 'example.com.').load()
+    self.assertIn('host7.deep.sub.example.com.', [name.to_text() for name in zone.nodes])
+    zfile = ZoneFile(self.zonefile(text), 'example.com.', jobs=3, chunksize=1000)
+    self.assertEqual(self.rdatas(zfile.load()), self.rdatas(zone))
+
+  #----------------------------------------------------------------------------
+  def test_records_parallel(self):
+    path = self.zonefile(BIGZONE)
+    zone = dns.zone.from_text(BIGZONE, origin='example.com.', relativize=False)
+    zfile = ZoneFile(path, 'example.com.', jobs=3, chunksize=1000)
+    self.assertEqual(
+      sorted(rec.toText() for rec in zfile.records()),
+      sorted(rec.toText() for rec in ZoneFile(path, 'example.com.').records()))
+    self.assertEqual(self.rdatas(zfile.load()), self.rdatas(zone))
+    self.assertIn(
+      ('host7.example.com.', 300, '10 5 5060 sip.example.com.'), self.rdatas(zfile.load()))
+    self.assertIn(
+      ('host7.example.com.', 300, '"a;(b" "c d"'), self.rdatas(zfile.load()))
+
+  #----------------------------------------------------------------------------
+  def test_records_parallel_errors(self):
+    zfile = ZoneFile(
+      self.zonefile(BIGZONE.replace('host250 IN A', 'host250 IN XX')),
+      'example.com.', jobs=3, chunksize=1000)
+    with self.assertRaises(dns.exception.SyntaxError) as cm:
+      list(zfile.records())
+    self.assertIn(
+      'example.com.zone:%d:' % (BIGZONE.split('\n').index('host250 IN A 10.1.0.250') + 1,),
+      str(cm.exception))
+    zfile = ZoneFile(
+      self.zonefile('\n'.join(BIGZONE.split('\n')[:2] + BIGZONE.split('\n')[4:])),
+      'example.com.', jobs=3, chunksize=1000)
+    with self.assertRaises(dns.zone.NoSOA):
+      list(zfile.records())
+
+  #----------------------------------------------------------------------------
+  def test_put(self):
+    driver = FakeDriver()
+    res = driver.put('example.com.', ZoneFile(
+      self.zonefile(ZONE.replace('10.0.0.2', '10.0.0.4')), 'example.com.'))
+    self.assertEqual(res, dict(created=7, updated=0, deleted=0))
+    self.assertIn(('create', 'www.example.com.', 'A', '10.0.0.4'), driver.calls)
+    # the zone is fully read (and checked) before any change is made
+    driver = FakeDriver()
+    with self.assertRaises(dns.zone.NoNS):
+      driver.put('example.com.', ZoneFile(
+        self.zonefile(ZONE.replace(' NS ', ' TXT ')), 'example.com.'))
+    self.assertEqual(driver.calls, [])
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
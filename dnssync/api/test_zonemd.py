@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+
+import dns.name
+import dns.zone
+
+from .zonemd import zoneDigests, changedNames
+
+#------------------------------------------------------------------------------
+# the "simple ZONEMD example" zone from RFC 8976, appendix A.1
+RFCZONE = '''\
+example.      86400  IN  SOA     ns1 admin 2018031900 1800 900 604800 86400
+              86400  IN  NS      ns1
+              86400  IN  NS      ns2
+ns1           3600   IN  A       203.0.113.63
+ns2           3600   IN  AAAA    2001:db8::63
+'''
+RFCDIGEST = (
+  'c68090d90a7aed716bc459f9340e3d7c1370d4d24b7e2fc3'
+  'a1ddc0b9a87153b9a9713b3c9ae5cc27777f98b8e730044c')
+
+#------------------------------------------------------------------------------
+def parse(text):
+  return dns.zone.from_text(text, origin='example.', relativize=False)
+
+#------------------------------------------------------------------------------
+class TestZonemd(unittest.TestCase):
+
+  maxDiff = None
+
+  #----------------------------------------------------------------------------
+  def test_digest(self):
+    self.assertEqual(zoneDigests(parse(RFCZONE)).digest, RFCDIGEST)
+    # the apex ZONEMD RRset, record order and name case are not digested
+    zone = parse(
+      'NS2 3600 IN AAAA 2001:db8::63\n'
+      + RFCZONE.replace('NS      ns2', 'NS      NS2')
+      + 'example. 86400 IN TYPE63 \\# 6 78ba6bdc0101\n')
+    self.assertEqual(zoneDigests(zone).digest, RFCDIGEST)
+    self.assertNotEqual(
+      zoneDigests(parse(RFCZONE.replace('3600   IN  A', '3601   IN  A'))).digest,
+      RFCDIGEST)
+
+  #----------------------------------------------------------------------------
+  def test_changedNames(self):
+    base = zoneDigests(parse(RFCZONE))
+    self.assertEqual(len(base.rrsets), 4)
+    self.assertEqual(changedNames(base, base), set())
+    other = zoneDigests(parse(
+      RFCZONE.replace('203.0.113.63', '203.0.113.64') + 'www 60 IN A 10.0.0.1\n'))
+    self.assertEqual(
+      sorted(name.to_text() for name in changedNames(base, other)),
+      ['ns1.example.', 'www.example.'])
+    self.assertEqual(changedNames(base, other), changedNames(other, base))
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import time
+import random
+import email.utils
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from six.moves.urllib import parse as urlparse
+from aadict import aadict
+
+from .error import TransportError, RateLimited
+from .i18n import _
+
+#------------------------------------------------------------------------------
+
+log = logging.getLogger(__name__)
+
+#------------------------------------------------------------------------------
+
+DEFAULT_TIMEOUT   = 30      # seconds, per request attempt
+DEFAULT_RETRIES   = 3
+DEFAULT_BACKOFF   = 0.5     # seconds, doubled on each retry
+DEFAULT_POOLSIZE  = 10
+IDEMPOTENT        = frozenset(('GET', 'HEAD', 'OPTIONS'))
+RETRY_STATUSES    = frozenset((429, 500, 502, 503, 504))
+
+#------------------------------------------------------------------------------
+def retryAfter(resp):
+  '''
+  Returns the number of seconds requested by the "Retry-After" header
+  of the :class:`requests.Response` `resp`, or ``None`` if it has none
+  (or it cannot be parsed).
+  '''
+  value = resp.headers.get('retry-after')
+  if not value:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  date = email.utils.parsedate_tz(value)
+  if date is None:
+    return None
+  return max(0.0, email.utils.mktime_tz(date) - time.time())
+
+#------------------------------------------------------------------------------
+class Transport(object):
+  '''
+  A shared HTTP client for the drivers that talk to a provider's web
+  interface. It is used like a :class:`requests.Session` (e.g.
+  ``transport.get(url)``), but additionally:
+
+  * keeps a pool of up to `poolsize` keep-alive connections per host
+    and negotiates compressed responses;
+
+  * applies a `timeout` (in seconds) to each request attempt, and
+    fails all requests once `deadline` seconds (if set) have passed
+    since the transport was created;
+
+  * retries idempotent requests (i.e. GETs) that fail with a connection
+    error, a timeout or a 5xx response up to `retries` times, sleeping
+    a jittered, exponentially increasing multiple of `backoff` seconds
+    in between; and
+
+  * keeps per-host request, retry, error and latency counters in
+    :attr:`stats`.
+
+  Requests that still fail raise a :class:`dnssync.api.TransportError`,
+  or a :class:`dnssync.api.RateLimited` for HTTP 429 responses. If a
+  :class:`dnssync.api.parallel.Controller` is given, it is told about
+  429 and 5xx responses (and their "Retry-After" hints), and requests
+  wait for any pause it has been asked for.
+
+  If :attr:`expired` and :attr:`renew` are set, each response is
+  checked with ``expired(response)``, and if the session has expired
+  (e.g. the provider redirected to its login page), ``renew()`` is
+  called (with :attr:`renewing` set) and the request is sent again.
+  '''
+
+  #----------------------------------------------------------------------------
+  def __init__(self,
+               timeout  = DEFAULT_TIMEOUT,
+               deadline = None,
+               retries  = DEFAULT_RETRIES,
+               backoff  = DEFAULT_BACKOFF,
+               poolsize = DEFAULT_POOLSIZE,
+               controller = None,
+               *args, **kw):
+    super(Transport, self).__init__(*args, **kw)
+    self.timeout  = timeout
+    self.deadline = time.time() + deadline if deadline else None
+    self.retries  = retries
+    self.backoff  = backoff
+    self.controller = controller
+    self.expired  = None
+    self.renew    = None
+    self._local   = threading.local()
+    self.stats    = dict()
+    self.lock     = threading.Lock()
+    self.session  = requests.Session()
+    self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+    adapter = HTTPAdapter(pool_connections=poolsize, pool_maxsize=poolsize)
+    self.session.mount('http://', adapter)
+    self.session.mount('https://', adapter)
+
+  #----------------------------------------------------------------------------
+  @property
+  def headers(self):
+    return self.session.headers
+
+  #----------------------------------------------------------------------------
+  @property
+  def cookies(self):
+    return self.session.cookies
+
+  #----------------------------------------------------------------------------
+  @property
+  def renewing(self):
+    '''
+    Whether or not the current thread is renewing the session.
+    '''
+    return getattr(self._local, 'renewing', False)
+
+  #----------------------------------------------------------------------------
+  def get(self, url, **kw):
+    kw.setdefault('allow_redirects', True)
+    return self.request('GET', url, **kw)
+
+  #----------------------------------------------------------------------------
+  def post(self, url, data=None, **kw):
+    return self.request('POST', url, data=data, **kw)
+
+  #----------------------------------------------------------------------------
+  def _remaining(self, url):
+    if self.deadline is None:
+      return None
+    ret = self.deadline - time.time()
+    if ret <= 0:
+      raise TransportError(_('deadline exceeded before requesting {}', url))
+    return ret
+
+  #----------------------------------------------------------------------------
+  def _count(self, host, latency=None, retry=False, error=False):
+    with self.lock:
+      stats = self.stats.get(host)
+      if stats is None:
+        stats = self.stats[host] = aadict(
+          requests=0, retries=0, errors=0, latency=0.0)
+      if latency is not None:
+        stats.requests += 1
+        stats.latency  += latency
+      if retry:
+        stats.retries += 1
+      if error:
+        stats.errors += 1
+
+  #----------------------------------------------------------------------------
+  def request(self, method, url, **kw):
+    '''
+    Sends a `method` request to `url`, retrying it if it is idempotent
+    (see :class:`Transport`), and returns the :class:`requests.Response`.
+    The keyword arguments are passed to :meth:`requests.Session.request`.
+    '''
+    resp = self._request(method, url, **kw)
+    if self.renew is None or self.expired is None or self.renewing \
+        or not self.expired(resp):
+      return resp
+    log.info('session expired (at %s): renewing it', url)
+    self._local.renewing = True
+    try:
+      self.renew()
+    finally:
+      self._local.renewing = False
+    return self._request(method, url, **kw)
+
+  #----------------------------------------------------------------------------
+  def _request(self, method, url, **kw):
+    host     = urlparse.urlsplit(url).netloc
+    timeout  = kw.pop('timeout', self.timeout)
+    attempts = 1 + ( self.retries if method.upper() in IDEMPOTENT else 0 )
+    for attempt in range(attempts):
+      if self.controller is not None:
+        self.controller.wait()
+      remaining = self._remaining(url)
+      if remaining is not None:
+        remaining = min(timeout or remaining, remaining)
+      start = time.time()
+      try:
+        resp  = self.session.request(
+          method, url, timeout=remaining or timeout, **kw)
+        error = None
+        if resp.status_code in RETRY_STATUSES:
+          error = _('{} {} returned status {}', method, url, resp.status_code)
+      except (requests.ConnectionError, requests.Timeout) as err:
+        resp  = None
+        error = _('{} {} failed: {}', method, url, err)
+      self._count(host, latency=time.time() - start)
+      if error is None:
+        return resp
+      hint = retryAfter(resp) if resp is not None else None
+      if self.controller is not None and resp is not None:
+        # note: within a `Controller.call`, this only decreases the
+        # limit once per call (not once per retry)
+        self.controller.congested(retryAfter=hint)
+      if attempt + 1 >= attempts:
+        break
+      delay = self.backoff * ( 2 ** attempt ) * random.uniform(0.5, 1.5)
+      delay = max(delay, hint or 0)
+      if self.deadline is not None:
+        delay = min(delay, max(0, self.deadline - time.time()))
+      log.debug('%s (retrying in %.2fs)', error, delay)
+      self._count(host, retry=True)
+      time.sleep(delay)
+    self._count(host, error=True)
+    if resp is not None and resp.status_code == 429:
+      raise RateLimited(error, retryAfter=hint)
+    if resp is not None:
+      # let the driver inspect (or `raise_for_status`) the final response
+      return resp
+    raise TransportError(error)
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -21,7 +21,9 @@
 
 import re
 import os
+import hashlib
 
+import six
 import morph
 
 #------------------------------------------------------------------------------
@@ -49,14 +51,93 @@ dnsname_re = re.compile(
 ''', re.VERBOSE | re.IGNORECASE)
 
 
+# the maximum number of cached `absdom` and `reldom` results (each)
+DOMAIN_CACHE_SIZE = 65536
+
+#------------------------------------------------------------------------------
+class LRUCache(dict):
+  '''
+  A bounded dict that evicts the least recently used entries once it
+  holds more than `maxsize` entries. To keep a cache hit as cheap as a
+  plain dict lookup (an exact LRU, e.g. via an OrderedDict, costs more
+  than most of the computations it would save), recency is tracked in
+  two generations: new and recently used entries live in the dict
+  itself (the "young" generation); when that fills up to half of
+  `maxsize`, it becomes the "old" generation, replacing (i.e.
+  evicting) the previous one. Hits in the old generation are promoted
+  back to the young one.
+
+  Lookups (``cache[key]``, which raises a KeyError on a miss, or
+  :meth:`get`) and stores are safe to use from multiple threads: at
+  worst, a concurrent generation change causes a spurious miss.
+  '''
+
+  #----------------------------------------------------------------------------
+  def __init__(self, maxsize=DOMAIN_CACHE_SIZE):
+    super(LRUCache, self).__init__()
+    self.maxsize = maxsize
+    self.old     = {}
+
+  #----------------------------------------------------------------------------
+  def __missing__(self, key):
+    value = self.old[key]
+    self[key] = value
+    return value
+
+  #----------------------------------------------------------------------------
+  def __setitem__(self, key, value):
+    if dict.__len__(self) >= max(1, self.maxsize // 2):
+      self.old = dict(self)
+      dict.clear(self)
+    dict.__setitem__(self, key, value)
+
+  #----------------------------------------------------------------------------
+  def __len__(self):
+    return dict.__len__(self) + len(self.old)
+
+  #----------------------------------------------------------------------------
+  def get(self, key, default=None):
+    try:
+      return self[key]
+    except KeyError:
+      return default
+
+  #----------------------------------------------------------------------------
+  def clear(self):
+    dict.clear(self)
+    self.old = {}
+
+#------------------------------------------------------------------------------
+_absdom_cache = LRUCache()
+_reldom_cache = LRUCache()
+
+#------------------------------------------------------------------------------
+def _intern(value):
+  return six.moves.intern(value) if type(value) is str else value
+
 #------------------------------------------------------------------------------
 def absdom(domain):
   '''
   Returns a canonical version of the domain name `domain` using absolute
   domain name syntax (i.e. ending with a period).
+
+  Results are interned and cached (see :class:`LRUCache`), and names
+  that are already absolute and lower-case are returned as-is without
+  any parsing.
   '''
+  if domain[-1:] == '.' and domain.islower():
+    # shortcut: `_absdom` returns these unchanged
+    return domain
+  try:
+    return _absdom_cache[domain]
+  except KeyError:
+    ret = _absdom_cache[domain] = _intern(_absdom(domain))
+    return ret
+
+#------------------------------------------------------------------------------
+def _absdom(domain):
   if domain.startswith('*.'):
-    return '*.' + absdom(domain[2:])
+    return '*.' + _absdom(domain[2:])
   if not dnsname_re.match(domain):
     return domain
   domain = domain.lower()
@@ -68,8 +149,20 @@ def absdom(domain):
 def reldom(domain, to=None):
   '''
   Returns a canonical version of the domain name `domain` using relative
-  domain name syntax (i.e. not ending with a period).
+  domain name syntax (i.e. not ending with a period). If `to` is
+  specified and `domain` is a sub-domain of it, the name is returned
+  relative to `to`. Results are interned and cached (see
+  :class:`LRUCache`).
   '''
+  key = domain if to is None else (domain, to)
+  try:
+    return _reldom_cache[key]
+  except KeyError:
+    ret = _reldom_cache[key] = _intern(_reldom(domain, to))
+    return ret
+
+#------------------------------------------------------------------------------
+def _reldom(domain, to=None):
   if to is not None:
     tmp = absdom(domain)
     to = absdom(to)
@@ -82,6 +175,20 @@ def reldom(domain, to=None):
     domain = domain[:-1]
   return domain
 
+#------------------------------------------------------------------------------
+def filedigest(path, blocksize=65536):
+  '''
+  Returns the hex SHA-256 digest of the content of the file `path`.
+  '''
+  ret = hashlib.sha256()
+  with open(path, 'rb') as fp:
+    while True:
+      block = fp.read(blocksize)
+      if not block:
+        break
+      ret.update(block)
+  return ret.hexdigest()
+
 #------------------------------------------------------------------------------
 _evalenv_re = re.compile(
   '(.*?)\\$\\{ENV:([^:}]*)(:-([^}]*))?\\}', flags=re.DOTALL)
@@ -0,0 +1,561 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import os
+import re
+import collections
+import logging
+import multiprocessing
+
+import dns.exception
+import dns.name
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+import dns.tokenizer
+import dns.ttl
+import dns.zone
+from aadict import aadict
+from six import BytesIO
+from six.moves import StringIO
+
+from .record import Record
+from .extsort import sortedRdatasets
+
+#------------------------------------------------------------------------------
+
+log = logging.getLogger(__name__)
+
+#------------------------------------------------------------------------------
+
+# todo: use real parsers for these...
+localvars_cre   = re.compile(r'-\*-.*dnssync-config:\s+([^\s]+).*-\*-')
+localorigin_cre = re.compile(r'\$ORIGIN\s+([^\s;]+)', re.IGNORECASE)
+generange_cre   = re.compile(r'^(\d+)-(\d+)(?:/(\d+))?$')
+genvar_cre      = re.compile(r'\\\$|\$\$|\$\{([^}]*)\}|\$')
+
+# the `$GENERATE` modifier radixes (BIND's "n" and "N" nibble formats
+# are not supported)
+GENERATE_FORMATS = {'d': '%0*d', 'o': '%0*o', 'x': '%0*x', 'X': '%0*X'}
+
+# the minimum number of bytes per chunk when parsing in parallel
+CHUNKSIZE = 1 << 20
+
+#------------------------------------------------------------------------------
+def readHeader(path):
+  '''
+  Scans the leading block of comments, blank lines and directives of
+  the zonefile at `path` for the "dnssync-config" local variable and
+  the first ``$ORIGIN`` directive, and returns an object with `config`
+  and `origin` attributes (either of which may be None). Reading stops
+  at the first record, i.e. the rest of the file is never read.
+  '''
+  ret = aadict(config=None, origin=None)
+  with open(path, 'rb') as fp:
+    for line in fp:
+      text = line.strip()
+      if text and text[:1] not in ';$':
+        break
+      if ret.config is None:
+        match = localvars_cre.search(text)
+        if match:
+          ret.config = match.group(1)
+      if ret.origin is None:
+        match = localorigin_cre.match(text)
+        if match:
+          ret.origin = match.group(1)
+  return ret
+
+#------------------------------------------------------------------------------
+class ZoneReader(dns.zone._MasterReader):
+  '''
+  A streaming variant of dnspython's master file reader: instead of
+  building a complete :class:`dns.zone.Zone`, :meth:`rdatas` yields
+  the (name, ttl, rdata) tuples as they are parsed. Only the records of
+  the current owner name are buffered (so that, as with a Zone,
+  consecutive records of the same RRset are merged), which keeps the
+  memory use bounded regardless of the size of the zone.
+
+  Unlike a Zone, records of an RRset that are separated by records of
+  other owner names are generated separately, i.e. they are not
+  de-duplicated against, or given the lowest TTL of, the earlier
+  records of that RRset. :class:`ZoneFile` merges them.
+  '''
+
+  #----------------------------------------------------------------------------
+  def __init__(self, fp, origin, rdclass=dns.rdataclass.IN,
+               filename=None, check_origin=True):
+    super(ZoneReader, self).__init__(
+      dns.tokenizer.Tokenizer(fp, filename), origin, rdclass,
+      relativize=False, allow_include=True, check_origin=check_origin)
+    self.origintypes = set()
+    self.includes    = []
+
+  #----------------------------------------------------------------------------
+  def _flush(self, keep=None):
+    nodes = self.zone.nodes
+    for name in [name for name in nodes if name != keep]:
+      node = nodes.pop(name)
+      if name == self.zone.origin:
+        self.origintypes.update(rds.rdtype for rds in node.rdatasets)
+      for rds in node.rdatasets:
+        for rdata in rds:
+          yield (name, rds.ttl, rdata)
+
+  #----------------------------------------------------------------------------
+  def rdatas(self):
+    '''
+    Generates the (name, ttl, rdata) tuples in the zonefile, in the
+    same format as :meth:`dns.zone.Zone.iterate_rdatas`. Raises
+    :class:`dns.zone.NoSOA` or :class:`dns.zone.NoNS` once the zonefile
+    has been completely read if the zone origin is missing either of
+    them.
+    '''
+    # note: this mirrors `dns.zone._MasterReader.read`
+    try:
+      while True:
+        token = self.tok.get(True, True).unescape()
+        if token.is_eof():
+          if self.current_file is not None:
+            self.current_file.close()
+          if self.saved_state:
+            (self.tok, self.current_origin, self.last_name,
+             self.current_file, self.ttl) = self.saved_state.pop(-1)
+            continue
+          break
+        elif token.is_eol():
+          continue
+        elif token.is_comment():
+          self.tok.get_eol()
+          continue
+        elif token.value[0] == '$':
+          self._directive(token.value.upper())
+          # note: `$GENERATE` adds the records of other owner names
+          for item in self._flush(keep=self.last_name):
+            yield item
+          continue
+        self.tok.unget(token)
+        self._rr_line()
+        for item in self._flush(keep=self.last_name):
+          yield item
+    except dns.exception.SyntaxError as detail:
+      (filename, line_number) = self.tok.where()
+      raise dns.exception.SyntaxError(
+        '%s:%d: %s' % (filename, line_number, detail or 'syntax error'))
+    for item in self._flush():
+      yield item
+    if self.check_origin:
+      if dns.rdatatype.SOA not in self.origintypes:
+        raise dns.zone.NoSOA()
+      if dns.rdatatype.NS not in self.origintypes:
+        raise dns.zone.NoNS()
+
+  #----------------------------------------------------------------------------
+  def _directive(self, directive):
+    if directive == '$TTL':
+      token = self.tok.get()
+      if not token.is_identifier():
+        raise dns.exception.SyntaxError('bad $TTL')
+      self.ttl = dns.ttl.from_text(token.value)
+      self.tok.get_eol()
+    elif directive == '$ORIGIN':
+      # note: unlike dnspython, relative origins are resolved against
+      # the current origin (as per RFC 1035)
+      self.current_origin = self.tok.get_name(self.current_origin)
+      self.tok.get_eol()
+      if self.zone.origin is None:
+        self.zone.origin = self.current_origin
+    elif directive == '$INCLUDE' and self.allow_include:
+      token = self.tok.get()
+      filename = token.value
+      token = self.tok.get()
+      if token.is_identifier():
+        new_origin = dns.name.from_text(token.value, self.current_origin)
+        self.tok.get_eol()
+      elif not token.is_eol_or_eof():
+        raise dns.exception.SyntaxError('bad origin in $INCLUDE')
+      else:
+        new_origin = self.current_origin
+      self.saved_state.append((
+        self.tok, self.current_origin, self.last_name,
+        self.current_file, self.ttl))
+      self.includes.append(filename)
+      self.current_file = open(filename, 'r')
+      self.tok = dns.tokenizer.Tokenizer(self.current_file, filename)
+      self.current_origin = new_origin
+    elif directive == '$GENERATE':
+      self._generate()
+    else:
+      raise dns.exception.SyntaxError(
+        'Unknown master file directive \'' + directive + '\'')
+
+  #----------------------------------------------------------------------------
+  def _generate(self):
+    # parses the rest of a BIND-style "$GENERATE range lhs [ttl] [class]
+    # type rhs" directive and adds the generated records to the zone
+    line = self.tok.line_number
+    try:
+      self._generateRecords()
+    except dns.exception.SyntaxError:
+      # report errors at the directive's line (even if it has been read)
+      self.tok.line_number = line
+      raise
+
+  #----------------------------------------------------------------------------
+  def _generateRecords(self):
+    token = self.tok.get()
+    match = generange_cre.match(token.value or '')
+    if not token.is_identifier() or not match:
+      raise dns.exception.SyntaxError('bad $GENERATE range')
+    start, stop = int(match.group(1)), int(match.group(2))
+    step = int(match.group(3) or 1)
+    if start > stop or step < 1:
+      raise dns.exception.SyntaxError('bad $GENERATE range')
+    token = self.tok.get()
+    if not token.is_identifier():
+      raise dns.exception.SyntaxError('bad $GENERATE owner name')
+    lhs     = token.value
+    ttl     = self.ttl
+    rdclass = self.zone.rdclass
+    token   = self.tok.get()
+    try:
+      ttl   = dns.ttl.from_text(token.value)
+      token = self.tok.get()
+    except dns.ttl.BadTTL:
+      pass
+    try:
+      rdclass = dns.rdataclass.from_text(token.value)
+      token   = self.tok.get()
+    except Exception:
+      pass
+    if rdclass != self.zone.rdclass:
+      raise dns.exception.SyntaxError("RR class is not zone's class")
+    try:
+      rdtype = dns.rdatatype.from_text(token.value)
+    except Exception:
+      raise dns.exception.SyntaxError('unknown rdatatype \'%s\'' % (token.value,))
+    rhs = []
+    while True:
+      token = self.tok.get()
+      if token.is_eol_or_eof():
+        break
+      rhs.append(
+        '"' + token.value + '"' if token.is_quoted_string() else token.value)
+    if not rhs:
+      raise dns.exception.SyntaxError('missing $GENERATE rdata')
+    for idx in range(start, stop + 1, step):
+      name = dns.name.from_text(_substitute(lhs, idx), self.current_origin)
+      if not name.is_subdomain(self.zone.origin):
+        continue
+      rdata = dns.rdata.from_text(
+        rdclass, rdtype,
+        dns.tokenizer.Tokenizer(' '.join(_substitute(text, idx) for text in rhs)),
+        self.current_origin, False)
+      node = self.zone.nodes.get(name)
+      if node is None:
+        node = self.zone.nodes[name] = self.zone.node_factory()
+      node.find_rdataset(rdclass, rdtype, rdata.covers(), True).add(rdata, ttl)
+
+#------------------------------------------------------------------------------
+def _substitute(text, idx):
+  # expands the `$GENERATE` iterator references in `text`: "$" and
+  # "${offset[,width[,radix]]}" (with "\$" and "$$" being a literal "$")
+  def _expand(match):
+    if match.group(0) in ('\\$', '$$'):
+      return '$'
+    if match.group(1) is None:
+      return str(idx)
+    mods = match.group(1).split(',')
+    try:
+      offset = int(mods[0] or 0)
+      width  = int(mods[1]) if len(mods) > 1 else 0
+      fmt    = GENERATE_FORMATS[mods[2] if len(mods) > 2 else 'd']
+      if len(mods) > 3:
+        raise ValueError(match.group(0))
+    except (ValueError, KeyError):
+      raise dns.exception.SyntaxError(
+        'unsupported $GENERATE modifier \'%s\'' % (match.group(0),))
+    return fmt % (width, idx + offset)
+  return genvar_cre.sub(_expand, text)
+
+#------------------------------------------------------------------------------
+def _parens(line):
+  if '"' not in line:
+    line = line.split(';', 1)[0]
+    return line.count('(') - line.count(')')
+  ret    = 0
+  quoted = False
+  escape = False
+  for char in line:
+    if escape:
+      escape = False
+    elif char == '\\':
+      escape = True
+    elif char == '"':
+      quoted = not quoted
+    elif quoted:
+      continue
+    elif char == ';':
+      break
+    elif char == '(':
+      ret += 1
+    elif char == ')':
+      ret -= 1
+  return ret
+
+#------------------------------------------------------------------------------
+def splitZonefile(path, chunks, chunksize=CHUNKSIZE, origin=None):
+  '''
+  Splits the zonefile at `path` into up to `chunks` byte ranges of
+  roughly equal size (but no smaller than `chunksize` bytes) that can
+  each be parsed independently. Returns a list of objects with `start`
+  and `end` byte offsets, the `line` number of the first line, and the
+  `prefix` text (the ``$ORIGIN`` and ``$TTL`` directives in effect) that
+  must be prepended to the chunk before it is parsed.
+
+  Relative ``$ORIGIN`` directives are resolved against the preceding
+  one (or the zone `origin`), so that each chunk's prefix contains the
+  absolute origin in effect at its start.
+
+  Chunks only start at a record line that has an explicit owner name,
+  which differs from the previous record's owner, outside of any
+  parentheses, i.e. no record, RRset or multi-line record is ever split
+  across chunks. Zonefiles that use ``$INCLUDE`` are not split.
+  '''
+  size  = os.path.getsize(path)
+  count = min(chunks, size // max(chunksize, 1))
+  whole = [aadict(start=0, end=size, line=1, prefix='')]
+  if count <= 1:
+    return whole
+  target = size // count
+  ret    = []
+  start  = 0
+  first  = 1
+  prefix = ''
+  state  = collections.OrderedDict()
+  if origin is not None and not isinstance(origin, dns.name.Name):
+    origin = dns.name.from_text(origin)
+  owner  = None
+  depth  = 0
+  offset = 0
+  with open(path, 'rb') as fp:
+    for lineno, line in enumerate(fp, 1):
+      head = line[:1]
+      if head == '$':
+        directive = line.split(None, 1)[0].upper()
+        if directive == '$INCLUDE':
+          return whole
+        if directive == '$ORIGIN':
+          value = line.split(None, 2)[1:2]
+          try:
+            origin = dns.name.from_text(value[0], origin) if value else None
+          except dns.exception.DNSException:
+            origin = None
+          if origin is None or not origin.is_absolute():
+            # unresolvable origins are left to the (serial) parser
+            return whole
+          state[directive] = '$ORIGIN ' + origin.to_text() + '\n'
+        elif directive == '$TTL':
+          state[directive] = line.rstrip('\r\n') + '\n'
+      elif head not in ' \t;\r\n' and depth == 0:
+        name = line.split(None, 1)[0]
+        if name != owner:
+          owner = name
+          if offset - start >= target and len(ret) < count - 1:
+            ret.append(aadict(start=start, end=offset, line=first, prefix=prefix))
+            start  = offset
+            first  = lineno
+            prefix = ''.join(state.values())
+      if '(' in line or ')' in line:
+        depth += _parens(line)
+      offset += len(line)
+  ret.append(aadict(start=start, end=offset, line=first, prefix=prefix))
+  return ret
+
+#------------------------------------------------------------------------------
+def _parseChunk(chunk):
+  # note: this is executed in a worker process. the rdatas are
+  # returned as (name, ttl, rdtype, wire) tuples, since dns.name.Name
+  # objects cannot be pickled and converting them to Record objects
+  # would lose data (e.g. SRV fields or multi-string TXT records).
+  with open(chunk.path, 'rb') as fp:
+    fp.seek(chunk.start)
+    data = fp.read(chunk.end - chunk.start)
+  reader = ZoneReader(
+    StringIO(chunk.prefix + data), chunk.origin, chunk.rdclass,
+    filename=chunk.path, check_origin=False)
+  reader.tok.line_number = chunk.line - chunk.prefix.count('\n')
+  ret = []
+  for name, ttl, rdata in reader.rdatas():
+    wire = BytesIO()
+    rdata.to_wire(wire)
+    ret.append((name.to_text(), ttl, rdata.rdtype, wire.getvalue()))
+  return ret
+
+#------------------------------------------------------------------------------
+class ZoneFile(object):
+  '''
+  A lazily-read zonefile that can be used in place of a
+  :class:`dns.zone.Zone` where the zone is only iterated over, most
+  notably :meth:`dnssync.api.Driver.put`: each call to
+  :meth:`iterate_rdatas` streams the records from the file through an
+  external-memory sort (see
+  :func:`dnssync.api.extsort.sortedRdatasets`), which merges the
+  records of each RRset as a Zone does (even if they are not
+  consecutive in the zonefile), instead of materializing the whole
+  zone in memory. The records are therefore generated in canonical
+  order rather than in zonefile order.
+
+  If `jobs` is greater than one, large zonefiles are split (see
+  :func:`splitZonefile`) and the chunks are parsed in a pool of `jobs`
+  worker processes.
+
+  If `cache`, a :class:`dnssync.api.cache.ZoneCache`, is specified,
+  :meth:`load` stores the parsed zone in it, and all methods use the
+  cached version instead of the zonefile if it is unchanged. `digest`
+  is the zonefile's content digest, if already known. Zonefiles that
+  use ``$INCLUDE`` are not cached, since changes to the included files
+  would go unnoticed.
+  '''
+
+  #----------------------------------------------------------------------------
+  def __init__(self, path, origin, rdclass=dns.rdataclass.IN,
+               jobs=1, chunksize=CHUNKSIZE, cache=None, digest=None):
+    if not isinstance(origin, dns.name.Name):
+      origin = dns.name.from_text(origin)
+    self.path      = path
+    self.origin    = origin
+    self.rdclass   = rdclass
+    self.jobs      = jobs or 1
+    self.chunksize = chunksize
+    self.cache     = cache
+    self.digest    = digest
+    self.includes  = None
+    self._cached   = None
+
+  #----------------------------------------------------------------------------
+  def cached(self):
+    '''
+    Returns the cached :class:`dns.zone.Zone` version of the zonefile,
+    or ``None`` if there is no cache or it is out of date.
+    '''
+    if self._cached is None and self.cache is not None:
+      # note: the cache only computes the digest if the zonefile's size
+      # and modification time match
+      self._cached = self.cache.load(self.path, self.origin, self.digest) or False
+    return self._cached or None
+
+  #----------------------------------------------------------------------------
+  def iterate_rdatas(self):
+    zone = self.cached()
+    if zone is not None:
+      for item in zone.iterate_rdatas():
+        yield item
+      return
+    for key, name, rdataset in sortedRdatasets(self._parse()):
+      for rdata in rdataset:
+        yield (name, rdataset.ttl, rdata)
+
+  #----------------------------------------------------------------------------
+  def _parse(self):
+    # generates the (name, ttl, rdata) tuples of the zonefile as they
+    # are parsed, i.e. without merging split RRsets (see ZoneReader),
+    # in parallel if `jobs` is greater than one
+    chunks = []
+    if self.jobs > 1:
+      chunks = splitZonefile(
+        self.path, self.jobs * 4, self.chunksize, origin=self.origin)
+    if len(chunks) <= 1:
+      with open(self.path, 'r') as fp:
+        reader = ZoneReader(fp, self.origin, self.rdclass, filename=self.path)
+        for item in reader.rdatas():
+          yield item
+        self.includes = reader.includes
+      return
+    # note: dns.name.Name objects cannot be pickled, hence `origin` is
+    # passed to the workers as text.
+    origin = self.origin.to_text()
+    for chunk in chunks:
+      chunk.update(path=self.path, origin=origin, rdclass=self.rdclass)
+    names  = dict()
+    types  = set()
+    pool   = multiprocessing.Pool(min(self.jobs, len(chunks)))
+    try:
+      for items in pool.imap(_parseChunk, chunks):
+        for text, ttl, rdtype, wire in items:
+          name = names.get(text)
+          if name is None:
+            name = names[text] = dns.name.from_text(text)
+          if name == self.origin:
+            types.add(rdtype)
+          yield (name, ttl, dns.rdata.from_wire(
+            self.rdclass, rdtype, wire, 0, len(wire)))
+        # owner names never span chunks
+        names.clear()
+      pool.close()
+    except BaseException:
+      pool.terminate()
+      raise
+    finally:
+      pool.join()
+    if dns.rdatatype.SOA not in types:
+      raise dns.zone.NoSOA()
+    if dns.rdatatype.NS not in types:
+      raise dns.zone.NoNS()
+
+  #----------------------------------------------------------------------------
+  def records(self):
+    '''
+    Generates the records in the zonefile as :class:`Record` objects
+    (see :meth:`iterate_rdatas`).
+    '''
+    for rdata in self.iterate_rdatas():
+      yield Record.from_rdata(rdata)
+
+  #----------------------------------------------------------------------------
+  def load(self):
+    '''
+    Reads the entire zonefile and returns it as a
+    :class:`dns.zone.Zone`.
+    '''
+    zone = self.cached()
+    if zone is not None:
+      return zone
+    zone = dns.zone.Zone(self.origin, self.rdclass, relativize=False)
+    # note: the zone merges split RRsets itself
+    for name, ttl, rdata in self._parse():
+      node = zone.nodes.get(name)
+      if node is None:
+        node = zone.nodes[name] = zone.node_factory()
+      node.find_rdataset(
+        self.rdclass, rdata.rdtype, rdata.covers(), True).add(rdata, ttl)
+    if self.cache is not None:
+      if self.includes:
+        log.debug(
+          'not caching zonefile "%s" (it uses $INCLUDE)', self.path)
+      else:
+        self.cache.save(self.path, zone, self.digest)
+    return zone
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+'''
+Canonical zone digests in the style of RFC 8976 (ZONEMD, "SIMPLE"
+scheme with SHA-384): a digest of the whole zone, which makes
+comparing two zones a single string comparison, and a digest of each
+RRset, which narrows a comparison down to the RRsets that changed.
+'''
+
+import hashlib
+import struct
+
+from aadict import aadict
+
+#------------------------------------------------------------------------------
+
+# the ZONEMD rdata type (not known to all dnspython versions)
+ZONEMD = 63
+
+#------------------------------------------------------------------------------
+def zoneDigests(zone):
+  '''
+  Computes the canonical digests of the :class:`dns.zone.Zone` `zone`
+  and returns an object with the attributes:
+
+  * `digest`: the hex SHA-384 digest of all the RRs in the zone, in
+    canonical wire format and canonical order (excluding any ZONEMD
+    RRset at the zone apex and its signatures), as specified by RFC
+    8976.
+
+  * `rrsets`: a dict mapping (name, rdtype, covers) to the binary
+    SHA-384 digest of the RRs of that RRset only.
+  '''
+  total  = hashlib.sha384()
+  rrsets = dict()
+  for name in sorted(zone.nodes.keys()):
+    owner = name.to_digestable()
+    node  = zone.nodes[name]
+    for rdataset in sorted(node.rdatasets, key=lambda rds: (rds.rdtype, rds.covers)):
+      if name == zone.origin and ZONEMD in (rdataset.rdtype, rdataset.covers):
+        continue
+      head = owner + struct.pack(
+        '!HHI', rdataset.rdtype, rdataset.rdclass, rdataset.ttl)
+      digest = hashlib.sha384()
+      for rdata in sorted(set(rdata.to_digestable() for rdata in rdataset)):
+        wire = head + struct.pack('!H', len(rdata)) + rdata
+        digest.update(wire)
+        total.update(wire)
+      rrsets[(name, rdataset.rdtype, rdataset.covers)] = digest.digest()
+  return aadict(digest=total.hexdigest(), rrsets=rrsets)
+
+#------------------------------------------------------------------------------
+def changedNames(digestsA, digestsB):
+  '''
+  Returns the set of owner names (as :class:`dns.name.Name` objects)
+  that have at least one RRset that differs between the two zones
+  whose digests (see :func:`zoneDigests`) are `digestsA` and
+  `digestsB`.
+  '''
+  rrsetsA = digestsA.rrsets
+  rrsetsB = digestsB.rrsets
+  ret = set(key[0] for key, digest in rrsetsA.items() if rrsetsB.get(key) != digest)
+  ret.update(key[0] for key in rrsetsB if key not in rrsetsA)
+  return ret
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -28,7 +28,6 @@ import time
 import dns.rdata
 import dns.zone
 from aadict import aadict
-import requests
 from six.moves.urllib import parse as urlparse
 import asset
 
@@ -48,8 +47,21 @@ class Driver(api.Driver):
 
   name = 'domainmonster'
 
+  # the zone being edited is tracked in the server-side session
+  concurrentZones = False
+
+  # the "adddns" form takes any number of numbered lines and the
+  # "updatedns" form any number of record ids, so creates and updates
+  # are sent in batches
+  capabilities = aadict(
+    api.Driver.capabilities,
+    batch = aadict(create=25, update=25, delete=1),
+  )
+
   BASEURL = 'https://www.domainmonster.com'
 
+  LOGINPATHS = ('/login/',)
+
   #----------------------------------------------------------------------------
   def __init__(self, *args, **kw):
     super(Driver, self).__init__(*args, **kw)
@@ -61,9 +73,10 @@ class Driver(api.Driver):
   #----------------------------------------------------------------------------
   @property
   def session(self):
-    if self._session is None:
-      self._session = requests.Session()
-      self._login()
+    with self.lock:
+      if self._session is None:
+        self._session = self.makeTransport()
+        self.resumeSession(self._session, self._login)
     return self._session
 
   #----------------------------------------------------------------------------
@@ -95,11 +108,9 @@ class Driver(api.Driver):
 
   #----------------------------------------------------------------------------
   def _switchToZone(self, name):
-    zones = self._zones()
-    if name not in zones:
-      raise api.DomainNotFound(
-        _('this DomainMonster account does not manage domain "{}"', name))
-    zid = zones[name]
+    zid = self.zoneId(name)
+    if self.currentZone == name:
+      return zid
     resp = self.session.post(self.BASEURL + '/members/manage/', data=dict(
       setdm    = '1',
       d        = zid,
@@ -110,12 +121,9 @@ class Driver(api.Driver):
       gopr     = '0',
     ))
     # todo: check response...
+    self.currentZone = name
     return zid
 
-  #----------------------------------------------------------------------------
-  def list(self):
-    return self._zones().keys()
-
   #----------------------------------------------------------------------------
   def _makeSerial(self, prev=None):
     if not prev:
@@ -168,6 +176,7 @@ class Driver(api.Driver):
   def makePutContext(self, name, zone):
     ret = super(Driver, self).makePutContext(name, zone)
     ret.zoneid = self._switchToZone(name)
+    ret.newrecords = list(ret.newrecords)
     for record in ret.newrecords:
       if record.rclass != 'IN':
         raise api.UnsupportedRecordType(
@@ -197,48 +206,61 @@ class Driver(api.Driver):
 
   #----------------------------------------------------------------------------
   def createRecord(self, context, record):
-    subhost = record.name[: - len(context.name) - 1]
-    data = dict(
-      action           = 'adddns',
-      lines            = '1',
-      add_recordType1  = record.type,           # ALL
-      add_Host1        = subhost,               # A/AAAA/MX/TXT
-      add_Alias1       = subhost,               # CNAME
-      add_Zone1        = subhost,               # NS
-      add_SRVProto1    = subhost,               # SRV
-      add_ipAddress1   = record.content,        # A/AAAA
-      add_Address1     = record.content,        # CNAME/MX/NS/SRV
-      add_Comment1     = record.content,        # TXT
-      add_pref1        = record.priority,       # MX/SRV
-      add_weight1      = record.weight,         # SRV
-      add_port1        = record.port,           # SRV
-    )
-    self._postDnsAction(record, 'create', data)
+    self.createRecords(context, [record])
 
   #----------------------------------------------------------------------------
-  def _postDnsAction(self, record, action, data):
+  def createRecords(self, context, records):
+    data = dict(action='adddns', lines=str(len(records)))
+    for idx, record in enumerate(records, 1):
+      subhost = record.name[: - len(context.name) - 1]
+      for key, val in (
+          ('recordType', record.type),          # ALL
+          ('Host',       subhost),              # A/AAAA/MX/TXT
+          ('Alias',      subhost),              # CNAME
+          ('Zone',       subhost),              # NS
+          ('SRVProto',   subhost),              # SRV
+          ('ipAddress',  record.content),       # A/AAAA
+          ('Address',    record.content),       # CNAME/MX/NS/SRV
+          ('Comment',    record.content),       # TXT
+          ('pref',       record.priority),      # MX/SRV
+          ('weight',     record.weight),        # SRV
+          ('port',       record.port),          # SRV
+        ):
+        data['add_' + key + str(idx)] = val
+    self._postDnsAction(records, 'create', data)
+
+  #----------------------------------------------------------------------------
+  def _postDnsAction(self, records, action, data):
     resp = self.session.post(self.BASEURL + '/members/managedns/', data=data)
     ret  = parser.evaluateResponse(resp.text)
     if ret.code != 200:
+      self.checkRateLimit(ret.message)
       raise api.DriverError(
-        _('could not {} record {}/{}: {}', action, record.name, record.type, ret.message))
+        _('could not {} record(s) {}: {}', action,
+          ', '.join(record.name + '/' + record.type for record in records),
+          ret.message))
 
   #----------------------------------------------------------------------------
   def updateRecord(self, context, record, newrecord):
-    rid  = str(record.id)
+    self.updateRecords(context, [(record, newrecord)])
+
+  #----------------------------------------------------------------------------
+  def updateRecords(self, context, items):
     data = dict(action='updatedns')
-    data['dns_content_' + rid]  = newrecord.content
-    if newrecord.type in ('MX', 'SRV'):
-      data['dns_pref_' + rid]   = newrecord.priority
-    if newrecord.type == 'SRV':
-      data['dns_weight_' + rid] = newrecord.weight
-      data['dns_port_' + rid]   = newrecord.port
-    self._postDnsAction(newrecord, 'update', data)
+    for record, newrecord in items:
+      rid = str(record.id)
+      data['dns_content_' + rid]  = newrecord.content
+      if newrecord.type in ('MX', 'SRV'):
+        data['dns_pref_' + rid]   = newrecord.priority
+      if newrecord.type == 'SRV':
+        data['dns_weight_' + rid] = newrecord.weight
+        data['dns_port_' + rid]   = newrecord.port
+    self._postDnsAction([newrecord for record, newrecord in items], 'update', data)
 
   #----------------------------------------------------------------------------
   def deleteRecord(self, context, record):
     data = dict(action='updatedns', remove=record.id)
-    self._postDnsAction(record, 'delete', data)
+    self._postDnsAction([record], 'delete', data)
 
 
 #------------------------------------------------------------------------------
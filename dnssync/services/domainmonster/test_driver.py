@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+
+import asset
+from aadict import aadict
+
+from . import driver
+
+#------------------------------------------------------------------------------
+class FakeSession(object):
+
+  #----------------------------------------------------------------------------
+  def __init__(self, pages):
+    self.pages    = pages
+    self.requests = []
+
+  #----------------------------------------------------------------------------
+  def get(self, url, **kw):
+    return self.request('GET', url)
+
+  #----------------------------------------------------------------------------
+  def post(self, url, data=None, **kw):
+    return self.request('POST', url)
+
+  #----------------------------------------------------------------------------
+  def request(self, method, url):
+    path = url[len(driver.Driver.BASEURL):]
+    self.requests.append((method, path))
+    return aadict(status_code=200, text=self.pages.get((method, path), ''))
+
+#------------------------------------------------------------------------------
+class TestDriver(unittest.TestCase):
+
+  ASSET_DATA_DIR = 'dnssync:services/domainmonster/test_data/'
+
+  #----------------------------------------------------------------------------
+  def getData(self, name):
+    return asset.load(self.ASSET_DATA_DIR + name).read()
+
+  #----------------------------------------------------------------------------
+  def test_put_requests(self):
+    drv = driver.Driver(None, aadict(username='user', password='pass'))
+    drv._session = FakeSession({
+      ('GET', '/members/domainlist/js/') : '1234:example.com|1235:example.org|',
+      ('GET', '/members/managedns/')     : self.getData('extract-dns-records-01.html'),
+    })
+    zone = drv.get('example.com.')
+    drv.put('example.com.', zone)
+    # the zone catalog is fetched, and the session switched to the
+    # zone, only once
+    reqs = drv._session.requests
+    self.assertEqual(reqs.count(('GET', '/members/domainlist/js/')), 1)
+    self.assertEqual(reqs.count(('POST', '/members/manage/')), 1)
+    self.assertEqual(reqs.count(('GET', '/members/managedns/')), 2)
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
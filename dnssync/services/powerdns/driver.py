@@ -19,7 +19,9 @@
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #------------------------------------------------------------------------------
 
+import hashlib
 import logging
+import threading
 
 import dns.rdata
 import dns.zone
@@ -54,24 +56,36 @@ class Driver(api.Driver):
   #----------------------------------------------------------------------------
   def __init__(self, *args, **kw):
     super(Driver, self).__init__(*args, **kw)
-    self.client = Client(self.params.apikey)
     if not self.params.apikey:
       raise api.ConfigurationError(_('required parameter "apikey" missing'))
+    self._local = threading.local()
+
+  #----------------------------------------------------------------------------
+  @property
+  def account(self):
+    # the API key is the only account identifier, so only use a hash
+    # of it (to avoid storing it in cache files)...
+    return hashlib.sha1(self.params.apikey.encode('utf-8')).hexdigest()
+
+  #----------------------------------------------------------------------------
+  @property
+  def client(self):
+    # suds clients are not thread-safe, so each thread gets its own...
+    if getattr(self._local, 'client', None) is None:
+      self._local.client = Client(self.params.apikey)
+    return self._local.client
 
   #----------------------------------------------------------------------------
   def _zones(self):
     return dict((absdom(zone.Name), zone.Id)
                 for zone in self.client.service.listZones().Zones.Zone)
 
-  #----------------------------------------------------------------------------
-  def list(self):
-    return self._zones().keys()
 
   #----------------------------------------------------------------------------
   def getRecords(self, name):
     # TODO: i should really be building this from dns.zone.* calls...
     #       but dnspython is *so* unintuitive! ugh.
-    zid     = self._zones()[name]
+    zid     = self.zoneId(name)
     records = []
     for record in self.client.service.listRecords(zid).Records.Record:
       if record.Type is None:
@@ -96,13 +110,30 @@ class Driver(api.Driver):
   #----------------------------------------------------------------------------
   def makePutContext(self, name, zone):
     ret = super(Driver, self).makePutContext(name, zone)
-    ret.zoneid = self._zones()[name]
-    for name, ttl, rdata in zone.iterate_rdatas():
-      if dns.rdataclass.to_text(rdata.rdclass) != 'IN':
+    ret.zoneid = self.zoneId(name)
+    ret.newrecords = self._checkClass(ret.newrecords)
+    return ret
+
+  #----------------------------------------------------------------------------
+  def _checkClass(self, records):
+    # note: checked while streaming, i.e. before any changes are made
+    for record in records:
+      if record.rclass != 'IN':
         raise api.UnsupportedRecordType(
           _('PowerdDNS does not support non-"IN" record classes: {!r}',
-            (name, ttl, rdata)))
-    return ret
+            (record,)))
+      yield record
+
+  #----------------------------------------------------------------------------
+  def _normalizeContent(self, record):
+    # the content is stored with each domain-like component made
+    # relative, and read back with each one made absolute (see
+    # createRecord and getRecords), so the same rewrite is applied to
+    # both sides before comparing...
+    content = record.content
+    if content:
+      content = ' '.join([absdom(comp) for comp in content.split()])
+    return api.normalizeContent(record.type, content, record.rclass or 'IN')
 
   #----------------------------------------------------------------------------
   def createRecord(self, context, record):
@@ -114,6 +145,7 @@ class Driver(api.Driver):
     resp = self.client.service.addRecordToZone(
       context.zoneid, name, record.type, content, record.ttl, record.priority or 0)
     if resp.code != 100:
+      self.checkRateLimit(resp.description)
       raise api.DriverError(
         _('could not add record {}/{}: {}', record.name, record.type, resp.description))
 
@@ -127,6 +159,7 @@ class Driver(api.Driver):
     resp = self.client.service.updateRecord(
       record.id, name, newrecord.type, content, newrecord.ttl, newrecord.priority or 0)
     if resp.code != 100:
+      self.checkRateLimit(resp.description)
       raise api.DriverError(
         _('could not update record {}/{}: {}', newrecord.name, newrecord.type, resp.description))
 
@@ -134,6 +167,7 @@ class Driver(api.Driver):
   def deleteRecord(self, context, record):
     resp = self.client.service.deleteRecordById(record.id)
     if resp.code != 100:
+      self.checkRateLimit(resp.description)
       raise api.DriverError(
         _('could not delete record {}/{}: {}', record.name, record.type, resp.description))
 
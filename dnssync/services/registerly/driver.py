@@ -23,8 +23,8 @@ import socket
 import logging
 
 from aadict import aadict
-import requests
 import asset
+import dns.exception
 import dns.resolver
 from six.moves import StringIO
 from six.moves.urllib import parse as urlparse
@@ -91,6 +91,15 @@ class Driver(api.Driver):
 
   BASEURL = 'https://my.register.ly'
 
+  LOGINPATHS = ('/login.php',)
+
+  # creates and updates each fetch the form (for its token) before
+  # posting it
+  capabilities = aadict(
+    api.Driver.capabilities,
+    cost = aadict(create=2, update=2, delete=1, type=1),
+  )
+
   #----------------------------------------------------------------------------
   def __init__(self, *args, **kw):
     super(Driver, self).__init__(*args, **kw)
@@ -102,11 +111,18 @@ class Driver(api.Driver):
   #----------------------------------------------------------------------------
   @property
   def session(self):
-    if self._session is None:
-      self._session = requests.Session()
-      self._login()
+    with self.lock:
+      if self._session is None:
+        self._session = self.makeTransport()
+        self.resumeSession(self._session, self._login)
     return self._session
 
+  #----------------------------------------------------------------------------
+  def isLoginResponse(self, resp):
+    # the client area shows the login form in place when logged out
+    return super(Driver, self).isLoginResponse(resp) \
+      or parser.is_loginform(resp.text)
+
   #----------------------------------------------------------------------------
   def urlget(self, url):
     res = self.session.get(self.BASEURL + url)
@@ -144,20 +160,25 @@ class Driver(api.Driver):
     })
     resp = self.urlpost('/clientarea.php?action=domains', dict(data))
     return {
-      did : absdom(domain)
+      absdom(domain) : did
       for did, domain in parser.extract_domains(resp.text).items()}
 
   #----------------------------------------------------------------------------
-  def list(self):
-    return self._zones().values()
+  def _getDomainID(self, name):
+    return self.zoneId(name)
 
   #----------------------------------------------------------------------------
-  def _getDomainID(self, name):
-    for key, val in self._zones().items():
-      if val == name:
-        return key
-    raise api.DomainNotFound(
-      _('this Registerly account does not manage domain "{}"', name))
+  def getSerial(self, name):
+    try:
+      content = regGetSoaContent(absdom(name))
+    except (dns.exception.DNSException, socket.error, EnvironmentError) as err:
+      # note: a missing serial only disables the snapshot cache, so
+      # local resolver failures must not abort the sync
+      log.debug('could not query SOA serial of "%s": %s', name, err)
+      return None
+    if not content:
+      return None
+    return int(content.split()[2])
 
   #----------------------------------------------------------------------------
   def getRecords(self, name):
@@ -170,9 +191,20 @@ class Driver(api.Driver):
       recs  += [reg2api(rec, name) for rec in parser.extract_records(resp.text)]
     return recs
 
+  #----------------------------------------------------------------------------
+  def makePutContext(self, name, zone):
+    ret = super(Driver, self).makePutContext(name, zone)
+    # the SOA carries the zone and domain IDs that every create needs
+    ret.soa = next(
+      (rec for rec in ret.records if rec.type == api.Record.TYPE_SOA), None)
+    return ret
+
   #----------------------------------------------------------------------------
   def createRecord(self, context, record):
-    soa = [r for r in context.records if r.type == api.Record.TYPE_SOA][0]
+    soa = context.soa
+    if soa is None:
+      raise api.DriverError(
+        _('no SOA record found for Registerly zone "{}"', context.name))
     params = urlparse.urlencode({
       'id'        : soa.zid,
       'domainid'  : soa.domainid,
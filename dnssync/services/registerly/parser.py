@@ -19,6 +19,8 @@
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #------------------------------------------------------------------------------
 
+import re
+
 from six.moves.urllib.parse import parse_qsl
 from aadict import aadict
 import bs4
@@ -28,6 +30,12 @@ from dnssync import api
 #------------------------------------------------------------------------------
 class ScrapeError(api.DriverError): pass
 
+loginform_cre = re.compile(r'<form\b[^>]*\baction="[^"]*dologin\.php"', re.IGNORECASE)
+
+#------------------------------------------------------------------------------
+def is_loginform(text):
+  return bool(loginform_cre.search(text))
+
 #------------------------------------------------------------------------------
 def extract_authdata(text):
   data = dict()
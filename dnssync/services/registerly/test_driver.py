@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import socket
+
+from aadict import aadict
+
+from dnssync import api
+from . import driver
+
+#------------------------------------------------------------------------------
+class TestDriver(unittest.TestCase):
+
+  #----------------------------------------------------------------------------
+  def test_getSerial_error(self):
+    drv = driver.Driver(None, aadict(username='user', password='pass'))
+    def gethostbyname(host):
+      raise socket.gaierror(-2, 'Name or service not known')
+    orig = socket.gethostbyname
+    socket.gethostbyname = gethostbyname
+    try:
+      self.assertIsNone(drv.getSerial('example.ly.'))
+    finally:
+      socket.gethostbyname = orig
+
+  #----------------------------------------------------------------------------
+  def test_createRecord_soa(self):
+    drv = driver.Driver(None, aadict(username='user', password='pass'))
+    soa = api.Record(
+      name='example.ly.', type='SOA', ttl=3600,
+      content='ns1.example.ly. admin.example.ly. 1 2 3 4 5',
+      zid='42', domainid='7')
+    drv.getRecords = lambda name: [soa]
+    context = drv.makePutContext(
+      'example.ly.', aadict(iterate_rdatas=lambda: iter([])))
+    self.assertIs(context.soa, soa)
+    posts = []
+    drv.urlget = lambda url: aadict(
+      text='<form><input name="token" value="tok"/></form>')
+    drv.urlpost = lambda url, data: posts.append((url, data))
+    # the SOA must come from the context, not from re-scanning the records
+    context.records = []
+    for host in ('a', 'b'):
+      drv.createRecord(context, api.Record(
+        name=host + '.example.ly.', type='A', ttl=300, content='10.0.0.1'))
+    self.assertEqual([data['domain'] for url, data in posts], ['42', '42'])
+    self.assertTrue(all('domainid=7' in url for url, data in posts))
+    self.assertEqual([data['name'] for url, data in posts], ['a', 'b'])
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
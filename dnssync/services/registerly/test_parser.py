@@ -48,6 +48,11 @@ class TestParser(unittest.TestCase):
         password = None,
         token    = '8c0a9ce1aa8e4a62b7bf450118fe9c8218fe9c82'))
 
+  #----------------------------------------------------------------------------
+  def test_is_loginform(self):
+    self.assertTrue(parser.is_loginform(self.getData('login-form.html')))
+    self.assertFalse(parser.is_loginform(self.getData('domains.html')))
+
   #----------------------------------------------------------------------------
   def test_extract_domains(self):
     html = self.getData('domains.html')
@@ -25,8 +25,8 @@ import socket
 import logging
 
 from aadict import aadict
-import requests
 import asset
+import dns.exception
 import dns.resolver
 from six.moves import StringIO
 
@@ -100,7 +100,7 @@ def ze2api(record, name):
   ret = api.Record(
     name=record.host, rclass='IN', type=record.rtype, ttl=dur2sec(record.ttl))
   if record.zone_id:
-    ret.zoneedit_id = record.zone_id
+    ret.update(zoneedit_id=record.zone_id)
   if record.rtype == api.Record.TYPE_SOA:
     return ret.update(
       ttl     = 3600,
@@ -166,14 +166,49 @@ def api2ze(record, name):
   raise ValueError(
     _('unknown/unexpected/unimplemented ZoneEdit record type "{}"', record.type))
 
+#------------------------------------------------------------------------------
+def extractRecords(html, name, rtype):
+  '''
+  Extracts the `rtype` records of zone `name` from a ZoneEdit record
+  edit page as :class:`dnssync.api.Record` objects.
+  '''
+  recs = {}
+  for key, val in parser.extract_editparams(html).items():
+    if '::' not in key:
+      continue
+    if rtype == api.Record.TYPE_SOA:
+      ktyp, kname = key.split('::', 1)
+      kidx = '0'
+    else:
+      ktyp, kidx, kname = key.split('::', 2)
+    if kidx not in recs:
+      recs[kidx] = aadict(rtype=rtype)
+    recs[kidx][kname] = val
+  return [ze2api(rec, name) for rec in recs.values()]
+
 #------------------------------------------------------------------------------
 @asset.plugin('dnssync.services.plugins', 'zoneedit')
 class Driver(api.Driver):
 
   name = 'zoneedit'
 
+  # the zone being edited is tracked in the server-side session
+  concurrentZones = False
+
+  # all the changes to one record type are posted through the type's
+  # edit form, which takes three requests (edit, save and confirm) and
+  # must not be interleaved with other edits
+  capabilities = aadict(
+    api.Driver.capabilities,
+    bytype = True,
+    jobs   = 1,
+    cost   = aadict(api.Driver.capabilities.cost, type=3),
+  )
+
   BASEURL = 'https://cp.zoneedit.com'
 
+  LOGINPATHS = ('/login.php',)
+
   #----------------------------------------------------------------------------
   def __init__(self, *args, **kw):
     super(Driver, self).__init__(*args, **kw)
@@ -185,9 +220,10 @@ class Driver(api.Driver):
   #----------------------------------------------------------------------------
   @property
   def session(self):
-    if self._session is None:
-      self._session = requests.Session()
-      self._login()
+    with self.lock:
+      if self._session is None:
+        self._session = self.makeTransport()
+        self.resumeSession(self._session, self._login)
     return self._session
 
   #----------------------------------------------------------------------------
@@ -212,29 +248,37 @@ class Driver(api.Driver):
 
   #----------------------------------------------------------------------------
   def _zones(self):
+    # zoneedit identifies zones by name
     resp = self.session.get(self.BASEURL + '/manage/domains/')
-    return [absdom(name) for name in parser.extract_domains(resp.text)]
+    return {absdom(name): reldom(absdom(name))
+            for name in parser.extract_domains(resp.text)}
 
   #----------------------------------------------------------------------------
   def _switchToZone(self, name):
-    if name not in self._zones():
-      raise api.DomainNotFound(
-        _('this ZoneEdit account does not manage domain "{}"', name))
+    zid = self.zoneId(name)
+    if self.currentZone == name:
+      return
     resp = self.session.get(
       self.BASEURL + '/manage/domains/zone/index.php',
-      params=dict(LOGIN=reldom(name)))
+      params=dict(LOGIN=zid))
     if not resp.status_code == 200 \
         or not resp.url.startswith(self.BASEURL + '/manage/domains/zone/index.php?'):
       raise api.DriverError(_('unknown/unexpected switch-zone response'))
-    return resp.text
+    self.currentZone = name
 
   #----------------------------------------------------------------------------
-  def list(self):
-    return self._zones()
+  def getSerial(self, name):
+    try:
+      return zeGetSerial(name)
+    except (dns.exception.DNSException, socket.error, EnvironmentError) as err:
+      # note: a missing serial only disables the snapshot cache, so
+      # local resolver failures must not abort the sync
+      log.debug('could not query SOA serial of "%s": %s', name, err)
+      return None
 
   #----------------------------------------------------------------------------
   def getRecords(self, name):
-    text = self._switchToZone(name)
+    self._switchToZone(name)
     records = []
     for rtype in api.Record.TYPES:
       records += self.getRecordsByType(name, rtype)
@@ -244,6 +288,14 @@ class Driver(api.Driver):
         record.ttl = int(soa.content.split()[-1])
     return records
 
+  #----------------------------------------------------------------------------
+  def makePutContext(self, name, zone):
+    ret = super(Driver, self).makePutContext(name, zone)
+    # the records may have come from the snapshot cache, in which case
+    # the server-side session has not been switched to this zone yet...
+    self._switchToZone(name)
+    return ret
+
   #----------------------------------------------------------------------------
   def _getTypePath(self, rtype):
     path = rtype.lower()
@@ -255,20 +307,7 @@ class Driver(api.Driver):
   def getRecordsByType(self, name, rtype):
     resp = self.session.get(self._getTypePath(rtype) + '/edit.php')
     resp.raise_for_status()
-    params = parser.extract_editparams(resp.text)
-    recs = {}
-    for key, val in params.items():
-      if '::' not in key:
-        continue
-      if rtype == api.Record.TYPE_SOA:
-        ktyp, kname = key.split('::', 1)
-        kidx = '0'
-      else:
-        ktyp, kidx, kname = key.split('::', 2)
-      if kidx not in recs:
-        recs[kidx] = aadict(rtype=rtype)
-      recs[kidx][kname] = val
-    return [ze2api(rec, name) for rec in recs.values()]
+    return extractRecords(resp.text, name, rtype)
 
   #----------------------------------------------------------------------------
   def putChangesByType(self, context, rtype, creates, updates, deletes):
@@ -279,7 +318,10 @@ class Driver(api.Driver):
               if '::' not in k}
     recidx = 0
     pfx = rtype if rtype != api.Record.TYPE_AAAA else 'IPV6'
-    for record in context.records:
+    # note: the existing records are looked up by position (see
+    # :meth:`dnssync.api.Driver.plan`) since `context.records` may be a
+    # RecordStore, which creates a new Record on every access.
+    for pos, record in enumerate(context.records):
       if record.type != rtype:
         continue
       if rtype == api.Record.TYPE_SOA:
@@ -293,11 +335,11 @@ class Driver(api.Driver):
       if getattr(record, 'zoneedit_id', None) is not None:
         params[rpfx + 'zone_id'] = record.zoneedit_id
         params[rpfx + 'revoked'] = '0'
-      if record in deletes:
+      newrecord = context.updated.get(pos)
+      if pos in context.deleted:
         log.info('deleting %s record: %s (%s)', record.type, record.name, record.content)
         params[rpfx + 'del'] = '1'
-      elif record in updates:
-        newrecord = updates[record]
+      elif newrecord is not None:
         log.info('updating %s record: %s (%s)', record.type, record.name, newrecord.content)
         newzerec = api2ze(newrecord, context.name)
         for key, val in newzerec.items():
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+# file: $Id$
+# auth: metagriffin <mg.github@metagriffin.net>
+# date: 2026/10/18
+# copy: (C) Copyright 2026-EOT metagriffin -- see LICENSE.txt
+#------------------------------------------------------------------------------
+# This software is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#------------------------------------------------------------------------------
+
+import unittest
+import socket
+
+import asset
+import dns.zone
+from aadict import aadict
+
+from dnssync import api
+from . import driver
+
+#------------------------------------------------------------------------------
+# the zonefile equivalent of the records in the `edit-*.html` fixtures,
+# written the way a human might (i.e. *not* as ZoneEdit reports them)
+ZONE = '''\
+$ORIGIN example.com.
+$TTL 3600
+@          IN SOA   ns1 hostmaster 1 7200 1800 1209600 300
+@          IN NS    LOCAL.ZoneEdit.
+@          IN MX    0 Local.ZoneEdit.
+@          IN A     0.0.0.0
+localhost  IN A     127.0.0.1
+www        IN CNAME Example.COM.
+'''
+
+#------------------------------------------------------------------------------
+class FakeSession(object):
+
+  #----------------------------------------------------------------------------
+  def __init__(self, pages):
+    self.pages = pages
+    self.posts = []
+
+  #----------------------------------------------------------------------------
+  def get(self, url, **kw):
+    return self.request('GET', url)
+
+  #----------------------------------------------------------------------------
+  def post(self, url, data=None, **kw):
+    self.posts.append((url[len(driver.Driver.BASEURL):], data))
+    return self.request('POST', url)
+
+  #----------------------------------------------------------------------------
+  def request(self, method, url):
+    path = url[len(driver.Driver.BASEURL):]
+    return aadict(
+      status_code=200, raise_for_status=lambda: None,
+      text=self.pages.get((method, path), ''))
+
+#------------------------------------------------------------------------------
+class TestDriver(unittest.TestCase):
+
+  maxDiff = None
+
+  ASSET_DATA_DIR = 'dnssync:services/zoneedit/test_data/'
+
+  #----------------------------------------------------------------------------
+  def getData(self, name):
+    return asset.load(self.ASSET_DATA_DIR + name).read()
+
+  #----------------------------------------------------------------------------
+  def records(self):
+    ret = []
+    for page, rtype in (('a', 'A'), ('mx', 'MX'), ('ns', 'NS'), ('cname', 'CNAME')):
+      ret += driver.extractRecords(
+        self.getData('edit-' + page + '.html'), 'example.com.', rtype)
+    for record in ret:
+      record.ttl = 3600
+    return ret
+
+  #----------------------------------------------------------------------------
+  def test_normalized_nochange(self):
+    drv   = driver.Driver(None, aadict(username='user', password='pass'))
+    zone  = dns.zone.from_text(ZONE, origin='example.com.', relativize=False)
+    local = dict(
+      ((rec.name, rec.type), rec)
+      for rec in map(api.Record.from_rdata, zone.iterate_rdatas()))
+    records = self.records()
+    self.assertEqual(len(records), 5)
+    literal = 0
+    for record in records:
+      other = local[(record.name, record.type)]
+      if record.content != other.content:
+        literal += 1
+      self.assertFalse(drv._recordChanged(record, other), repr((record, other)))
+    self.assertEqual(literal, 3)
+    # a PARK'ed AAAA record is reported as "::0"
+    park = driver.ze2api(aadict(rtype='AAAA', host='@', ip='PARK', ttl='3600'), 'example.com.')
+    self.assertFalse(drv._recordChanged(
+      park, api.Record(name='example.com.', ttl=3600, rclass='IN', type='AAAA', content='::')))
+    # but real changes are still changes
+    self.assertTrue(drv._recordChanged(
+      records[0], api.Record(
+        name=records[0].name, ttl=3600, rclass='IN', type=records[0].type,
+        content='10.0.0.1')))
+
+  #----------------------------------------------------------------------------
+  def test_getSerial_error(self):
+    drv = driver.Driver(None, aadict(username='user', password='pass'))
+    def gethostbyname(host):
+      raise socket.gaierror(-2, 'Name or service not known')
+    orig = socket.gethostbyname
+    socket.gethostbyname = gethostbyname
+    try:
+      self.assertIsNone(drv.getSerial('example.com.'))
+    finally:
+      socket.gethostbyname = orig
+
+  #----------------------------------------------------------------------------
+  def test_put_columnar(self):
+    for columnar in ('false', 'true'):
+      drv = driver.Driver(
+        None, aadict(username='user', password='pass', columnar=columnar))
+      records = self.records()
+      drv.getRecords    = lambda name: records
+      drv._switchToZone = lambda name: None
+      drv._session = FakeSession({
+        ('GET', '/manage/domains/a/edit.php') : self.getData('edit-a.html'),
+      })
+      # updates "@" (by pairing), deletes "localhost", leaves the SOA alone
+      text = '\n'.join(
+        line for line in ZONE.replace('0.0.0.0', '10.0.0.1').split('\n')
+        if ' SOA ' not in line and not line.startswith('localhost'))
+      zone = dns.zone.from_text(
+        text, origin='example.com.', relativize=False, check_origin=False)
+      res = drv.put('example.com.', zone)
+      self.assertEqual(res, dict(created=0, updated=1, deleted=1))
+      path, params = drv._session.posts[0]
+      self.assertEqual(path, '/manage/domains/a/edit.php')
+      self.assertEqual(
+        sorted((key, val) for key, val in params.items() if key.startswith('A::')),
+        [
+          ('A::0::del', '1'),
+          ('A::0::host', 'localhost'),
+          ('A::0::ip', '127.0.0.1'),
+          ('A::0::revoked', '0'),
+          ('A::0::ttl', '3600'),
+          ('A::0::zone_id', '11410061'),
+          ('A::1::host', '@'),
+          ('A::1::ip', '10.0.0.1'),
+          ('A::1::revoked', '0'),
+          ('A::1::ttl', '3600'),
+          ('A::1::zone_id', '11409347'),
+        ], columnar)
+
+
+#------------------------------------------------------------------------------
+# end of $Id$
+# $ChangeLog$
+#------------------------------------------------------------------------------
@@ -58,6 +58,13 @@ dependencies = [
   'webencodings         >= 0.5',
 ]
 
+extra_dependencies = {
+  # encrypts the stored login sessions (see the "sessionkey" parameter)
+  'sessions': [
+    'cryptography         >= 2.0',
+  ],
+}
+
 entrypoints = {
   'console_scripts': [
     'dnssync            = dnssync.api.cli:main',
@@ -97,6 +104,7 @@ setup(
   include_package_data  = True,
   zip_safe              = True,
   install_requires      = dependencies,
+  extras_require        = extra_dependencies,
   tests_require         = test_dependencies,
   test_suite            = 'dnssync',
   entry_points          = entrypoints,